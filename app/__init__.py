@@ -11,6 +11,11 @@ from app.models.order import Order
 from app.models.service import Service
 from app.models.feedback import Feedback
 from app.models.sms_code import SMSCode
+from app.models.idempotency_key import IdempotencyKey
+from app.models.payment_journal import PaymentCallbackJournal
+from app.models.archive import OrderArchive, MessageArchive
+from app.models.worker_lease import WorkerLease
+from app.models.task_lease import TaskLease
 
 
 def init_app(app: Flask):
@@ -18,6 +23,109 @@ def init_app(app: Flask):
     # 初始化数据库
     db.init_app(app)
     
+    # 配置已认证用户缓存
+    from app.utils.user_cache import user_cache
+    user_cache.configure(
+        maxsize=app.config.get('USER_CACHE_SIZE'),
+        ttl=app.config.get('USER_CACHE_TTL')
+    )
+    
+    # 配置JWT校验缓存
+    from app.utils.auth import token_cache
+    token_cache.configure(maxsize=app.config.get('JWT_VERIFY_CACHE_SIZE'))
+    
+    # 配置归档订单数缓存
+    from app.services.order_archive import archive_count_cache
+    archive_count_cache.configure(ttl=app.config.get('ORDER_ARCHIVE_COUNT_CACHE_TTL'))
+    
+    # 配置密码哈希线程池
+    from app.utils.password import password_hasher
+    password_hasher.configure(
+        iterations=app.config.get('PASSWORD_HASH_ITERATIONS'),
+        workers=app.config.get('PASSWORD_HASH_WORKERS'),
+        max_queue=app.config.get('PASSWORD_HASH_MAX_QUEUE')
+    )
+    
+    # 配置微信接口HTTP客户端
+    from app.services.wechat_service import wechat_client
+    wechat_client.configure(
+        connect_timeout=app.config.get('WECHAT_HTTP_CONNECT_TIMEOUT'),
+        read_timeout=app.config.get('WECHAT_HTTP_READ_TIMEOUT'),
+        retries=app.config.get('WECHAT_HTTP_RETRIES'),
+        pool_size=app.config.get('WECHAT_HTTP_POOL_SIZE'),
+        failure_threshold=app.config.get('WECHAT_HTTP_FAILURE_THRESHOLD'),
+        reset_timeout=app.config.get('WECHAT_HTTP_RESET_TIMEOUT')
+    )
+    
+    # 配置短信验证码存储
+    from app.utils.sms_store import init_sms_store
+    init_sms_store(app.config)
+    
+    # 配置短信异步发送队列
+    from app.utils.sms_dispatch import sms_dispatcher
+    sms_dispatcher.configure(
+        workers=app.config.get('SMS_DISPATCH_WORKERS'),
+        queue_size=app.config.get('SMS_DISPATCH_QUEUE_SIZE'),
+        batch_size=app.config.get('SMS_DISPATCH_BATCH_SIZE'),
+        max_retries=app.config.get('SMS_DISPATCH_MAX_RETRIES'),
+        provider=app.config.get('SMS_PROVIDER')
+    )
+    
+    # 配置接口限流
+    from app.utils.rate_limit import rate_limiter
+    rate_limiter.configure(
+        enabled=app.config.get('RATELIMIT_ENABLED'),
+        backend=app.config.get('RATELIMIT_STORAGE'),
+        redis_url=app.config.get('RATELIMIT_REDIS_URL')
+    )
+    
+    # 配置技师可预约时段索引
+    from app.services.availability import availability_index
+    availability_index.configure(sync_interval=app.config.get('AVAILABILITY_SYNC_INTERVAL'))
+    
+    # 配置订单号生成器，未指定机器号时每个进程从数据库领取
+    from app.utils.snowflake import order_no_generator
+    from app.utils.worker_lease import worker_lease
+    worker_lease.configure(app=app, ttl=app.config.get('ORDER_NO_LEASE_TTL'))
+    if app.config.get('ORDER_NO_WORKER_ID') is not None:
+        order_no_generator.configure(worker_id=app.config['ORDER_NO_WORKER_ID'])
+    else:
+        order_no_generator.worker_id_provider = worker_lease.acquire
+        order_no_generator.lease_refresher = worker_lease.refresh
+    
+    # 配置自动派单引擎
+    from app.services.dispatch_service import dispatch_engine
+    dispatch_engine.configure(
+        app=app,
+        batch_size=app.config.get('DISPATCH_BATCH_SIZE'),
+        radius_km=app.config.get('DISPATCH_RADIUS_KM'),
+        max_load=app.config.get('DISPATCH_MAX_LOAD'),
+        distance_weight=app.config.get('DISPATCH_DISTANCE_WEIGHT'),
+        rating_weight=app.config.get('DISPATCH_RATING_WEIGHT'),
+        load_weight=app.config.get('DISPATCH_LOAD_WEIGHT'),
+        retry_delay=app.config.get('DISPATCH_RETRY_DELAY'),
+        recover_lease_ttl=app.config.get('DISPATCH_RECOVER_LEASE_TTL')
+    )
+    
+    # 配置订单超时自动取消
+    from app.services.order_timeout import order_timeout_scheduler
+    order_timeout_scheduler.configure(
+        app=app,
+        pending_timeout=app.config.get('ORDER_PENDING_TIMEOUT'),
+        unpaid_timeout=app.config.get('ORDER_UNPAID_TIMEOUT'),
+        batch_size=app.config.get('ORDER_TIMEOUT_BATCH_SIZE')
+    )
+    
+    # 配置支付回调异步处理
+    from app.services.payment_pipeline import payment_pipeline
+    payment_pipeline.configure(
+        app=app,
+        workers=app.config.get('PAYMENT_PIPELINE_WORKERS'),
+        batch_size=app.config.get('PAYMENT_PIPELINE_BATCH_SIZE'),
+        poll_interval=app.config.get('PAYMENT_PIPELINE_POLL_INTERVAL'),
+        claim_timeout=app.config.get('PAYMENT_PIPELINE_CLAIM_TIMEOUT')
+    )
+    
     # 测试页面路由
     @app.route('/test')
     def test_page():
@@ -31,3 +139,16 @@ def init_app(app: Flask):
     # 创建表
     with app.app_context():
         db.create_all()
+        
+        # 创建技师全文检索索引（SQLite FTS5），并注册索引同步事件
+        from app.services.therapist_search import TherapistSearch
+        TherapistSearch.ensure_index()
+        
+        # 启动后台任务，每个服务自带防重复启动检查，多次调用init_app时只启动一次
+        if app.config.get('BACKGROUND_TASKS_ENABLED', False):
+            # 重启前未派出的订单重新进入派单队列
+            dispatch_engine.start()
+            # 重放重启前未处理完的支付回调
+            payment_pipeline.start()
+            # 加载未完成的订单，超时后自动取消
+            order_timeout_scheduler.start()
@@ -173,7 +173,8 @@ def get_user_feedbacks(current_user):
                         'name': f.therapist.name,
                         'avatar': f.therapist.avatar
                     },
-                    'service_name': f.order.service_name if f.order else None
+                    'service_name': (f.order or f.archived_order).service_name
+                    if f.order or f.archived_order else None
                 } for f in result['items']],
                 'total': result['total'],
                 'page': result['page'],
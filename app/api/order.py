@@ -1,12 +1,14 @@
 from flask import Blueprint, request, jsonify
-from app.services.order_service import OrderService
+from app.services.order_service import OrderService, BookingConflictError
 from app.utils.auth import token_required
+from app.utils.idempotency import idempotent
 
 order_bp = Blueprint('order', __name__)
 
 
 @order_bp.route('/create', methods=['POST'])
 @token_required
+@idempotent('order_create')
 def create_order(current_user):
     """创建订单"""
     try:
@@ -21,6 +23,11 @@ def create_order(current_user):
                 'status': order.status
             }
         })
+    except BookingConflictError as e:
+        return jsonify({
+            'code': 409,
+            'message': str(e)
+        }), 409
     except Exception as e:
         return jsonify({
             'code': 400,
@@ -35,22 +42,34 @@ def get_order_list(current_user):
     page = request.args.get('page', 1, type=int)
     size = request.args.get('size', 10, type=int)
     status = request.args.get('status', type=int)
+    cursor = request.args.get('cursor')
+
+    # 传入cursor参数（首页传空字符串）时使用游标分页，翻到较早的订单时会读取归档表；
+    # 页码分页同样翻过近期订单后才查询归档表，total中的归档订单数读缓存
+    if cursor is not None:
+        try:
+            result = OrderService.get_user_orders_by_cursor(current_user.id, cursor, size, status)
+        except Exception as e:
+            return jsonify({
+                'code': 400,
+                'message': str(e)
+            }), 400
+        return jsonify({
+            'code': 200,
+            'message': 'success',
+            'data': {
+                'items': [_order_summary(o) for o in result['items']],
+                'next_cursor': result['next_cursor'],
+                'size': result['size']
+            }
+        })
 
     result = OrderService.get_user_orders(current_user.id, page, size, status)
     return jsonify({
         'code': 200,
         'message': 'success',
         'data': {
-            'items': [{
-                'id': o.id,
-                'order_no': o.order_no,
-                'service_name': o.service_name,
-                'price': o.price,
-                'service_time': o.service_time.isoformat() if o.service_time else None,
-                'status': o.status,
-                'therapist_name': o.therapist.name if o.therapist else None,
-                'therapist_avatar': o.therapist.avatar if o.therapist else None
-            } for o in result['items']],
+            'items': [_order_summary(o) for o in result['items']],
             'total': result['total'],
             'page': result['page'],
             'size': result['size']
@@ -58,6 +77,19 @@ def get_order_list(current_user):
     })
 
 
+def _order_summary(o):
+    return {
+        'id': o.id,
+        'order_no': o.order_no,
+        'service_name': o.service_name,
+        'price': o.price,
+        'service_time': o.service_time.isoformat() if o.service_time else None,
+        'status': o.status,
+        'therapist_name': o.therapist.name if o.therapist else None,
+        'therapist_avatar': o.therapist.avatar if o.therapist else None
+    }
+
+
 @order_bp.route('/<int:order_id>', methods=['GET'])
 @token_required
 def get_order_detail(current_user, order_id):
@@ -153,19 +185,20 @@ def get_payment_status(current_user, order_id):
 @order_bp.route('/payment/callback', methods=['POST'])
 # 支付回调接口不需要token验证，需要验证支付平台的签名
 # @token_required
+# 支付平台重复通知时按交易号直接返回首次处理结果，首次通知处理中时直接确认
+@idempotent('payment_callback', source='transaction_id')
 def payment_callback():
     """支付回调处理"""
     try:
         # 实际应用中需要根据不同支付平台解析回调数据
         data = request.get_json() or request.form.to_dict()
-        order = OrderService.payment_callback(data)
+        # 回调写入日志后即确认，订单支付状态由后台线程更新
+        journal_id = OrderService.payment_callback(data)
         return jsonify({
             'code': 200,
             'message': '回调处理成功',
             'data': {
-                'order_no': order.order_no,
-                'status': order.status,
-                'payment_status': order.payment_status
+                'journal_id': journal_id
             }
         })
     except Exception as e:
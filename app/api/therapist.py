@@ -1,8 +1,10 @@
 from flask import Blueprint, request, jsonify
 from app.services.therapist_service import TherapistService
 from app.services.order_service import OrderService
-from app.utils.auth import token_required, admin_required
+from app.utils.auth import token_required, admin_required, therapist_required
 from app.utils.file_utils import handle_file_upload
+from app.services.availability import availability_index, list_free_therapists
+from app.utils.geo import parse_coordinates
 
 therapist_bp = Blueprint('therapist', __name__)
 
@@ -77,22 +79,33 @@ def get_therapists():
     page = request.args.get('page', 1, type=int)
     size = request.args.get('size', 10, type=int)
     keyword = request.args.get('keyword', '')
+    cursor = request.args.get('cursor')
+
+    # 传入cursor参数（首页传空字符串）时使用游标分页，关键词检索按相关度排序，仍使用页码分页
+    if cursor is not None and not keyword:
+        try:
+            result = TherapistService.get_list_by_cursor(cursor, size)
+        except Exception as e:
+            return jsonify({
+                'code': 400,
+                'message': str(e)
+            }), 400
+        return jsonify({
+            'code': 200,
+            'message': 'success',
+            'data': {
+                'items': [_therapist_summary(t) for t in result['items']],
+                'next_cursor': result['next_cursor'],
+                'size': result['size']
+            }
+        })
 
     result = TherapistService.get_list(page, size, keyword)
     return jsonify({
         'code': 200,
         'message': 'success',
         'data': {
-            'items': [{
-                'id': t.id,
-                'name': t.name,
-                'age': t.age,
-                'avatar': t.avatar,
-                'rating': t.rating,
-                'service_count': t.service_count,
-                'specialty': t.specialty,
-                'experience_years': t.experience_years
-            } for t in result['items']],
+            'items': [_therapist_summary(t) for t in result['items']],
             'total': result['total'],
             'page': result['page'],
             'size': result['size']
@@ -100,10 +113,105 @@ def get_therapists():
     })
 
 
+def _therapist_summary(t):
+    return {
+        'id': t.id,
+        'name': t.name,
+        'age': t.age,
+        'avatar': t.avatar,
+        'rating': t.rating,
+        'service_count': t.service_count,
+        'specialty': t.specialty,
+        'experience_years': t.experience_years
+    }
+
+
+@therapist_bp.route('/nearby', methods=['GET'])
+def get_nearby_therapists():
+    """获取附近的技师"""
+    radius = request.args.get('radius', 5, type=float)
+    limit = request.args.get('limit', 20, type=int)
+    try:
+        latitude, longitude = parse_coordinates(request.args.get('latitude'), request.args.get('longitude'))
+        if latitude is None:
+            raise Exception("经纬度不能为空")
+        if radius <= 0 or limit <= 0:
+            raise Exception("查询半径和数量必须大于0")
+    except Exception as e:
+        return jsonify({
+            'code': 400,
+            'message': str(e)
+        }), 400
+
+    result = TherapistService.get_nearby(latitude, longitude, radius, min(limit, 100))
+    return jsonify({
+        'code': 200,
+        'message': 'success',
+        'data': {
+            'items': [dict(_therapist_summary(t), distance=round(distance, 2)) for t, distance in result]
+        }
+    })
+
+
+def _parse_slot():
+    """解析查询时段参数service_time和duration（分钟）"""
+    service_time = request.args.get('service_time')
+    duration = request.args.get('duration', type=int)
+    if not service_time or not duration or duration <= 0:
+        raise Exception("请提供服务时间和时长")
+    try:
+        return OrderService.parse_service_time(service_time), duration
+    except ValueError:
+        raise Exception("服务时间格式错误")
+
+
+@therapist_bp.route('/available', methods=['GET'])
+def get_available_therapists():
+    """获取指定时段空闲的技师"""
+    limit = request.args.get('limit', 20, type=int)
+    try:
+        service_time, duration = _parse_slot()
+    except Exception as e:
+        return jsonify({
+            'code': 400,
+            'message': str(e)
+        }), 400
+
+    therapists = list_free_therapists(service_time, duration, limit=min(max(limit, 1), 100))
+    return jsonify({
+        'code': 200,
+        'message': 'success',
+        'data': {
+            'items': [_therapist_summary(t) for t in therapists]
+        }
+    })
+
+
+@therapist_bp.route('/<int:therapist_id>/availability', methods=['GET'])
+def get_therapist_availability(therapist_id):
+    """查询技师在指定时段是否空闲"""
+    try:
+        service_time, duration = _parse_slot()
+    except Exception as e:
+        return jsonify({
+            'code': 400,
+            'message': str(e)
+        }), 400
+
+    return jsonify({
+        'code': 200,
+        'message': 'success',
+        'data': {
+            'therapist_id': therapist_id,
+            'available': availability_index.is_free(therapist_id, service_time, duration)
+        }
+    })
+
+
 @therapist_bp.route('/<int:therapist_id>', methods=['GET'])
 def get_therapist_detail(therapist_id):
     """获取技师详情"""
-    therapist = TherapistService.get_detail(therapist_id)
+    therapist, feedbacks = TherapistService.get_detail(therapist_id)
     if not therapist:
         return jsonify({
             'code': 404,
@@ -141,7 +249,7 @@ def get_therapist_detail(therapist_id):
                     'username': f.user.username if f.user else '匿名用户',
                     'avatar': f.user.avatar if f.user else None
                 }
-            } for f in therapist.feedbacks[:3]]  # 返回前3条评价
+            } for f in feedbacks]  # 返回最新3条评价
         }
     })
 
@@ -236,15 +344,9 @@ def reject_therapist(current_user, therapist_id):
 
 @therapist_bp.route('/my/services', methods=['GET'])
 @token_required  # 需要验证用户身份
+@therapist_required
 def get_my_services(current_user):
     """获取当前登录治疗师的专属服务套餐列表"""
-    # 检查用户是否是治疗师
-    if current_user.role != 'therapist':
-        return jsonify({
-            'code': 403,
-            'message': '权限不足，需要治疗师权限'
-        }), 403
-    
     # 获取治疗师信息
     therapist = TherapistService.get_therapist_by_user_id(current_user.id)
     if not therapist:
@@ -270,6 +372,35 @@ def get_my_services(current_user):
         }
     })
 
+@therapist_bp.route('/my/location', methods=['POST'])
+@token_required
+@therapist_required
+def update_my_location(current_user):
+    """更新当前登录技师的常驻位置"""
+    therapist = TherapistService.get_therapist_by_user_id(current_user.id)
+    if not therapist:
+        return jsonify({
+            'code': 404,
+            'message': '治疗师信息不存在'
+        }), 404
+
+    try:
+        data = request.get_json() or {}
+        therapist = TherapistService.update_location(therapist, data.get('latitude'), data.get('longitude'))
+        return jsonify({
+            'code': 200,
+            'message': '更新成功',
+            'data': {
+                'latitude': therapist.latitude,
+                'longitude': therapist.longitude
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'code': 400,
+            'message': str(e)
+        }), 400
+
 # 技师端订单管理接口
 @therapist_bp.route('/orders', methods=['GET'])
 @token_required  # 需要验证技师身份
@@ -2,7 +2,8 @@ from flask import Blueprint, request, jsonify
 from app.services.user_service import UserService
 from app.services.sms_service import SMSService
 from app.services.wechat_service import WechatService
-from app.utils.auth import token_required
+from app.utils.auth import token_required, admin_required
+from app.utils.rate_limit import rate_limit
 import json
 import logging
 
@@ -13,6 +14,7 @@ logger = logging.getLogger(__name__)
 user_bp = Blueprint('user', __name__)
 
 @user_bp.route('/register', methods=['POST'])
+@rate_limit('register', [('ip', 10, 60), ('device', 5, 60)])
 def register():
     """用户注册"""
     try:
@@ -48,6 +50,7 @@ def register():
         }), 400
 
 @user_bp.route('/login', methods=['POST'])
+@rate_limit('login', [('phone', 10, 60), ('ip', 30, 60), ('device', 20, 60)])
 def login():
     """用户登录"""
     try:
@@ -70,6 +73,7 @@ def login():
         }), 400
 
 @user_bp.route('/send-sms-code', methods=['POST'])
+@rate_limit('sms', [('phone', 1, 60), ('phone', 10, 3600), ('ip', 20, 60), ('device', 5, 60)], refund_on_error=True)
 def send_sms_code():
     """发送短信验证码"""
     try:
@@ -99,6 +103,7 @@ def send_sms_code():
         }), 400
 
 @user_bp.route('/login-with-sms', methods=['POST'])
+@rate_limit('login-sms', [('phone', 10, 60), ('ip', 30, 60), ('device', 20, 60)])
 def login_with_sms():
     """通过短信验证码登录"""
     try:
@@ -131,6 +136,7 @@ def login_with_sms():
         }), 400
 
 @user_bp.route('/login-with-wechat', methods=['POST'])
+@rate_limit('login-wechat', [('ip', 30, 60), ('device', 20, 60)])
 def login_with_wechat():
     """通过微信登录"""
     try:
@@ -244,18 +250,54 @@ def update_wechat_info(current_user):
 @token_required
 def get_user_info(current_user):
     """获取用户信息"""
+    # current_user只是鉴权快照，完整资料需要单独查询
+    user = UserService.get_user(current_user.id)
+    if not user:
+        return jsonify({
+            'code': 404,
+            'message': '用户不存在'
+        }), 404
+
     return jsonify({
         'code': 200,
         'message': 'success',
         'data': {
-            'id': current_user.id,
-            'username': current_user.username,
-            'phone': current_user.phone,
-            'email': current_user.email,
-            'avatar': current_user.avatar
+            'id': user.id,
+            'username': user.username,
+            'phone': user.phone,
+            'email': user.email,
+            'avatar': user.avatar
         }
     })
 
+@user_bp.route('/<int:user_id>/role', methods=['POST'])
+@token_required
+@admin_required
+def update_user_role(current_user, user_id):
+    """修改用户角色（管理员）"""
+    try:
+        data = request.get_json()
+        if not data or 'role' not in data:
+            return jsonify({
+                'code': 400,
+                'message': '缺少必要参数: role'
+            }), 400
+
+        user = UserService.update_role(user_id, data['role'])
+        return jsonify({
+            'code': 200,
+            'message': '角色修改成功',
+            'data': {
+                'id': user.id,
+                'role': user.role
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'code': 400,
+            'message': str(e)
+        }), 400
+
 @user_bp.route('/addresses', methods=['GET'])
 @token_required
 def get_addresses(current_user):
@@ -0,0 +1,74 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float, Boolean, Index
+from sqlalchemy.orm import relationship
+import datetime
+from app import db
+
+
+class OrderArchive(db.Model):
+    """已归档订单：字段与orders表相同，保留原订单ID，不设外键"""
+    __tablename__ = 'orders_archive'
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    order_no = Column(String(50), unique=True, nullable=False)
+    user_id = Column(Integer)
+    therapist_id = Column(Integer)
+    service_item_id = Column(Integer)
+    service_name = Column(String(100))
+    duration = Column(Integer)
+    price = Column(Float)
+    service_time = Column(DateTime)
+    service_address = Column(Text)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    contact_phone = Column(String(20))
+    status = Column(Integer)
+    remark = Column(Text)
+    payment_status = Column(Integer)
+    payment_method = Column(String(20))
+    transaction_id = Column(String(100))
+    paid_at = Column(DateTime)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.datetime.utcnow)  # 归档时间
+
+    # 只读关联，接口序列化订单时与Order用法一致
+    user = relationship("User", primaryjoin="foreign(OrderArchive.user_id) == User.id", viewonly=True)
+    therapist = relationship("Therapist", primaryjoin="foreign(OrderArchive.therapist_id) == Therapist.id",
+                             viewonly=True)
+
+    __table_args__ = (
+        # 用户、技师订单列表翻页越过热数据边界后查询归档订单
+        Index('ix_orders_archive_user_id_created_at', 'user_id', 'created_at'),
+        Index('ix_orders_archive_user_id_status_created_at', 'user_id', 'status', 'created_at'),
+        Index('ix_orders_archive_therapist_id_created_at', 'therapist_id', 'created_at'),
+        Index('ix_orders_archive_therapist_id_status_created_at', 'therapist_id', 'status', 'created_at'),
+    )
+
+
+class MessageArchive(db.Model):
+    """已归档订单的聊天消息：字段与message表相同"""
+    __tablename__ = 'message_archive'
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    sender_id = Column(Integer, nullable=False)
+    sender_role = Column(String(20), nullable=False)
+    receiver_id = Column(Integer, nullable=False)
+    receiver_role = Column(String(20), nullable=False)
+    order_id = Column(Integer, nullable=False, index=True)
+    content = Column(Text, nullable=False)
+    is_read = Column(Boolean, default=False, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+    def to_dict(self):
+        """转换为字典格式，与Message一致"""
+        return {
+            'id': self.id,
+            'sender_id': self.sender_id,
+            'sender_role': self.sender_role,
+            'receiver_id': self.receiver_id,
+            'receiver_role': self.receiver_role,
+            'order_id': self.order_id,
+            'content': self.content,
+            'is_read': self.is_read,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S')
+        }
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
 import datetime
 from app import db
@@ -8,7 +8,8 @@ class Feedback(db.Model):
     __tablename__ = 'feedbacks'
 
     id = Column(Integer, primary_key=True)
-    order_id = Column(Integer, ForeignKey('orders.id'), unique=True, nullable=False)  # 一个订单只能评价一次
+    # 订单归档后评价仍保留，不设orders外键；一个订单只能评价一次
+    order_id = Column(Integer, unique=True, nullable=False)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     therapist_id = Column(Integer, ForeignKey('therapists.id'), nullable=False)
     rating = Column(Float, nullable=False)  # 评分，1-5分
@@ -20,7 +21,15 @@ class Feedback(db.Model):
     # 关系
     user = relationship("User", back_populates="feedbacks")
     therapist = relationship("Therapist", back_populates="feedbacks")
-    order = relationship("Order", back_populates="feedback")
+    order = relationship("Order", back_populates="feedback", primaryjoin="foreign(Feedback.order_id) == Order.id")
+    # 订单归档后从归档表读取订单信息
+    archived_order = relationship("OrderArchive", primaryjoin="foreign(Feedback.order_id) == OrderArchive.id",
+                                  viewonly=True)
+
+    __table_args__ = (
+        # 技师详情页按时间倒序取最新评价
+        Index('ix_feedbacks_therapist_id_created_at', 'therapist_id', 'created_at'),
+    )
 
 
 # 也可以在用户和技师模型中添加反向关系
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, UniqueConstraint
+import datetime
+from app import db
+
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+
+    id = Column(Integer, primary_key=True)
+    scope = Column(String(50), nullable=False)  # 接口名称，如 order_create / payment_callback
+    key = Column(String(200), nullable=False)  # 幂等键（客户端Idempotency-Key或支付交易号）
+    fingerprint = Column(String(64), nullable=False)  # 请求内容的sha256，同一个键只能用于相同的请求
+    status_code = Column(Integer)  # 已完成请求的HTTP状态码，为空表示处理中
+    response = Column(Text)  # 已完成请求的响应内容
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        # 并发的重复请求只有一个能插入成功
+        UniqueConstraint('scope', 'key', name='uq_idempotency_keys_scope_key'),
+    )
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.scope}:{self.key}>'
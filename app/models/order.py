@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
 import datetime
 from app import db
@@ -17,6 +17,8 @@ class Order(db.Model):
     price = Column(Float)  # 价格
     service_time = Column(DateTime)  # 服务时间
     service_address = Column(Text)  # 服务地址
+    latitude = Column(Float)  # 服务地址纬度，自动派单时按距离匹配技师
+    longitude = Column(Float)  # 服务地址经度
     contact_phone = Column(String(20))  # 联系电话
     status = Column(Integer, default=0)  # 0:待接单, 1:已接单, 2:技师出发, 3:服务中, 4:已完成, 5:已取消
     remark = Column(Text)  # 备注
@@ -30,7 +32,20 @@ class Order(db.Model):
 
     user = relationship("User", back_populates="orders")
     therapist = relationship("Therapist", back_populates="orders")
-    feedback = relationship("Feedback", back_populates="order", uselist=False)
+    feedback = relationship("Feedback", back_populates="order", uselist=False,
+                            primaryjoin="Order.id == foreign(Feedback.order_id)")
+
+    __table_args__ = (
+        # 预约时按技师和服务时间范围检查时段冲突
+        Index('ix_orders_therapist_id_service_time', 'therapist_id', 'service_time'),
+        # 用户、技师订单列表按状态筛选并按创建时间倒序分页
+        Index('ix_orders_user_id_status_created_at', 'user_id', 'status', 'created_at'),
+        Index('ix_orders_therapist_id_status_created_at', 'therapist_id', 'status', 'created_at'),
+        # 启动时加载待超时取消的订单
+        Index('ix_orders_status_created_at', 'status', 'created_at'),
+        # 可预约时段索引按updated_at增量同步其他进程的订单变更
+        Index('ix_orders_updated_at', 'updated_at'),
+    )
 
 
 class OrderStatus:
@@ -0,0 +1,40 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float, Index
+import datetime
+from app import db
+
+
+class JournalState:
+    PENDING = 0  # 待处理
+    PROCESSING = 1  # 已被工作线程领取
+    APPLIED = 2  # 已写入订单
+    FAILED = 3  # 处理失败（如订单不存在）
+
+
+class PaymentCallbackJournal(db.Model):
+    """支付回调日志：回调先追加到这里再确认，由后台线程批量写入订单"""
+    __tablename__ = 'payment_callback_journal'
+
+    id = Column(Integer, primary_key=True)
+    order_no = Column(String(50), nullable=False)
+    transaction_id = Column(String(100), nullable=False)
+    payment_method = Column(String(20))
+    amount = Column(Float)
+    status = Column(String(20))  # 支付平台返回的支付结果，success表示成功
+    payload = Column(Text)  # 原始回调数据(JSON)
+    state = Column(Integer, default=JournalState.PENDING, nullable=False)
+    claim_token = Column(String(32))  # 领取该记录的工作线程批次
+    claimed_at = Column(DateTime)
+    attempts = Column(Integer, default=0)
+    error = Column(String(255))
+    received_at = Column(DateTime, default=datetime.datetime.now)  # 收到回调的时间，作为订单的支付时间
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    applied_at = Column(DateTime)
+
+    __table_args__ = (
+        # 工作线程按状态领取最早的记录
+        Index('ix_payment_callback_journal_state_id', 'state', 'id'),
+        Index('ix_payment_callback_journal_claim_token', 'claim_token'),
+    )
+
+    def __repr__(self):
+        return f'<PaymentCallbackJournal {self.id} {self.order_no}>'
@@ -9,6 +9,7 @@ class SMSCode(db.Model):
     phone = Column(String(20), nullable=False, index=True)
     code = Column(String(10), nullable=False)
     status = Column(Integer, default=0)  # 0:未使用, 1:已使用, 2:已过期
+    attempts = Column(Integer, default=0)  # 校验失败次数
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     expires_at = Column(DateTime, nullable=False)
 
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String, DateTime
+from app import db
+
+
+class TaskLease(db.Model):
+    """后台任务租约：多个进程同时启动时，只有领取到租约的进程执行该任务"""
+    __tablename__ = 'task_leases'
+
+    name = Column(String(50), primary_key=True)  # 任务名称
+    owner = Column(String(100), nullable=False)  # 占用者：主机名:进程号
+    expires_at = Column(DateTime, nullable=False)  # 过期后可被其他进程领取
+
+    def __repr__(self):
+        return f'<TaskLease {self.name}: {self.owner}>'
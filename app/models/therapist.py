@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float, Numeric, Index
 from sqlalchemy.orm import relationship
 import datetime
 from app import db
+from app.utils.geo import geo_cell
 
 
 class Therapist(db.Model):
@@ -19,11 +20,17 @@ class Therapist(db.Model):
     certification = Column(String(255))  # 资格证书
     experience_years = Column(Integer)  # 经验年限
     specialty = Column(String(255))  # 专长
-    rating = Column(Float, default=5.0)  # 评分
-    service_count = Column(Integer, default=0)  # 服务次数
+    # 评分，由rating_sum/rating_count计算，暂无评价时为默认值；定点数保证游标分页按评分等值比较时精确匹配
+    rating = Column(Numeric(3, 2, asdecimal=False), default=5.0, nullable=False)
+    rating_sum = Column(Float, default=0, nullable=False)  # 评价分数总和
+    rating_count = Column(Integer, default=0, nullable=False)  # 评价条数
+    service_count = Column(Integer, default=0, nullable=False)  # 服务次数
     status = Column(Integer, default=0)  # 0:待审核, 1:正常, 2:暂停
     avatar = Column(String(255))  # 头像
     introduction = Column(Text)  # 简介
+    latitude = Column(Float)  # 常驻位置纬度
+    longitude = Column(Float)  # 常驻位置经度
+    geo_cell = Column(Integer)  # 位置所在网格编号，用于附近技师查询
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
 
@@ -32,6 +39,19 @@ class Therapist(db.Model):
     orders = relationship("Order", back_populates="therapist")
     feedbacks = relationship("Feedback", back_populates="therapist")
 
+    __table_args__ = (
+        # 技师列表按评分、接单数排序的游标分页
+        Index('ix_therapists_status_rating_service_count_id', 'status', 'rating', 'service_count', 'id'),
+        # 附近技师按网格预筛选，包含经纬度和评分，候选集只需扫描索引
+        Index('ix_therapists_status_geo_cell', 'status', 'geo_cell', 'latitude', 'longitude', 'rating'),
+    )
+
+    def set_location(self, latitude, longitude):
+        """设置位置并同步网格编号"""
+        self.latitude = latitude
+        self.longitude = longitude
+        self.geo_cell = geo_cell(latitude, longitude)
+
 
 class ServiceItem(db.Model):
     __tablename__ = 'service_items'
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float
 from sqlalchemy.orm import relationship
 import datetime
 from app import db
@@ -6,15 +6,20 @@ from app import db
 
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # 鉴权时增量同步token版本号：token_version > 0 AND updated_at >= ?
+        db.Index('ix_users_token_version_updated_at', 'token_version', 'updated_at'),
+    )
 
     id = Column(Integer, primary_key=True)
-    username = Column(String(50), nullable=False)
+    username = Column(String(50), nullable=False, index=True)
     phone = Column(String(20), unique=True, nullable=False)
     email = Column(String(100))
     password_hash = Column(String(100))  # 密码哈希
     avatar = Column(String(255))
     status = Column(Integer, default=1)  # 1:正常, 0:禁用
     role = Column(String(20), default='user')  # user:普通用户, therapist:治疗师, admin:管理员
+    token_version = Column(Integer, default=0, nullable=False)  # 角色/状态变更时递增，使旧token的声明失效
     wx_openid = Column(String(100), unique=True)  # 微信openid
     wx_unionid = Column(String(100), unique=True)  # 微信unionid（如果有）
     wx_nickname = Column(String(100))  # 微信昵称
@@ -35,8 +40,8 @@ class UserAddress(db.Model):
     user_id = Column(Integer, db.ForeignKey('users.id'))
     name = Column(String(50))  # 地址名称
     address = Column(Text, nullable=False)  # 详细地址
-    latitude = Column(String(20))  # 纬度
-    longitude = Column(String(20))  # 经度
+    latitude = Column(Float)  # 纬度
+    longitude = Column(Float)  # 经度
     is_default = Column(Integer, default=0)  # 是否默认地址
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
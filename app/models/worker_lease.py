@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from app import db
+
+
+class WorkerLease(db.Model):
+    """雪花ID机器号租约，每个进程占用一个机器号并定期续约"""
+    __tablename__ = 'worker_leases'
+
+    worker_id = Column(Integer, primary_key=True, autoincrement=False)  # 机器号(0-1023)
+    owner = Column(String(100), nullable=False)  # 占用者：主机名:进程号:随机串
+    expires_at = Column(DateTime, nullable=False)  # 过期后可被其他进程领取
+
+    def __repr__(self):
+        return f'<WorkerLease {self.worker_id}: {self.owner}>'
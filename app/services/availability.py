@@ -0,0 +1,270 @@
+import bisect
+import datetime
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models.order import Order, OrderStatus
+from app.models.therapist import Therapist
+from app.utils import metrics
+
+# 订单未记录时长时按60分钟占用
+DEFAULT_DURATION = 60
+# 建索引时只加载开始时间在此范围之后的订单，更早的订单不会影响可预约时段
+LOOKBACK = datetime.timedelta(days=1)
+
+
+def order_interval(order):
+    """订单占用的时间段[开始, 结束)，没有服务时间的订单返回None"""
+    if order.service_time is None:
+        return None
+    minutes = order.duration or DEFAULT_DURATION
+    return order.service_time, order.service_time + datetime.timedelta(minutes=minutes)
+
+
+class TherapistSchedule:
+    """单个技师的已占用时段，按开始时间排序，并维护结束时间的前缀最大值，任意时段的冲突判断只需一次二分查找"""
+    __slots__ = ('starts', 'ends', 'order_ids', 'max_ends')
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.order_ids = []
+        self.max_ends = []
+
+    @classmethod
+    def build(cls, intervals):
+        """由[(order_id, start, end), ...]批量构建"""
+        schedule = cls()
+        for order_id, start, end in sorted(intervals, key=lambda item: item[1]):
+            schedule.starts.append(start)
+            schedule.ends.append(end)
+            schedule.order_ids.append(order_id)
+            schedule.max_ends.append(end)
+        if schedule.ends:
+            schedule._refresh(0)
+        return schedule
+
+    def add(self, order_id, start, end):
+        i = bisect.bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.order_ids.insert(i, order_id)
+        self.max_ends.insert(i, end)
+        self._refresh(i)
+
+    def remove(self, order_id, start):
+        i = bisect.bisect_left(self.starts, start)
+        while i < len(self.starts) and self.starts[i] == start:
+            if self.order_ids[i] == order_id:
+                del self.starts[i], self.ends[i], self.order_ids[i], self.max_ends[i]
+                self._refresh(i)
+                return
+            i += 1
+
+    def _refresh(self, i):
+        # 从位置i开始重算前缀最大值
+        current = self.max_ends[i - 1] if i > 0 else None
+        for j in range(i, len(self.ends)):
+            if current is None or self.ends[j] > current:
+                current = self.ends[j]
+            self.max_ends[j] = current
+
+    def is_free(self, start, end):
+        # 开始时间早于end的订单中，只要最晚结束时间不晚于start，就没有重叠
+        i = bisect.bisect_left(self.starts, end)
+        return i == 0 or self.max_ends[i - 1] <= start
+
+    def __len__(self):
+        return len(self.starts)
+
+
+class AvailabilityIndex:
+    """
+    技师可预约时段索引（每个进程一份），由未取消的订单构建
+    本进程提交的订单变更立即生效，其他进程的变更按updated_at定期增量同步
+    """
+
+    def __init__(self, sync_interval=30):
+        self.sync_interval = sync_interval
+        self._schedules = {}
+        self._orders = {}  # order_id -> (therapist_id, start)
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()  # 同一时间只有一个线程查询数据库同步
+        self._pending = None  # 同步查询期间本进程提交的订单变更，查询结果写入后重新应用
+        self._loaded = False
+        self._synced_at = None
+        self.queries = 0
+
+    def configure(self, sync_interval=None):
+        if sync_interval is not None:
+            self.sync_interval = sync_interval
+
+    def is_free(self, therapist_id, start, duration):
+        """技师在[start, start + duration分钟)内是否空闲"""
+        self._sync()
+        end = start + datetime.timedelta(minutes=duration)
+        with self._lock:
+            self.queries += 1
+            schedule = self._schedules.get(therapist_id)
+            return schedule is None or schedule.is_free(start, end)
+
+    def free_therapists(self, start, duration, therapist_ids):
+        """从therapist_ids中筛选出在该时段空闲的技师，保持原有顺序"""
+        self._sync()
+        end = start + datetime.timedelta(minutes=duration)
+        with self._lock:
+            self.queries += 1
+            result = []
+            for therapist_id in therapist_ids:
+                schedule = self._schedules.get(therapist_id)
+                if schedule is None or schedule.is_free(start, end):
+                    result.append(therapist_id)
+            return result
+
+    def apply(self, order_id, therapist_id, interval, active):
+        """写入订单的最新状态：有效订单占用时段，取消或删除的订单释放时段"""
+        with self._lock:
+            if self._pending is not None:
+                self._pending[order_id] = (therapist_id, interval, active)
+            self._apply(order_id, therapist_id, interval, active)
+
+    def _apply(self, order_id, therapist_id, interval, active):
+        with self._lock:
+            previous = self._orders.pop(order_id, None)
+            if previous is not None:
+                schedule = self._schedules.get(previous[0])
+                if schedule is not None:
+                    schedule.remove(order_id, previous[1])
+                    if not schedule:
+                        del self._schedules[previous[0]]
+            if active and therapist_id is not None and interval is not None:
+                self._schedules.setdefault(therapist_id, TherapistSchedule()).add(order_id, *interval)
+                self._orders[order_id] = (therapist_id, interval[0])
+
+    def reset(self):
+        """清空索引，下次查询时从数据库重新加载"""
+        with self._lock:
+            self._schedules = {}
+            self._orders = {}
+            self._loaded = False
+            self._synced_at = None
+
+    def _sync_due(self, now):
+        return not self._loaded or (now - self._synced_at).total_seconds() >= self.sync_interval
+
+    def _sync(self):
+        now = datetime.datetime.utcnow()
+        with self._lock:
+            if not self._sync_due(now):
+                return
+        # 首次加载时索引为空，需要等待；增量同步已由其他线程执行时直接使用当前索引，不阻塞下单
+        if not self._sync_lock.acquire(blocking=not self._loaded):
+            return
+        try:
+            with self._lock:
+                if not self._sync_due(now):
+                    return
+                loaded, since = self._loaded, self._synced_at
+                self._pending = {}
+
+            # 查询数据库时不持有索引锁，其他线程照常查询和写入索引
+            try:
+                query = db.session.query(
+                    Order.id, Order.therapist_id, Order.service_time, Order.duration, Order.status
+                )
+                if loaded:
+                    # 走updated_at索引；多回看一个周期，避免漏掉同步期间提交的更新
+                    rows = query.filter(
+                        Order.updated_at >= since - datetime.timedelta(seconds=self.sync_interval)
+                    ).all()
+                else:
+                    rows = query.filter(Order.status != OrderStatus.CANCELLED,
+                                        Order.service_time >= datetime.datetime.now() - LOOKBACK).all()
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+
+            with self._lock:
+                pending, self._pending = self._pending, None
+                if loaded:
+                    for order in rows:
+                        # 查询期间本进程提交的变更比查询结果新，保留
+                        if order.id not in pending:
+                            self._apply(order.id, order.therapist_id, order_interval(order),
+                                        order.status != OrderStatus.CANCELLED)
+                else:
+                    self._load(rows)
+                    for order_id, change in pending.items():
+                        self._apply(order_id, *change)
+                self._loaded = True
+                self._synced_at = now
+        finally:
+            self._sync_lock.release()
+
+    def _load(self, rows):
+        # 首次加载时按技师分组后批量构建，避免逐条插入
+        self._schedules = {}
+        self._orders = {}
+        grouped = {}
+        for order in rows:
+            interval = order_interval(order)
+            if order.therapist_id is None or interval is None:
+                continue
+            grouped.setdefault(order.therapist_id, []).append((order.id, *interval))
+            self._orders[order.id] = (order.therapist_id, interval[0])
+        for therapist_id, intervals in grouped.items():
+            self._schedules[therapist_id] = TherapistSchedule.build(intervals)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'therapists': len(self._schedules),
+                'orders': len(self._orders),
+                'queries': self.queries
+            }
+
+
+availability_index = AvailabilityIndex()
+metrics.register('availability', availability_index.stats)
+
+
+def list_free_therapists(start, duration, limit=None):
+    """列出在该时段空闲的审核通过技师，按评分和接单数排序"""
+    ids = [row[0] for row in db.session.query(Therapist.id).filter_by(status=1).order_by(
+        Therapist.rating.desc(), Therapist.service_count.desc(), Therapist.id.desc())]
+    free_ids = availability_index.free_therapists(start, duration, ids)
+    if limit is not None:
+        free_ids = free_ids[:limit]
+    therapists = {t.id: t for t in Therapist.query.filter(Therapist.id.in_(free_ids)).all()} if free_ids else {}
+    return [therapists[i] for i in free_ids if i in therapists]
+
+
+# 订单变更在事务提交后才写入索引，回滚的变更不会影响可预约时段
+@event.listens_for(Session, 'after_flush')
+def _collect_order_changes(session, flush_context):
+    # flush后主键已生成，提交后属性会过期，因此在这里记录订单的最新状态
+    changes = session.info.setdefault('availability_changes', {})
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Order):
+            changes[obj.id] = (obj.therapist_id, order_interval(obj), obj.status != OrderStatus.CANCELLED)
+    for obj in session.deleted:
+        if isinstance(obj, Order):
+            changes[obj.id] = (obj.therapist_id, None, False)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_order_changes(session):
+    changes = session.info.pop('availability_changes', None)
+    if not changes:
+        return
+    for order_id, (therapist_id, interval, active) in changes.items():
+        availability_index.apply(order_id, therapist_id, interval, active)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_order_changes(session):
+    session.info.pop('availability_changes', None)
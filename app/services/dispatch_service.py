@@ -0,0 +1,351 @@
+import heapq
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import func
+
+from app import db
+from app.models.order import Order, OrderStatus
+from app.models.therapist import Therapist, therapist_services
+from app.services.availability import availability_index, DEFAULT_DURATION
+from app.services.order_service import OrderService
+from app.utils.geo import bounding_box, cells_in_box, distance_from
+from app.utils.task_lease import acquire_task_lease
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# 订单已被取消或已由其他进程派出
+_GONE = object()
+
+# 计入技师当前负载的订单状态
+ACTIVE_STATUSES = (OrderStatus.PENDING, OrderStatus.ACCEPTED, OrderStatus.ON_THE_WAY, OrderStatus.IN_SERVICE)
+
+
+class DispatchEngine:
+    """
+    自动派单：未指定技师的订单进入队列，工作线程按小批量撮合
+    候选技师需审核通过、能提供该服务项目、在服务半径内且该时段空闲，按距离、评分和当前负载综合打分
+    """
+
+    def __init__(self, batch_size=50, batch_wait=0.05, radius_km=10, max_load=5,
+                 distance_weight=0.5, rating_weight=0.3, load_weight=0.2,
+                 max_attempts=3, retry_delay=30, recover_lease_ttl=60, queue_size=10000):
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.radius_km = radius_km
+        self.max_load = max_load
+        self.distance_weight = distance_weight
+        self.rating_weight = rating_weight
+        self.load_weight = load_weight
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.recover_lease_ttl = recover_lease_ttl
+        self.app = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._delayed = []  # (重试时间, 订单ID)，只由工作线程读写
+        self._submitted_at = {}
+        self._attempts = {}
+        self._thread = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=10000)
+        self.matched = 0
+        self.unmatched = 0
+        self.errors = 0
+        self.batches = 0
+
+    def configure(self, app=None, **options):
+        """按应用配置调整参数，值为None的参数保持不变"""
+        if app is not None:
+            self.app = app
+        for name, value in options.items():
+            if value is not None:
+                setattr(self, name, value)
+
+    def submit(self, order_id):
+        """提交待派单的订单，立即返回"""
+        with self._lock:
+            self._submitted_at.setdefault(order_id, time.monotonic())
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(order_id)
+        except queue.Full:
+            # 队列满时订单保持未派单状态，由recover()重新入队
+            logger.warning(f"派单队列已满，订单{order_id}稍后重试")
+
+    def start(self):
+        """
+        恢复尚未派单的订单并启动工作线程，需在应用上下文中调用，重复调用时忽略
+        多个进程同时启动时只由领取到租约的一个进程恢复，避免同一批订单在各进程中重复撮合
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+        count = self.recover() if acquire_task_lease('dispatch_recover', self.recover_lease_ttl) else 0
+        self._ensure_started()
+        logger.info(f"派单引擎已启动，恢复了{count}个待派单订单")
+
+    def recover(self):
+        """把数据库中尚未派单的订单重新入队，用于进程重启后恢复"""
+        ids = [row[0] for row in db.session.query(Order.id).filter(
+            Order.therapist_id.is_(None), Order.status == OrderStatus.PENDING
+        ).order_by(Order.id)]
+        for order_id in ids:
+            self.submit(order_id)
+        return len(ids)
+
+    def join(self, timeout=5):
+        """等待队列中已有订单处理完（用于测试和模拟器）"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self._queue.unfinished_tasks == 0
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            if self.app is None:
+                raise RuntimeError("派单引擎未初始化，请先调用configure(app=app)")
+            self._thread = threading.Thread(target=self._run, name='order-dispatch', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch, queued = self._next_batch()
+            try:
+                with self.app.app_context():
+                    retry = self.dispatch_batch(batch)
+            except Exception as e:
+                logger.error(f"派单异常: {str(e)}", exc_info=True)
+                with self._lock:
+                    self.errors += 1
+                # 异常和未匹配一样计入派单次数，持续失败的订单不会无限重试
+                retry = self._retry_or_give_up(batch)
+            finally:
+                for _ in range(queued):
+                    self._queue.task_done()
+            retry_at = time.monotonic() + self.retry_delay
+            for order_id in retry:
+                heapq.heappush(self._delayed, (retry_at, order_id))
+
+    def _next_batch(self):
+        """
+        取一批订单：先取已到重试时间的订单，再从队列中凑满一批
+        :return: (订单ID列表, 其中从队列取出的条数)
+        """
+        batch = self._pop_due()
+        queued = 0
+        while not batch:
+            # 队列为空时等到最早的重试时间，没有待重试的订单时一直等待新订单
+            timeout = max(self._delayed[0][0] - time.monotonic(), 0) if self._delayed else None
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+                queued += 1
+            except queue.Empty:
+                batch = self._pop_due()
+
+        # 短暂等待以凑满一批
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+                queued += 1
+            except queue.Empty:
+                break
+        return batch, queued
+
+    def _pop_due(self):
+        now = time.monotonic()
+        due = []
+        while self._delayed and self._delayed[0][0] <= now and len(due) < self.batch_size:
+            due.append(heapq.heappop(self._delayed)[1])
+        return due
+
+    def dispatch_batch(self, order_ids):
+        """
+        撮合一批订单，按下单先后依次为每个订单选择得分最高的技师
+        :return: 本轮没有匹配到技师、需要稍后重试的订单ID
+        """
+        # 只取撮合需要的字段：派单提交后ORM对象会过期，逐个访问会重新查库
+        orders = db.session.query(
+            Order.id, Order.service_item_id, Order.latitude, Order.longitude, Order.service_time, Order.duration
+        ).filter(
+            Order.id.in_(set(order_ids)), Order.therapist_id.is_(None), Order.status == OrderStatus.PENDING
+        ).order_by(Order.id).all()
+        found = {order.id for order in orders}
+        self._forget([order_id for order_id in order_ids if order_id not in found])
+        if not orders:
+            return []
+
+        with self._lock:
+            self.batches += 1
+
+        # 一次查出覆盖整批订单的网格内、能提供这些服务项目的技师，再逐单在内存中筛选
+        boxes = {order.id: bounding_box(order.latitude, order.longitude, self.radius_km)
+                 for order in orders if order.latitude is not None and order.longitude is not None}
+        cells = {cell: None for box in boxes.values() for cell in cells_in_box(*box)}
+        by_cell = self._therapists_in_cells(list(cells), {order.service_item_id for order in orders})
+        candidates = {order.id: self._nearby(order, boxes.get(order.id), by_cell) for order in orders}
+        loads = self._loads({t[0] for cs in candidates.values() for t in cs})
+
+        # 每个订单单独提交，技师行锁只持有到本单提交；多个进程并发派单时发生死锁也只影响当前订单
+        matched, unmatched, gone, failed = [], [], [], []
+        for order in orders:
+            try:
+                therapist_id = self._assign(order, candidates[order.id], loads)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.warning(f"订单{order.id}派单失败: {str(e)}")
+                failed.append(order.id)
+                continue
+            if therapist_id is _GONE:
+                gone.append(order.id)
+            elif therapist_id is not None:
+                loads[therapist_id] = loads.get(therapist_id, 0) + 1
+                matched.append(order.id)
+                self._record_match(order.id)
+            else:
+                unmatched.append(order.id)
+
+        self._forget(gone)
+        with self._lock:
+            self.unmatched += len(unmatched)
+            self.errors += len(failed)
+        return self._retry_or_give_up(unmatched + failed)
+
+    def _retry_or_give_up(self, order_ids):
+        """累加派单次数，返回还可以重试的订单，达到上限的订单等待人工处理"""
+        retry = []
+        for order_id in order_ids:
+            with self._lock:
+                attempts = self._attempts.get(order_id, 0) + 1
+                self._attempts[order_id] = attempts
+            if attempts < self.max_attempts:
+                retry.append(order_id)
+            else:
+                logger.warning(f"订单{order_id}多次派单失败，等待人工处理")
+                self._forget([order_id])
+        return retry
+
+    @staticmethod
+    def _therapists_in_cells(cells, service_item_ids):
+        """网格编号 -> [(技师ID, 纬度, 经度, 评分, 可提供的服务项目), ...]"""
+        if not cells:
+            return {}
+        rows = db.session.query(
+            Therapist.id, Therapist.latitude, Therapist.longitude, Therapist.rating, Therapist.geo_cell,
+            therapist_services.c.service_item_id
+        ).join(therapist_services, therapist_services.c.therapist_id == Therapist.id).filter(
+            Therapist.status == 1,
+            Therapist.geo_cell.in_(cells),
+            therapist_services.c.service_item_id.in_(service_item_ids)
+        )
+        therapists = {}
+        for therapist_id, lat, lon, rating, cell, service_item_id in rows:
+            if therapist_id not in therapists:
+                therapists[therapist_id] = (therapist_id, lat, lon, rating or 0, cell, set())
+            therapists[therapist_id][5].add(service_item_id)
+        by_cell = {}
+        for therapist in therapists.values():
+            by_cell.setdefault(therapist[4], []).append(therapist)
+        return by_cell
+
+    def _nearby(self, order, box, by_cell):
+        """服务半径内能提供该服务的技师 [(技师ID, 距离, 评分), ...]"""
+        if box is None:
+            return []
+        min_lat, max_lat, min_lon, max_lon = box
+        distance_to = distance_from(order.latitude, order.longitude)
+        result = []
+        for cell in cells_in_box(*box):
+            for therapist_id, lat, lon, rating, _, service_item_ids in by_cell.get(cell, ()):
+                if order.service_item_id not in service_item_ids or not min_lat <= lat <= max_lat:
+                    continue
+                if min_lon >= -180 and max_lon <= 180 and not min_lon <= lon <= max_lon:
+                    continue
+                distance = distance_to(lat, lon)
+                if distance <= self.radius_km:
+                    result.append((therapist_id, distance, rating))
+        return result
+
+    def _loads(self, therapist_ids):
+        # 技师当前未完成的订单数
+        if not therapist_ids:
+            return {}
+        rows = db.session.query(Order.therapist_id, func.count(Order.id)).filter(
+            Order.therapist_id.in_(therapist_ids), Order.status.in_(ACTIVE_STATUSES)
+        ).group_by(Order.therapist_id)
+        return dict(rows.all())
+
+    def score(self, distance, rating, load):
+        """候选技师得分，越高越优先"""
+        return (self.distance_weight * (1 - distance / self.radius_km)
+                + self.rating_weight * rating / 5
+                + self.load_weight / (1 + load))
+
+    def _assign(self, order, candidates, loads):
+        duration = order.duration or DEFAULT_DURATION
+        ranked = sorted(
+            ((self.score(distance, rating, loads.get(therapist_id, 0)), therapist_id)
+             for therapist_id, distance, rating in candidates
+             if loads.get(therapist_id, 0) < self.max_load),
+            reverse=True
+        )
+        for _, therapist_id in ranked:
+            if not availability_index.is_free(therapist_id, order.service_time, duration):
+                continue
+            # 与create_order一样锁定技师后复查时段冲突（SQLite下为数据库写锁），直到本单提交才释放
+            OrderService._lock_therapist(therapist_id)
+            locked = Order.query.filter_by(
+                id=order.id, therapist_id=None, status=OrderStatus.PENDING
+            ).with_for_update().first()
+            if locked is None:
+                return _GONE
+            if OrderService._has_conflict(therapist_id, order.service_time, duration):
+                continue
+            locked.therapist_id = therapist_id
+            db.session.flush()
+            return therapist_id
+        return None
+
+    def _record_match(self, order_id):
+        with self._lock:
+            self.matched += 1
+            self._attempts.pop(order_id, None)
+            submitted_at = self._submitted_at.pop(order_id, None)
+            if submitted_at is not None:
+                self._latencies.append(time.monotonic() - submitted_at)
+
+    def _forget(self, order_ids):
+        with self._lock:
+            for order_id in order_ids:
+                self._submitted_at.pop(order_id, None)
+                self._attempts.pop(order_id, None)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                'queue_depth': self._queue.qsize(),
+                'delayed': len(self._delayed),
+                'batches': self.batches,
+                'matched': self.matched,
+                'unmatched': self.unmatched,
+                'errors': self.errors,
+                'latency_p50_ms': round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+                'latency_p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2) if latencies else None
+            }
+
+
+dispatch_engine = DispatchEngine()
+metrics.register('dispatch', dispatch_engine.stats)
@@ -2,8 +2,12 @@ from app.models.feedback import Feedback
 from app.models.order import Order, OrderStatus
 from app.models.user import User
 from app.models.therapist import Therapist
+from app.services.order_archive import OrderArchiveService
 from app import db
-from sqlalchemy import func
+from sqlalchemy import func, case, update
+
+# 暂无评价的技师展示的评分
+DEFAULT_RATING = 5.0
 
 
 class FeedbackService:
@@ -12,6 +16,11 @@ class FeedbackService:
         """创建评价"""
         # 验证订单
         order = Order.query.filter_by(id=order_id, user_id=user_id, status=OrderStatus.COMPLETED).first()
+        if not order:
+            # 较早的订单可能已归档
+            order = OrderArchiveService.find_order(user_id, order_id)
+            if order and order.status != OrderStatus.COMPLETED:
+                order = None
         if not order:
             raise Exception("订单不存在或未完成，无法评价")
 
@@ -35,14 +44,11 @@ class FeedbackService:
             tags=','.join(data.get('tags', [])) if data.get('tags') else None
         )
 
-        # 更新技师的平均评分
-        therapist = Therapist.query.get(order.therapist_id)
-        if therapist:
-            # 计算新的平均评分
-            avg_rating = db.session.query(func.avg(Feedback.rating)).filter_by(therapist_id=order.therapist_id).scalar() or 0
-            therapist.rating = round(float(avg_rating), 1) if avg_rating else 0
-
         db.session.add(feedback)
+
+        # 在同一事务内累加技师的评分汇总
+        FeedbackService._apply_rating_delta(order.therapist_id, rating, 1)
+
         db.session.commit()
         return feedback
 
@@ -91,6 +97,8 @@ class FeedbackService:
             rating = data['rating']
             if rating < 1 or rating > 5:
                 raise Exception("评分必须在1-5分之间")
+            # 评分汇总只需加上新旧评分的差值
+            FeedbackService._apply_rating_delta(feedback.therapist_id, rating - feedback.rating, 0)
             feedback.rating = rating
 
         if 'content' in data:
@@ -99,12 +107,6 @@ class FeedbackService:
         if 'tags' in data:
             feedback.tags = ','.join(data['tags']) if data['tags'] else None
 
-        # 更新技师的平均评分
-        therapist = Therapist.query.get(feedback.therapist_id)
-        if therapist:
-            avg_rating = db.session.query(func.avg(Feedback.rating)).filter_by(therapist_id=feedback.therapist_id).scalar() or 0
-            therapist.rating = round(float(avg_rating), 1) if avg_rating else 0
-
         db.session.commit()
         return feedback
 
@@ -115,21 +117,58 @@ class FeedbackService:
         if not feedback:
             raise Exception("评价不存在或无权限删除")
 
-        # 先获取技师ID，用于后续更新评分
-        therapist_id = feedback.therapist_id
+        # 从技师的评分汇总中扣除该评价
+        FeedbackService._apply_rating_delta(feedback.therapist_id, -feedback.rating, -1)
 
         # 删除评价
         db.session.delete(feedback)
-
-        # 更新技师的平均评分
-        therapist = Therapist.query.get(therapist_id)
-        if therapist:
-            avg_rating = db.session.query(func.avg(Feedback.rating)).filter_by(therapist_id=therapist_id).scalar() or 0
-            therapist.rating = round(float(avg_rating), 1) if avg_rating else 0
-
         db.session.commit()
         return True
 
+    @staticmethod
+    def _apply_rating_delta(therapist_id, rating_delta, count_delta):
+        """按增量更新技师评分汇总，单条UPDATE完成，不扫描该技师的全部评价"""
+        new_count = Therapist.rating_count + count_delta
+        new_sum = Therapist.rating_sum + rating_delta
+        # rating放在最前面：MySQL按顺序赋值，后面的列会读到已更新的值
+        stmt = update(Therapist).where(Therapist.id == therapist_id).ordered_values(
+            (Therapist.rating, case((new_count > 0, func.round(new_sum / new_count, 1)), else_=DEFAULT_RATING)),
+            (Therapist.rating_sum, new_sum),
+            (Therapist.rating_count, new_count)
+        )
+        db.session.execute(stmt, execution_options={'synchronize_session': False})
+
+    @staticmethod
+    def reconcile_ratings(batch_size=500):
+        """
+        从评价表重新统计所有技师的评分汇总，用于修复增量更新产生的偏差
+        :return: 被修正的技师数量
+        """
+        totals = {
+            therapist_id: (float(rating_sum), count)
+            for therapist_id, rating_sum, count in db.session.query(
+                Feedback.therapist_id, func.sum(Feedback.rating), func.count(Feedback.id)
+            ).group_by(Feedback.therapist_id)
+        }
+
+        fixed = 0
+        last_id = 0
+        while True:
+            therapists = Therapist.query.filter(Therapist.id > last_id).order_by(Therapist.id).limit(batch_size).all()
+            if not therapists:
+                break
+            for therapist in therapists:
+                rating_sum, count = totals.get(therapist.id, (0.0, 0))
+                rating = round(rating_sum / count, 1) if count else DEFAULT_RATING
+                if (therapist.rating_sum, therapist.rating_count, therapist.rating) != (rating_sum, count, rating):
+                    therapist.rating_sum = rating_sum
+                    therapist.rating_count = count
+                    therapist.rating = rating
+                    fixed += 1
+            db.session.commit()
+            last_id = therapists[-1].id
+        return fixed
+
     @staticmethod
     def get_user_feedbacks(user_id, page, size):
         """获取用户的评价历史"""
@@ -1,4 +1,5 @@
 from app.models.message import Message
+from app.models.archive import MessageArchive
 from app import db
 from datetime import datetime
 
@@ -63,6 +64,10 @@ class MessageService:
         
         # 分页查询
         pagination = query.paginate(page=page, per_page=size, error_out=False)
+
+        if pagination.total == 0:
+            # 订单已归档时从归档表读取，归档消息只读，不再标记已读
+            return MessageService._get_archived_history(user_id, user_role, order_id, page, size)
         
         # 标记当前用户收到的消息为已读
         unread_messages = Message.query.filter_by(
@@ -83,6 +88,22 @@ class MessageService:
             'page': page,
             'size': size
         }
+
+    @staticmethod
+    def _get_archived_history(user_id, user_role, order_id, page, size):
+        """查询已归档订单的消息历史"""
+        query = MessageArchive.query.filter_by(order_id=order_id)
+        query = query.filter(
+            ((MessageArchive.sender_id == user_id) & (MessageArchive.sender_role == user_role)) |
+            ((MessageArchive.receiver_id == user_id) & (MessageArchive.receiver_role == user_role))
+        )
+        pagination = query.order_by(MessageArchive.created_at.asc()).paginate(page=page, per_page=size, error_out=False)
+        return {
+            'items': [msg.to_dict() for msg in pagination.items],
+            'total': pagination.total,
+            'page': page,
+            'size': size
+        }
     
     @staticmethod
     def get_unread_count(user_id, user_role):
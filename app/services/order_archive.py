@@ -0,0 +1,102 @@
+import datetime
+import logging
+
+from flask import current_app
+from sqlalchemy import select, insert, delete, literal
+
+from app import db
+from app.models.order import Order, OrderStatus
+from app.models.message import Message
+from app.models.archive import OrderArchive, MessageArchive
+from app.utils.cache import TTLCache
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# 进入终态、不会再变化的订单才归档
+ARCHIVE_STATUSES = (OrderStatus.COMPLETED, OrderStatus.CANCELLED)
+
+# 归档订单数缓存，按(字段, 值, 状态)索引（每个进程一份）；归档表只在归档任务运行时变化，本进程归档后清空
+archive_count_cache = TTLCache(maxsize=10000, ttl=600)
+metrics.register('archive_count_cache', archive_count_cache.stats)
+
+
+class OrderArchiveService:
+    """冷热分离：把较早的已完成、已取消订单及其聊天消息移到归档表，orders表只保留近期订单"""
+
+    @staticmethod
+    def hot_boundary():
+        """热数据边界：创建时间早于该时间的已结束订单可能已被归档"""
+        days = current_app.config.get('ORDER_ARCHIVE_AGE_DAYS', 90)
+        return datetime.datetime.utcnow() - datetime.timedelta(days=days)
+
+    @staticmethod
+    def archive(batch_size=None, max_batches=None):
+        """
+        分批归档，每批在一个事务内复制到归档表并从原表删除
+        评价不随订单移动，feedbacks表按原订单ID继续关联归档订单
+        :return: 归档的订单数
+        """
+        batch_size = batch_size or current_app.config.get('ORDER_ARCHIVE_BATCH_SIZE', 500)
+        cutoff = OrderArchiveService.hot_boundary()
+        order_columns = [column.name for column in Order.__table__.columns]
+        message_columns = [column.name for column in Message.__table__.columns]
+        archived = batches = 0
+
+        while max_batches is None or batches < max_batches:
+            try:
+                # 走(status, created_at)索引；MySQL下锁定这批订单，避免复制后又被修改
+                ids = [row[0] for row in db.session.execute(
+                    select(Order.id).where(
+                        Order.status.in_(ARCHIVE_STATUSES),
+                        Order.created_at < cutoff
+                    ).order_by(Order.id).limit(batch_size).with_for_update()
+                )]
+                if not ids:
+                    db.session.rollback()
+                    break
+
+                now = datetime.datetime.utcnow()
+                db.session.execute(insert(OrderArchive).from_select(
+                    order_columns + ['archived_at'],
+                    select(*[Order.__table__.c[name] for name in order_columns], literal(now)).where(Order.id.in_(ids))
+                ))
+                db.session.execute(insert(MessageArchive).from_select(
+                    message_columns,
+                    select(*[Message.__table__.c[name] for name in message_columns]).where(Message.order_id.in_(ids))
+                ))
+                db.session.execute(delete(Message).where(Message.order_id.in_(ids)),
+                                   execution_options={'synchronize_session': False})
+                db.session.execute(delete(Order).where(Order.id.in_(ids)),
+                                   execution_options={'synchronize_session': False})
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            archive_count_cache.clear()
+
+            archived += len(ids)
+            batches += 1
+            logger.info(f"已归档{archived}个订单")
+        return archived
+
+    @staticmethod
+    def count_archived(field, value, status=None):
+        """
+        统计用户或技师的归档订单数，优先读缓存
+        其他进程归档后，缓存过期前total会少算新归档的订单
+        """
+        key = (field, value, status)
+        count = archive_count_cache.get(key)
+        if count is None:
+            query = OrderArchive.query.filter(getattr(OrderArchive, field) == value)
+            if status is not None:
+                query = query.filter(OrderArchive.status == status)
+            count = query.count()
+            archive_count_cache.set(key, count)
+        return count
+
+    @staticmethod
+    def find_order(user_id, order_id):
+        """在归档表中查找用户的订单"""
+        return OrderArchive.query.filter_by(id=order_id, user_id=user_id).first()
@@ -1,17 +1,43 @@
 from app.models.order import Order, OrderStatus, PaymentStatus, PaymentMethod
-from app.models.user import User
+from app.models.user import User, UserAddress
 from app.models.therapist import Therapist, ServiceItem
+from app.services.availability import availability_index, DEFAULT_DURATION
+from app.services import order_state
+from app.services.payment_pipeline import payment_pipeline
+from app.services.order_archive import OrderArchiveService
+from app.models.archive import OrderArchive
+from app.utils.geo import parse_coordinates
+from app.utils.snowflake import order_no_generator
 from app import db
+from sqlalchemy import update, or_, and_, func, case
+import base64
+import heapq
+import itertools
 import random
 import string
 import datetime
 import json
+import threading
+from contextlib import nullcontext
+
+# 单个订单时长上限，重叠检查只需扫描开始时间在[开始时间 - 上限, 结束时间)内的订单
+MAX_SERVICE_DURATION = datetime.timedelta(days=1)
+
+# SQLite没有行锁，同一进程内按技师分段加锁，使同一技师的预约串行执行
+_booking_locks = [threading.Lock() for _ in range(64)]
+
+
+class BookingConflictError(Exception):
+    """技师在该时段已有预约"""
 
 
 class OrderService:
     @staticmethod
     def create_order(user_id, data):
-        """创建订单"""
+        """创建订单，未指定技师时由派单引擎自动分配"""
+        if not data.get('therapist_id'):
+            return OrderService._create_dispatch_order(user_id, data)
+
         # 验证技师和服务项目
         therapist = Therapist.query.filter_by(id=data['therapist_id'], status=1).first()
         if not therapist:
@@ -23,24 +49,98 @@ class OrderService:
             raise Exception("服务项目不可用")
 
         # 转换服务时间为datetime对象
-        # 处理HTML datetime-local输入的格式（YYYY-MM-DDTHH:MM）
-        service_time_str = data['service_time']
-        # 如果不包含秒数，则添加:00
-        if len(service_time_str) == 16:  # 格式为 YYYY-MM-DDTHH:MM
-            service_time_str += ':00'
-        service_time = datetime.datetime.fromisoformat(service_time_str)
-        
+        service_time = OrderService.parse_service_time(data['service_time'])
+        duration = service_item.duration or DEFAULT_DURATION
+
+        # 先查内存时段索引，明显冲突的请求不用进入加锁流程
+        if not availability_index.is_free(therapist.id, service_time, duration):
+            raise BookingConflictError("该技师在所选时段已有预约，请选择其他时间")
+
+        with OrderService._booking_lock(therapist.id):
+            try:
+                OrderService._lock_therapist(therapist.id)
+                if OrderService._has_conflict(therapist.id, service_time, duration):
+                    raise BookingConflictError("该技师在所选时段已有预约，请选择其他时间")
+                order = OrderService._insert_order(user_id, data, service_item, service_time)
+            except Exception:
+                db.session.rollback()
+                raise
+        return order
+
+    @staticmethod
+    def _create_dispatch_order(user_id, data):
+        """创建待派单的订单并提交给派单引擎"""
+        from app.services.dispatch_service import dispatch_engine
+
+        service_item = ServiceItem.query.filter_by(id=data['service_item_id'], status=1).first()
+        if not service_item:
+            raise Exception("服务项目不可用")
+
+        # 派单按距离匹配，需要服务地址的经纬度：优先使用传入的经纬度，其次使用用户保存的地址
+        latitude, longitude = parse_coordinates(data.get('latitude'), data.get('longitude'))
+        if latitude is None and data.get('address_id'):
+            address = UserAddress.query.filter_by(id=data['address_id'], user_id=user_id).first()
+            if address:
+                latitude, longitude = address.latitude, address.longitude
+        if latitude is None:
+            raise Exception("自动派单需要提供服务地址的经纬度")
+
+        service_time = OrderService.parse_service_time(data['service_time'])
+        try:
+            order = OrderService._insert_order(user_id, data, service_item, service_time, latitude, longitude)
+        except Exception:
+            db.session.rollback()
+            raise
+        dispatch_engine.submit(order.id)
+        return order
+
+    @staticmethod
+    def _booking_lock(therapist_id):
+        if db.engine.dialect.name == 'sqlite':
+            return _booking_locks[therapist_id % len(_booking_locks)]
+        return nullcontext()
+
+    @staticmethod
+    def _lock_therapist(therapist_id):
+        """锁定技师行，使同一技师的预约在事务内串行执行，直到提交或回滚才释放"""
+        if db.engine.dialect.name == 'sqlite':
+            # SQLite不支持SELECT FOR UPDATE，用一次空更新开启写事务，其他进程的写事务需等待本事务结束
+            stmt = update(Therapist).where(Therapist.id == therapist_id).values(updated_at=Therapist.updated_at)
+            db.session.execute(stmt, execution_options={'synchronize_session': False})
+        else:
+            db.session.query(Therapist.id).filter_by(id=therapist_id).with_for_update().one()
+
+    @staticmethod
+    def _has_conflict(therapist_id, service_time, duration):
+        """按(therapist_id, service_time)索引范围扫描，判断技师在该时段是否已有未取消的订单"""
+        end = service_time + datetime.timedelta(minutes=duration)
+        # 加锁读取，MySQL可重复读隔离级别下也能读到其他事务刚提交的订单
+        orders = db.session.query(Order.service_time, Order.duration).filter(
+            Order.therapist_id == therapist_id,
+            Order.service_time >= service_time - MAX_SERVICE_DURATION,
+            Order.service_time < end,
+            Order.status != OrderStatus.CANCELLED
+        ).with_for_update().all()
+        for start, minutes in orders:
+            if start + datetime.timedelta(minutes=minutes or DEFAULT_DURATION) > service_time:
+                return True
+        return False
+
+    @staticmethod
+    def _insert_order(user_id, data, service_item, service_time, latitude=None, longitude=None):
         # 创建订单
         order = Order(
             order_no=OrderService._generate_order_no(),
             user_id=user_id,
-            therapist_id=data['therapist_id'],
+            therapist_id=data.get('therapist_id'),
             service_item_id=data['service_item_id'],
             service_name=service_item.name,
             duration=service_item.duration,
             price=service_item.price,
             service_time=service_time,
             service_address=data['service_address'],
+            latitude=latitude,
+            longitude=longitude,
             contact_phone=data['contact_phone'],
             remark=data.get('remark')
         )
@@ -49,125 +149,174 @@ class OrderService:
         db.session.commit()
         return order
 
+    @staticmethod
+    def parse_service_time(value):
+        """解析服务时间，兼容HTML datetime-local输入的格式（YYYY-MM-DDTHH:MM）"""
+        # 如果不包含秒数，则添加:00
+        if len(value) == 16:  # 格式为 YYYY-MM-DDTHH:MM
+            value += ':00'
+        return datetime.datetime.fromisoformat(value)
+
     @staticmethod
     def get_user_orders(user_id, page, size, status=None):
-        """获取用户订单列表"""
-        query = Order.query.filter_by(user_id=user_id)
+        """获取用户订单列表，包含已归档的订单"""
+        return OrderService._paginate_with_archive('user_id', user_id, page, size, status)
 
-        if status is not None:
-            query = query.filter_by(status=status)
+    @staticmethod
+    def _paginate_with_archive(field, value, page, size, status=None):
+        """
+        按页码分页查询热表和归档表中的订单，按创建时间倒序，total包含归档订单
+        归档订单都早于热数据边界：本页落在边界之后的热数据内时只查热表，
+        否则把热表中边界之前的订单与归档订单按创建时间归并；
+        total中的归档订单数读缓存，只有翻过近期订单时才查询归档表
+        """
+        boundary = OrderArchiveService.hot_boundary()
+        offset = (page - 1) * size
+
+        def query(model, *conditions):
+            query = model.query.filter(getattr(model, field) == value, *conditions)
+            if status is not None:
+                query = query.filter(model.status == status)
+            return query
+
+        def ordered(query, model):
+            return query.order_by(model.created_at.desc(), model.id.desc())
+
+        recent = query(Order, Order.created_at >= boundary)
+        older = query(Order, or_(Order.created_at < boundary, Order.created_at.is_(None)))
+        archived = query(OrderArchive)
+        # 一次COUNT同时得到热表总数和边界之后的订单数
+        recent_total, hot_total = query(Order).with_entities(
+            func.count(case((Order.created_at >= boundary, 1))), func.count(Order.id)
+        ).one()
+        total = hot_total + OrderArchiveService.count_archived(field, value, status)
+
+        if offset + size <= recent_total:
+            items = ordered(recent, Order).offset(offset).limit(size).all()
+        else:
+            items = ordered(recent, Order).offset(offset).all() if offset < recent_total else []
+            skip = max(offset - recent_total, 0)
+            need = size - len(items)
+            merged = heapq.merge(
+                ordered(older, Order).limit(skip + need).all(),
+                ordered(archived, OrderArchive).limit(skip + need).all(),
+                key=lambda o: (o.created_at or datetime.datetime.min, o.id), reverse=True
+            )
+            items += itertools.islice(merged, skip, skip + need)
 
-        # 按创建时间倒序排列
-        query = query.order_by(Order.created_at.desc())
+        return {
+            'items': items,
+            'total': total,
+            'page': page,
+            'size': size
+        }
 
-        # 分页
-        pagination = query.paginate(page=page, per_page=size, error_out=False)
+    @staticmethod
+    def get_user_orders_by_cursor(user_id, cursor, size, status=None):
+        """
+        按游标获取用户订单列表，按创建时间倒序
+        先查热表，翻页越过热数据边界后才同时查询归档表并合并
+        :param cursor: 上一页返回的next_cursor，为空时从第一页开始
+        :return: 本页订单及下一页游标（没有更多数据时为None）
+        """
+        last = OrderService._decode_cursor(cursor) if cursor else None
+        items = OrderService._orders_after(Order, user_id, status, last, size + 1)
+
+        # 热表已取满一页且最后一条晚于边界时，归档订单都排在后面，不需要查询归档表；
+        # 创建时间为空的订单排在最后，视为早于边界
+        if len(items) <= size or items[-1].created_at is None \
+                or items[-1].created_at < OrderArchiveService.hot_boundary():
+            archived = OrderService._orders_after(OrderArchive, user_id, status, last, size + 1)
+            items = sorted(items + archived, key=lambda o: (o.created_at or datetime.datetime.min, o.id),
+                           reverse=True)[:size + 1]
+
+        next_cursor = None
+        if len(items) > size:
+            items = items[:size]
+            next_cursor = OrderService._encode_cursor(items[-1])
 
         return {
-            'items': pagination.items,
-            'total': pagination.total,
-            'page': page,
+            'items': items,
+            'next_cursor': next_cursor,
             'size': size
         }
 
     @staticmethod
-    def get_order_detail(user_id, order_id):
-        """获取订单详情"""
-        return Order.query.filter_by(id=order_id, user_id=user_id).first()
+    def _orders_after(model, user_id, status, last, limit):
+        query = model.query.filter(model.user_id == user_id)
+        if status is not None:
+            query = query.filter(model.status == status)
+        if last is not None:
+            created_at, last_id = last
+            # MySQL和SQLite倒序时NULL排在最后
+            if created_at is None:
+                query = query.filter(model.created_at.is_(None), model.id < last_id)
+            else:
+                query = query.filter(or_(
+                    model.created_at < created_at,
+                    and_(model.created_at == created_at, model.id < last_id),
+                    model.created_at.is_(None)
+                ))
+        return query.order_by(model.created_at.desc(), model.id.desc()).limit(limit).all()
 
     @staticmethod
-    def cancel_order(user_id, order_id):
-        """取消订单"""
-        order = Order.query.filter_by(id=order_id, user_id=user_id).first()
-        if not order:
-            raise Exception("订单不存在")
+    def _encode_cursor(order):
+        created_at = order.created_at.isoformat() if order.created_at else None
+        data = json.dumps([created_at, order.id], separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
 
-        # 检查订单状态是否可以取消
-        if order.status > OrderStatus.ON_THE_WAY:
-            raise Exception("订单无法取消")
+    @staticmethod
+    def _decode_cursor(cursor):
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            created_at, last_id = json.loads(data)
+            return datetime.datetime.fromisoformat(created_at) if created_at else None, int(last_id)
+        except (ValueError, TypeError):
+            raise Exception("无效的分页游标")
 
-        order.status = OrderStatus.CANCELLED
-        db.session.commit()
+    @staticmethod
+    def get_order_detail(user_id, order_id):
+        """获取订单详情，热表中没有时再查归档表"""
+        order = Order.query.filter_by(id=order_id, user_id=user_id).first()
+        if order is None:
+            order = OrderArchiveService.find_order(user_id, order_id)
+        return order
+
+    @staticmethod
+    def cancel_order(user_id, order_id):
+        """取消订单（技师出发前可取消）"""
+        return order_state.transition('cancel', order_id, user_id=user_id, error_message="订单不存在或无法取消")
 
     # 技师端订单管理功能
     @staticmethod
     def get_therapist_orders(therapist_id, page, size, status=None):
-        """获取技师订单列表"""
-        query = Order.query.filter_by(therapist_id=therapist_id)
-
-        if status is not None:
-            query = query.filter_by(status=status)
-
-        # 按创建时间倒序排列
-        query = query.order_by(Order.created_at.desc())
-
-        # 分页
-        pagination = query.paginate(page=page, per_page=size, error_out=False)
-
-        return {
-            'items': pagination.items,
-            'total': pagination.total,
-            'page': page,
-            'size': size
-        }
+        """获取技师订单列表，包含已归档的订单"""
+        return OrderService._paginate_with_archive('therapist_id', therapist_id, page, size, status)
 
     @staticmethod
     def accept_order(therapist_id, order_id):
         """技师接受订单"""
-        order = Order.query.filter_by(id=order_id, therapist_id=therapist_id, status=OrderStatus.PENDING).first()
-        if not order:
-            raise Exception("订单不存在或状态不允许")
-
-        order.status = OrderStatus.ACCEPTED
-        db.session.commit()
-        return order
+        return order_state.transition('accept', order_id, therapist_id=therapist_id)
 
     @staticmethod
     def start_journey(therapist_id, order_id):
         """技师出发"""
-        order = Order.query.filter_by(id=order_id, therapist_id=therapist_id, status=OrderStatus.ACCEPTED).first()
-        if not order:
-            raise Exception("订单不存在或状态不允许")
-
-        order.status = OrderStatus.ON_THE_WAY
-        db.session.commit()
-        return order
+        return order_state.transition('start_journey', order_id, therapist_id=therapist_id)
 
     @staticmethod
     def start_service(therapist_id, order_id):
         """开始服务"""
-        order = Order.query.filter_by(id=order_id, therapist_id=therapist_id, status=OrderStatus.ON_THE_WAY).first()
-        if not order:
-            raise Exception("订单不存在或状态不允许")
-
-        order.status = OrderStatus.IN_SERVICE
-        db.session.commit()
-        return order
+        return order_state.transition('start_service', order_id, therapist_id=therapist_id)
 
     @staticmethod
     def complete_order(therapist_id, order_id):
-        """完成服务"""
-        order = Order.query.filter_by(id=order_id, therapist_id=therapist_id, status=OrderStatus.IN_SERVICE).first()
-        if not order:
-            raise Exception("订单不存在或状态不允许")
-
-        order.status = OrderStatus.COMPLETED
-        
-        # 更新技师的服务次数
-        therapist = Therapist.query.get(therapist_id)
-        if therapist:
-            therapist.service_count += 1
-        
-        db.session.commit()
-        return order
+        """完成服务，同时累加技师的服务次数"""
+        return order_state.transition('complete', order_id, therapist_id=therapist_id)
 
     @staticmethod
     def _generate_order_no():
-        """生成订单号"""
-        prefix = "ORD"
-        timestamp = str(int(datetime.datetime.now().timestamp()))
-        random_str = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-        return f"{prefix}{timestamp}{random_str}"
+        """生成订单号：ORD + 19位雪花ID，不会重复且大致按时间递增"""
+        return order_no_generator.next_str('ORD')
 
     @staticmethod
     def create_payment(order_id, user_id, payment_method):
@@ -208,7 +357,10 @@ class OrderService:
 
     @staticmethod
     def payment_callback(data):
-        """支付回调处理"""
+        """
+        支付回调处理：校验参数后写入回调日志即返回，由后台线程批量更新订单支付状态
+        :return: 回调日志ID
+        """
         # 解析支付回调数据
         # 实际应用中需要验证签名和支付平台的真实性
         order_no = data.get('order_no')
@@ -220,23 +372,7 @@ class OrderService:
         if not all([order_no, transaction_id, payment_method, amount, status]):
             raise Exception("回调参数不完整")
 
-        # 查找订单
-        order = Order.query.filter_by(order_no=order_no).first()
-        if not order:
-            raise Exception("订单不存在")
-
-        # 更新支付状态
-        if status == 'success':
-            order.payment_status = PaymentStatus.PAID
-            order.payment_method = payment_method
-            order.transaction_id = transaction_id
-            order.paid_at = datetime.datetime.now()
-            # 支付成功后可以触发其他业务逻辑，如通知技师
-        else:
-            order.payment_status = PaymentStatus.PAY_FAILED
-
-        db.session.commit()
-        return order
+        return payment_pipeline.enqueue(data)
 
     @staticmethod
     def get_payment_status(order_id, user_id):
@@ -0,0 +1,114 @@
+import logging
+
+from sqlalchemy import update, select, func
+
+from app import db
+from app.models.order import Order, OrderStatus
+from app.models.therapist import Therapist
+
+logger = logging.getLogger(__name__)
+
+# 状态流转：名称 -> (目标状态, 允许的当前状态)
+TRANSITIONS = {
+    'accept': (OrderStatus.ACCEPTED, (OrderStatus.PENDING,)),
+    'start_journey': (OrderStatus.ON_THE_WAY, (OrderStatus.ACCEPTED,)),
+    'start_service': (OrderStatus.IN_SERVICE, (OrderStatus.ON_THE_WAY,)),
+    'complete': (OrderStatus.COMPLETED, (OrderStatus.IN_SERVICE,)),
+    'cancel': (OrderStatus.CANCELLED, (OrderStatus.PENDING, OrderStatus.ACCEPTED, OrderStatus.ON_THE_WAY)),
+}
+
+_hooks = {name: [] for name in TRANSITIONS}
+
+
+class OrderTransitionError(Exception):
+    """订单不存在、不属于当前用户或当前状态不允许该操作"""
+
+
+class TransitionResult:
+    __slots__ = ('id', 'status')
+
+    def __init__(self, id, status):
+        self.id = id
+        self.status = status
+
+    def __repr__(self):
+        return f'<TransitionResult {self.id} -> {self.status}>'
+
+
+def on_transition(name):
+    """装饰器：注册状态流转成功提交后执行的钩子，钩子参数为(order_id, 目标状态)"""
+    if name not in TRANSITIONS:
+        raise ValueError(f"未知的订单状态流转: {name}")
+
+    def decorator(f):
+        _hooks[name].append(f)
+        return f
+
+    return decorator
+
+
+def transition(name, order_id, therapist_id=None, user_id=None, error_message="订单不存在或状态不允许"):
+    """
+    执行订单状态流转：一条带条件的UPDATE完成“检查当前状态 + 修改状态”，按影响行数判断是否成功
+    并发请求（如取消和接单同时到达）只会有一个成功
+    :param therapist_id: 限定订单所属技师
+    :param user_id: 限定订单所属用户
+    :raises OrderTransitionError: 条件不满足
+    """
+    to_status, from_statuses = TRANSITIONS[name]
+    conditions = [Order.id == order_id, Order.status.in_(from_statuses)]
+    if therapist_id is not None:
+        conditions.append(Order.therapist_id == therapist_id)
+    if user_id is not None:
+        conditions.append(Order.user_id == user_id)
+
+    try:
+        if name == 'complete':
+            updated = _complete(order_id, conditions, to_status)
+        else:
+            stmt = update(Order).where(*conditions).values(status=to_status)
+            updated = db.session.execute(stmt, execution_options={'synchronize_session': False}).rowcount == 1
+        if not updated:
+            db.session.rollback()
+            raise OrderTransitionError(error_message)
+        db.session.commit()
+    except OrderTransitionError:
+        raise
+    except Exception:
+        db.session.rollback()
+        raise
+
+    for hook in _hooks[name]:
+        try:
+            hook(order_id, to_status)
+        except Exception as e:
+            logger.error(f"订单{order_id}状态流转钩子执行失败: {str(e)}", exc_info=True)
+    return TransitionResult(order_id, to_status)
+
+
+def _complete(order_id, conditions, to_status):
+    """完成订单并累加技师服务次数"""
+    service_count = func.coalesce(Therapist.service_count, 0) + 1
+    if db.engine.dialect.name == 'mysql':
+        # MySQL多表UPDATE，订单状态和技师服务次数在同一条语句中更新，成功时影响两行
+        stmt = update(Order).where(Order.therapist_id == Therapist.id, *conditions).values({
+            Order.status: to_status,
+            Therapist.service_count: service_count
+        })
+        return db.session.execute(stmt, execution_options={'synchronize_session': False}).rowcount == 2
+
+    stmt = update(Order).where(*conditions).values(status=to_status)
+    if db.session.execute(stmt, execution_options={'synchronize_session': False}).rowcount != 1:
+        return False
+    # 其他数据库用子查询定位技师，与状态更新在同一事务内提交，不需要先查询订单
+    therapist_id = select(Order.therapist_id).where(Order.id == order_id).scalar_subquery()
+    db.session.execute(update(Therapist).where(Therapist.id == therapist_id).values(service_count=service_count),
+                       execution_options={'synchronize_session': False})
+    return True
+
+
+@on_transition('cancel')
+def _release_availability(order_id, status):
+    # 条件UPDATE不经过ORM会话事件，取消后在这里释放技师时段
+    from app.services.availability import availability_index
+    availability_index.apply(order_id, None, None, False)
@@ -0,0 +1,245 @@
+import datetime
+import heapq
+import logging
+import threading
+import time
+
+from sqlalchemy import event, update, select, or_, and_
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models.order import Order, OrderStatus, PaymentStatus
+from app.services.availability import availability_index
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# 未支付（含支付失败）的订单才会超时取消，已支付的订单需要走退款流程
+UNPAID_STATUSES = (PaymentStatus.UNPAID, PaymentStatus.PAY_FAILED)
+
+
+class OrderTimeoutScheduler:
+    """
+    超时订单自动取消：按到期时间维护最小堆，到期后批量取消
+    - 待接单且未支付的订单，下单后pending_timeout秒取消
+    - 已接单但仍未支付的订单，下单后unpaid_timeout秒取消
+    启动时按(status, created_at)索引加载未完成的订单，之后本进程新建的订单在提交后入堆，
+    其他进程新建的订单按created_at增量同步；每个订单入堆、出堆都是O(log n)，不需要定期扫表。
+    取消时的UPDATE会重新检查状态，订单已接单、已支付或已被取消时不受影响
+    """
+
+    def __init__(self, pending_timeout=1800, unpaid_timeout=7200, batch_size=500, sync_interval=30):
+        self.pending_timeout = pending_timeout
+        self.unpaid_timeout = unpaid_timeout
+        self.batch_size = batch_size
+        self.sync_interval = sync_interval
+        self.app = None
+        self._heap = []  # (到期时间, 订单ID)
+        self._scheduled = {}  # 订单ID -> 堆中的条目数，避免重复登记
+        self._cond = threading.Condition()
+        self._thread = None
+        self._synced_at = None
+        self.cancelled = 0
+        self.batches = 0
+
+    def configure(self, app=None, **options):
+        """按应用配置调整参数，值为None的参数保持不变"""
+        if app is not None:
+            self.app = app
+        for name, value in options.items():
+            if value is not None:
+                setattr(self, name, value)
+
+    def start(self):
+        """加载未完成的订单并启动定时线程，需在应用上下文中调用"""
+        with self._cond:
+            if self._thread is not None:
+                return
+            if self.app is None:
+                raise RuntimeError("订单超时调度未初始化，请先调用configure(app=app)")
+            count = self._load()
+            self._thread = threading.Thread(target=self._run, name='order-timeout', daemon=True)
+            self._thread.start()
+        logger.info(f"订单超时调度已启动，加载了{count}个待超时订单")
+
+    def schedule(self, order_id, created_at, status):
+        """登记订单的超时时间，未启动调度时忽略"""
+        if self._thread is None or created_at is None:
+            return
+        with self._cond:
+            self._push(order_id, created_at, status)
+            self._cond.notify()
+
+    def _push(self, order_id, created_at, status):
+        if order_id in self._scheduled:
+            return
+        deadlines = []
+        if status == OrderStatus.PENDING:
+            deadlines.append(self.pending_timeout)
+        elif status != OrderStatus.ACCEPTED:
+            return
+        # 待接单的订单接单后仍可能未支付，同时登记未支付超时
+        if status == OrderStatus.ACCEPTED or self.unpaid_timeout > self.pending_timeout:
+            deadlines.append(self.unpaid_timeout)
+        for seconds in deadlines:
+            heapq.heappush(self._heap, (created_at + datetime.timedelta(seconds=seconds), order_id))
+        self._scheduled[order_id] = len(deadlines)
+
+    def _pop(self):
+        order_id = heapq.heappop(self._heap)[1]
+        remaining = self._scheduled.pop(order_id, 1) - 1
+        if remaining > 0:
+            self._scheduled[order_id] = remaining
+        return order_id
+
+    def _load(self, since=None):
+        # 走(status, created_at)索引，只读取未完成且未支付的订单
+        synced_at = datetime.datetime.utcnow()
+        query = db.session.query(Order.id, Order.created_at, Order.status).filter(
+            Order.status.in_((OrderStatus.PENDING, OrderStatus.ACCEPTED)),
+            Order.created_at.isnot(None),
+            or_(Order.payment_status.in_(UNPAID_STATUSES), Order.payment_status.is_(None))
+        )
+        if since is not None:
+            query = query.filter(Order.created_at >= since)
+        rows = query.all()
+        with self._cond:
+            for order_id, created_at, status in rows:
+                self._push(order_id, created_at, status)
+            self._synced_at = synced_at
+            self._cond.notify()
+        return len(rows)
+
+    def _sync(self):
+        # 同步其他进程新建的订单，多回看一个周期，避免漏掉同步期间提交的订单
+        self._load(self._synced_at - datetime.timedelta(seconds=self.sync_interval))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                now = datetime.datetime.utcnow()
+                due = []
+                while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+                    due.append(self._pop())
+                sync_due = (now - self._synced_at).total_seconds() >= self.sync_interval
+                if not due and not sync_due:
+                    wait = self.sync_interval - (now - self._synced_at).total_seconds()
+                    if self._heap:
+                        wait = min(wait, (self._heap[0][0] - now).total_seconds())
+                    self._cond.wait(max(wait, 0.01))
+                    continue
+            try:
+                with self.app.app_context():
+                    if due:
+                        self.cancel_expired(due)
+                    if sync_due:
+                        self._sync()
+            except Exception as e:
+                logger.error(f"订单超时取消异常: {str(e)}", exc_info=True)
+                # 稍后重新检查这批订单
+                retry_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=self.sync_interval)
+                with self._cond:
+                    for order_id in due:
+                        heapq.heappush(self._heap, (retry_at, order_id))
+                        self._scheduled[order_id] = self._scheduled.get(order_id, 0) + 1
+                time.sleep(1)
+
+    def expired_condition(self, now):
+        """订单已超时的条件，取消时重新检查，避免取消已接单或已支付的订单"""
+        unpaid = or_(Order.payment_status.in_(UNPAID_STATUSES), Order.payment_status.is_(None))
+        return and_(unpaid, or_(
+            and_(Order.status == OrderStatus.PENDING,
+                 Order.created_at <= now - datetime.timedelta(seconds=self.pending_timeout)),
+            and_(Order.status.in_((OrderStatus.PENDING, OrderStatus.ACCEPTED)),
+                 Order.created_at <= now - datetime.timedelta(seconds=self.unpaid_timeout))
+        ))
+
+    def cancel_expired(self, order_ids):
+        """
+        批量取消已超时的订单，未超时或状态已变化的订单保持不变
+        :return: 被取消的订单 [(订单ID, 用户ID, 订单号), ...]
+        """
+        conditions = [Order.id.in_(set(order_ids)), self.expired_condition(datetime.datetime.utcnow())]
+        try:
+            if db.engine.dialect.update_returning:
+                cancelled = db.session.execute(
+                    update(Order).where(*conditions).values(status=OrderStatus.CANCELLED)
+                    .returning(Order.id, Order.user_id, Order.order_no),
+                    execution_options={'synchronize_session': False}
+                ).all()
+            else:
+                # 不支持RETURNING（如MySQL）时先锁定满足条件的订单再更新
+                cancelled = db.session.execute(
+                    select(Order.id, Order.user_id, Order.order_no).where(*conditions).with_for_update()
+                ).all()
+                if cancelled:
+                    db.session.execute(
+                        update(Order).where(Order.id.in_([row[0] for row in cancelled]))
+                        .values(status=OrderStatus.CANCELLED),
+                        execution_options={'synchronize_session': False}
+                    )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        with self._cond:
+            self.batches += 1
+            self.cancelled += len(cancelled)
+        for order_id, user_id, order_no in cancelled:
+            # 批量UPDATE不经过ORM会话事件，手动释放技师时段
+            availability_index.apply(order_id, None, None, False)
+        _notify_cancelled(cancelled)
+        return [tuple(row) for row in cancelled]
+
+    def stats(self):
+        with self._cond:
+            return {
+                'scheduled': len(self._heap),
+                'next_due': self._heap[0][0].isoformat() if self._heap else None,
+                'cancelled': self.cancelled,
+                'batches': self.batches
+            }
+
+
+def _notify_cancelled(cancelled):
+    """通过WebSocket向用户推送订单超时取消事件"""
+    if not cancelled:
+        return
+    try:
+        from app.api.websocket import socketio
+        for order_id, user_id, order_no in cancelled:
+            socketio.emit('order_status', {
+                'order_id': order_id,
+                'order_no': order_no,
+                'status': OrderStatus.CANCELLED,
+                'reason': '订单超时未处理，已自动取消'
+            }, room=user_id)
+    except Exception as e:
+        logger.warning(f"推送订单取消事件失败: {str(e)}")
+
+
+order_timeout_scheduler = OrderTimeoutScheduler()
+metrics.register('order_timeout', order_timeout_scheduler.stats)
+
+
+# 本进程新建的订单提交后登记超时时间
+@event.listens_for(Session, 'after_flush')
+def _collect_new_orders(session, flush_context):
+    if order_timeout_scheduler._thread is None:
+        return
+    new_orders = session.info.setdefault('timeout_orders', [])
+    for obj in session.new:
+        if isinstance(obj, Order):
+            new_orders.append((obj.id, obj.created_at, obj.status))
+
+
+@event.listens_for(Session, 'after_commit')
+def _schedule_new_orders(session):
+    for order_id, created_at, status in session.info.pop('timeout_orders', ()):
+        order_timeout_scheduler.schedule(order_id, created_at, status)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_new_orders(session):
+    session.info.pop('timeout_orders', None)
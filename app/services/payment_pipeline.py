@@ -0,0 +1,264 @@
+import datetime
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+
+from app import db
+from app.models.order import Order, PaymentStatus
+from app.models.payment_journal import PaymentCallbackJournal, JournalState
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentCallbackPipeline:
+    """
+    支付回调异步处理：回调写入payment_callback_journal表并提交后即可确认，
+    工作线程按批领取日志、一次查询取出相关订单、每批只提交一次。
+    领取后超时未完成的日志（如进程崩溃）会被放回待处理并重放，写入支付结果本身是幂等的
+    """
+
+    def __init__(self, workers=2, batch_size=200, poll_interval=1.0, claim_timeout=60, max_attempts=5):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.claim_timeout = claim_timeout
+        self.max_attempts = max_attempts
+        self.app = None
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._recovered_at = 0
+        self._applied_log = deque(maxlen=1000)  # (完成时间, 条数)
+        self.enqueued = 0
+        self.applied = 0
+        self.failed = 0
+        self.batches = 0
+        self.replayed = 0
+        self.lag_ms = None
+
+    def configure(self, app=None, **options):
+        """按应用配置调整参数，值为None的参数保持不变"""
+        if app is not None:
+            self.app = app
+        for name, value in options.items():
+            if value is not None:
+                setattr(self, name, value)
+
+    def enqueue(self, data):
+        """
+        把回调写入日志表并提交，返回日志ID
+        提交成功即表示回调已持久化，可以向支付平台返回成功
+        """
+        entry = PaymentCallbackJournal(
+            order_no=data['order_no'],
+            transaction_id=data['transaction_id'],
+            payment_method=data.get('payment_method'),
+            amount=float(data['amount']) if data.get('amount') is not None else None,
+            status=data.get('status'),
+            payload=json.dumps(data, ensure_ascii=False, default=str)
+        )
+        db.session.add(entry)
+        db.session.flush()
+        entry_id = entry.id
+        db.session.commit()
+        with self._lock:
+            self.enqueued += 1
+        self._ensure_started()
+        self._wakeup.set()
+        return entry_id
+
+    def start(self):
+        """重放重启前未处理完的回调并启动处理线程，需在应用上下文中调用，重复调用时忽略"""
+        if self._threads:
+            return
+        count = self.recover()
+        self._ensure_started()
+        logger.info(f"支付回调处理线程已启动，重放了{count}条超时未完成的回调")
+
+    def recover(self):
+        """把领取后超时未完成的日志放回待处理，用于进程重启或工作线程异常后重放"""
+        deadline = datetime.datetime.utcnow() - datetime.timedelta(seconds=self.claim_timeout)
+        count = PaymentCallbackJournal.query.filter(
+            PaymentCallbackJournal.state == JournalState.PROCESSING,
+            PaymentCallbackJournal.claimed_at < deadline
+        ).update({'state': JournalState.PENDING, 'claim_token': None}, synchronize_session=False)
+        db.session.commit()
+        self._recovered_at = time.monotonic()
+        if count:
+            with self._lock:
+                self.replayed += count
+            logger.warning(f"{count}条支付回调日志处理超时，重新处理")
+        pending = db.session.query(PaymentCallbackJournal.id).filter(
+            PaymentCallbackJournal.state == JournalState.PENDING
+        ).first()
+        if pending is not None:
+            self._ensure_started()
+            self._wakeup.set()
+        return count
+
+    def join(self, timeout=5):
+        """等待日志表中待处理的回调处理完（用于测试和压测）"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.app.app_context():
+                remaining = db.session.query(PaymentCallbackJournal.id).filter(
+                    PaymentCallbackJournal.state.in_((JournalState.PENDING, JournalState.PROCESSING))
+                ).first()
+            if remaining is None:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            if self.app is None:
+                raise RuntimeError("支付回调处理线程未初始化，请先调用configure(app=app)")
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'payment-callback-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            try:
+                with self.app.app_context():
+                    if time.monotonic() - self._recovered_at >= self.claim_timeout:
+                        self.recover()
+                    # 一直处理到没有待处理的日志
+                    while self.process_batch():
+                        pass
+            except Exception as e:
+                logger.error(f"支付回调处理异常: {str(e)}", exc_info=True)
+                time.sleep(self.poll_interval)
+
+    def process_batch(self):
+        """领取并处理一批日志，返回本次领取到的条数"""
+        ids = [row[0] for row in db.session.query(PaymentCallbackJournal.id).filter(
+            PaymentCallbackJournal.state == JournalState.PENDING
+        ).order_by(PaymentCallbackJournal.id).limit(self.batch_size)]
+        if not ids:
+            return 0
+
+        # 带状态条件的UPDATE领取，多个线程或进程同时领取时每条日志只会被一个领到
+        token = uuid.uuid4().hex
+        claimed = PaymentCallbackJournal.query.filter(
+            PaymentCallbackJournal.id.in_(ids), PaymentCallbackJournal.state == JournalState.PENDING
+        ).update({
+            'state': JournalState.PROCESSING,
+            'claim_token': token,
+            'claimed_at': datetime.datetime.utcnow(),
+            'attempts': PaymentCallbackJournal.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        if not claimed:
+            # 被其他线程领走了，继续取下一批
+            return len(ids)
+
+        entries = PaymentCallbackJournal.query.filter_by(claim_token=token).order_by(PaymentCallbackJournal.id).all()
+        try:
+            self._apply(entries)
+            # 提交后对象会过期，先记下处理结果用于统计
+            results = [(entry.state, entry.created_at) for entry in entries]
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"支付回调批量处理失败，逐条重试: {str(e)}")
+            self._apply_each(token)
+            results = db.session.query(PaymentCallbackJournal.state, PaymentCallbackJournal.created_at).filter(
+                PaymentCallbackJournal.claim_token == token
+            ).all()
+
+        self._record(results)
+        return len(ids)
+
+    @staticmethod
+    def _apply(entries):
+        """把一批回调写入订单，同一订单的多条回调按接收顺序依次生效"""
+        orders = {order.order_no: order for order in Order.query.filter(
+            Order.order_no.in_({entry.order_no for entry in entries})
+        )}
+        now = datetime.datetime.utcnow()
+        for entry in entries:
+            order = orders.get(entry.order_no)
+            if order is None:
+                entry.state = JournalState.FAILED
+                entry.error = "订单不存在"
+                continue
+            if entry.status == 'success':
+                order.payment_status = PaymentStatus.PAID
+                order.payment_method = entry.payment_method
+                order.transaction_id = entry.transaction_id
+                order.paid_at = entry.received_at
+                # 支付成功后可以触发其他业务逻辑，如通知技师
+            else:
+                order.payment_status = PaymentStatus.PAY_FAILED
+            entry.state = JournalState.APPLIED
+            entry.applied_at = now
+
+    def _apply_each(self, token):
+        # 逐条提交，找出导致整批失败的日志；多次失败后标记为失败，不再重试
+        for entry in PaymentCallbackJournal.query.filter_by(claim_token=token).order_by(PaymentCallbackJournal.id).all():
+            try:
+                self._apply([entry])
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                failed = entry.attempts >= self.max_attempts
+                PaymentCallbackJournal.query.filter_by(id=entry.id).update({
+                    'state': JournalState.FAILED if failed else JournalState.PENDING,
+                    # 标记失败的日志保留本批的领取标记，计入本批的处理结果
+                    'claim_token': token if failed else None,
+                    'error': str(e)[:255]
+                }, synchronize_session=False)
+                db.session.commit()
+                logger.error(f"支付回调日志{entry.id}处理失败: {str(e)}")
+
+    def _record(self, results):
+        now = datetime.datetime.utcnow()
+        applied = failed = 0
+        lag = None
+        for state, created_at in results:
+            if state == JournalState.APPLIED:
+                applied += 1
+            elif state == JournalState.FAILED:
+                failed += 1
+            if created_at is not None:
+                delay = (now - created_at).total_seconds()
+                lag = delay if lag is None else max(lag, delay)
+        with self._lock:
+            self.batches += 1
+            self.applied += applied
+            self.failed += failed
+            self._applied_log.append((time.monotonic(), applied))
+            if lag is not None:
+                self.lag_ms = round(lag * 1000, 2)
+
+    def stats(self, window=10):
+        with self._lock:
+            since = time.monotonic() - window
+            recent = sum(count for at, count in self._applied_log if at >= since)
+            return {
+                'workers': len(self._threads),
+                'enqueued': self.enqueued,
+                'applied': self.applied,
+                'failed': self.failed,
+                'replayed': self.replayed,
+                'batches': self.batches,
+                # 最近一批中从接收到写入订单的最大延迟
+                'lag_ms': self.lag_ms,
+                'throughput_per_s': round(recent / window, 2)
+            }
+
+
+payment_pipeline = PaymentCallbackPipeline()
+metrics.register('payment_callbacks', payment_pipeline.stats)
@@ -1,7 +1,9 @@
 import random
-import datetime
-from app import db
-from app.models.sms_code import SMSCode
+from flask import current_app
+from app.utils.sms_store import (
+    get_sms_store, VERIFY_OK, VERIFY_EXPIRED, VERIFY_MISMATCH, VERIFY_LOCKED
+)
+from app.utils.sms_dispatch import sms_dispatcher
 import logging
 
 # 配置日志
@@ -15,27 +17,12 @@ class SMSService:
         # 生成6位随机验证码
         code = ''.join(random.choices('0123456789', k=6))
         
-        # 设置验证码有效期为10分钟
-        expires_at = datetime.datetime.utcnow() + datetime.timedelta(minutes=10)
+        # 先投递到异步发送队列，不等待短信平台响应；队列已满时直接报错，旧验证码仍然有效
+        ttl = current_app.config.get('SMS_CODE_TTL', 600)
+        sms_dispatcher.send(phone, f"您的验证码是{code}，{ttl // 60}分钟内有效，请勿泄露给他人。")
         
-        # 检查是否已存在未使用的验证码，如果有则更新
-        existing_code = SMSCode.query.filter_by(phone=phone, status=0).first()
-        if existing_code:
-            existing_code.code = code
-            existing_code.expires_at = expires_at
-        else:
-            # 创建新的验证码记录
-            sms_code = SMSCode(
-                phone=phone,
-                code=code,
-                expires_at=expires_at
-            )
-            db.session.add(sms_code)
-        
-        db.session.commit()
-        
-        # 这里应该调用短信发送API，目前仅记录日志
-        logger.info(f"向{phone}发送验证码: {code}")
+        # 投递成功后再保存验证码，默认有效期10分钟，新验证码会覆盖旧的未使用验证码
+        get_sms_store().save(phone, code, ttl)
         
         return code
     
@@ -45,24 +32,16 @@ class SMSService:
         if not phone or not code:
             raise Exception("手机号和验证码不能为空")
         
-        # 查找最新的未使用验证码
-        sms_code = SMSCode.query.filter_by(phone=phone, status=0).order_by(SMSCode.created_at.desc()).first()
-        
-        if not sms_code:
-            raise Exception("验证码不存在或已使用")
+        # 比对、计数和消费在存储层原子完成
+        max_attempts = current_app.config.get('SMS_CODE_MAX_ATTEMPTS', 5)
+        result = get_sms_store().consume(phone, code, max_attempts)
         
-        # 检查验证码是否过期
-        if sms_code.is_expired():
-            sms_code.status = 2  # 标记为已过期
-            db.session.commit()
+        if result == VERIFY_OK:
+            return True
+        if result == VERIFY_EXPIRED:
             raise Exception("验证码已过期")
-        
-        # 检查验证码是否正确
-        if sms_code.code != code:
+        if result == VERIFY_MISMATCH:
             raise Exception("验证码错误")
-        
-        # 标记验证码为已使用
-        sms_code.status = 1
-        db.session.commit()
-        
-        return True
\ No newline at end of file
+        if result == VERIFY_LOCKED:
+            raise Exception("验证码错误次数过多，请重新获取")
+        raise Exception("验证码不存在或已失效")
\ No newline at end of file
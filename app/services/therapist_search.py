@@ -0,0 +1,177 @@
+import re
+from sqlalchemy import event, text
+from flask import current_app
+from app import db
+from app.models.therapist import Therapist
+
+# 中日韩统一表意文字
+CJK_PATTERN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]')
+TOKEN_PATTERN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[0-9a-z]+')
+
+# 参与检索的字段及其bm25权重
+SEARCH_FIELDS = ('name', 'specialty', 'introduction')
+FIELD_WEIGHTS = (10.0, 5.0, 1.0)
+
+
+def tokenize(content):
+    """索引分词：中文按单字和相邻双字切分，英文和数字按单词切分"""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer((content or '').lower()):
+        run = match.group()
+        if CJK_PATTERN.match(run):
+            tokens.extend(run)
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return ' '.join(tokens)
+
+
+def build_match_query(keyword):
+    """把搜索词转换为FTS5查询：中文按双字匹配，英文按前缀匹配"""
+    terms = []
+    for match in TOKEN_PATTERN.finditer((keyword or '').lower()):
+        run = match.group()
+        if CJK_PATTERN.match(run):
+            if len(run) == 1:
+                terms.append(f'"{run}"')
+            else:
+                terms.extend(f'"{run[i:i + 2]}"' for i in range(len(run) - 1))
+        else:
+            terms.append(f'"{run}"*')
+    return ' AND '.join(terms)
+
+
+def build_boolean_query(keyword, ngram_size=2):
+    """
+    把搜索词转换为MySQL ngram全文索引的短语查询
+    短于ngram_size的词不会产生任何ngram，短语匹配不到结果，此时返回None，由调用方退回LIKE匹配
+    """
+    runs = TOKEN_PATTERN.findall((keyword or '').lower())
+    if not runs or any(len(run) < ngram_size for run in runs):
+        return None
+    return '"' + keyword.replace('"', ' ') + '"'
+
+
+class TherapistSearch:
+    """技师全文检索：SQLite使用FTS5，MySQL使用ngram全文索引，结果按相关度和评分综合排序"""
+
+    @staticmethod
+    def ensure_index():
+        """创建检索索引（SQLite的FTS5虚拟表），MySQL的全文索引由迁移脚本创建"""
+        if db.engine.dialect.name != 'sqlite':
+            return
+        with db.engine.begin() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'therapist_search'"
+            )).first()
+            if not exists:
+                conn.execute(text(
+                    "CREATE VIRTUAL TABLE therapist_search USING fts5(name, specialty, introduction, tokenize='unicode61')"
+                ))
+                TherapistSearch._rebuild(conn)
+
+    @staticmethod
+    def rebuild():
+        """从therapists表全量重建索引"""
+        if db.engine.dialect.name != 'sqlite':
+            return
+        with db.engine.begin() as conn:
+            TherapistSearch._rebuild(conn)
+
+    @staticmethod
+    def _rebuild(conn):
+        conn.execute(text("DELETE FROM therapist_search"))
+        rows = conn.execute(text("SELECT id, name, specialty, introduction FROM therapists")).all()
+        if rows:
+            conn.execute(text(
+                "INSERT INTO therapist_search (rowid, name, specialty, introduction) "
+                "VALUES (:id, :name, :specialty, :introduction)"
+            ), [TherapistSearch._document(row) for row in rows])
+
+    @staticmethod
+    def _document(row):
+        return {
+            'id': row.id,
+            'name': tokenize(row.name),
+            'specialty': tokenize(row.specialty),
+            'introduction': tokenize(row.introduction)
+        }
+
+    @staticmethod
+    def search(keyword, page, size):
+        """按关键词检索审核通过的技师"""
+        dialect = db.engine.dialect.name
+        rating_weight = current_app.config.get('SEARCH_RATING_WEIGHT', 0.5)
+        params = {'limit': size, 'offset': (page - 1) * size, 'w': rating_weight}
+
+        if dialect == 'sqlite':
+            params['q'] = build_match_query(keyword)
+            if not params['q']:
+                return {'items': [], 'total': 0, 'page': page, 'size': size}
+            weights = ', '.join(str(w) for w in FIELD_WEIGHTS)
+            # CROSS JOIN固定连接顺序：先查全文索引再按主键取技师，
+            # 否则COUNT可能按status索引遍历全部技师、对每一行执行一次MATCH
+            where = ("FROM therapist_search s CROSS JOIN therapists t ON t.id = s.rowid "
+                     "WHERE therapist_search MATCH :q AND t.status = 1")
+            # bm25越小越相关，减去评分加权使高分技师靠前
+            order = f"bm25(therapist_search, {weights}) - :w * COALESCE(t.rating, 0)"
+        elif dialect == 'mysql':
+            # ngram解析器按双字切分，短语匹配要求关键词整体出现
+            params['q'] = build_boolean_query(keyword, current_app.config.get('SEARCH_NGRAM_TOKEN_SIZE', 2))
+            if not params['q']:
+                return TherapistSearch._search_like(keyword, page, size)
+            match = "MATCH(t.name, t.specialty, t.introduction) AGAINST(:q IN BOOLEAN MODE)"
+            where = f"FROM therapists t WHERE t.status = 1 AND {match}"
+            order = f"-({match} + :w * COALESCE(t.rating, 0))"
+        else:
+            return TherapistSearch._search_like(keyword, page, size)
+
+        total = db.session.execute(text(f"SELECT COUNT(*) {where}"), params).scalar()
+        ids = [row[0] for row in db.session.execute(
+            text(f"SELECT t.id {where} ORDER BY {order}, t.id LIMIT :limit OFFSET :offset"), params
+        )]
+
+        therapists = {t.id: t for t in Therapist.query.filter(Therapist.id.in_(ids)).all()} if ids else {}
+        return {
+            'items': [therapists[i] for i in ids if i in therapists],
+            'total': total,
+            'page': page,
+            'size': size
+        }
+
+    @staticmethod
+    def _search_like(keyword, page, size):
+        # 其他数据库或MySQL下的单字关键词退回到LIKE匹配
+        pattern = f'%{keyword}%'
+        query = Therapist.query.filter_by(status=1).filter(
+            Therapist.name.like(pattern) | Therapist.specialty.like(pattern) | Therapist.introduction.like(pattern)
+        ).order_by(Therapist.rating.desc(), Therapist.service_count.desc())
+        pagination = query.paginate(page=page, per_page=size, error_out=False)
+        return {
+            'items': pagination.items,
+            'total': pagination.total,
+            'page': page,
+            'size': size
+        }
+
+
+# SQLite下在同一事务内同步FTS5索引，注册、修改、删除技师时索引随之提交或回滚
+@event.listens_for(Therapist, 'after_insert')
+@event.listens_for(Therapist, 'after_update')
+def _sync_search_index(mapper, connection, target):
+    if connection.dialect.name != 'sqlite':
+        return
+    if not any(db.inspect(target).attrs[field].history.has_changes() for field in SEARCH_FIELDS):
+        return
+    connection.execute(text("DELETE FROM therapist_search WHERE rowid = :id"), {'id': target.id})
+    connection.execute(text(
+        "INSERT INTO therapist_search (rowid, name, specialty, introduction) "
+        "VALUES (:id, :name, :specialty, :introduction)"
+    ), TherapistSearch._document(target))
+
+
+@event.listens_for(Therapist, 'after_delete')
+def _remove_from_search_index(mapper, connection, target):
+    if connection.dialect.name != 'sqlite':
+        return
+    connection.execute(text("DELETE FROM therapist_search WHERE rowid = :id"), {'id': target.id})
@@ -1,5 +1,13 @@
+import base64
+import json
+from flask import current_app
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import selectinload, joinedload
 from app.models.therapist import Therapist, ServiceItem
+from app.models.feedback import Feedback
 from app.models.user import User
+from app.services.therapist_search import TherapistSearch
+from app.utils.geo import parse_coordinates, distance_from, bounding_box, cells_in_box
 from app import db
 
 
@@ -12,6 +20,8 @@ class TherapistService:
         if existing_therapist:
             raise Exception("手机号已注册")
 
+        latitude, longitude = parse_coordinates(data.get('latitude'), data.get('longitude'))
+
         # 创建技师（设置为待审核状态）
         therapist = Therapist(
             name=data['name'],
@@ -27,6 +37,7 @@ class TherapistService:
             id_card_handheld=data.get('id_card_handheld'),
             status=0  # 设置为待审核状态
         )
+        therapist.set_location(latitude, longitude)
 
         db.session.add(therapist)
         db.session.commit()
@@ -35,13 +46,14 @@ class TherapistService:
     @staticmethod
     def get_list(page, size, keyword=''):
         """获取技师列表"""
-        query = Therapist.query.filter_by(status=1)  # 只查询审核通过的技师
-
         if keyword:
-            query = query.filter(Therapist.name.contains(keyword))
+            # 关键词检索姓名、专长和简介，按相关度和评分综合排序
+            return TherapistSearch.search(keyword, page, size)
+
+        query = Therapist.query.filter_by(status=1)  # 只查询审核通过的技师
 
-        # 按评分和接单数排序
-        query = query.order_by(Therapist.rating.desc(), Therapist.service_count.desc())
+        # 按评分和接单数排序，id保证顺序稳定
+        query = query.order_by(Therapist.rating.desc(), Therapist.service_count.desc(), Therapist.id.desc())
 
         # 分页
         pagination = query.paginate(page=page, per_page=size, error_out=False)
@@ -54,9 +66,119 @@ class TherapistService:
         }
 
     @staticmethod
-    def get_detail(therapist_id):
-        """获取技师详情"""
-        return Therapist.query.filter_by(id=therapist_id, status=1).first()
+    def get_list_by_cursor(cursor, size):
+        """
+        按游标获取技师列表，不做OFFSET扫描和COUNT统计
+        :param cursor: 上一页返回的next_cursor，为空时从第一页开始
+        :return: 本页技师及下一页游标（没有更多数据时为None）
+        """
+        query = Therapist.query.filter_by(status=1)
+
+        if cursor:
+            rating, service_count, last_id = TherapistService._decode_cursor(cursor)
+            # 展开成OR条件而不是行值比较，保证MySQL能走(status, rating, service_count, id)索引
+            query = query.filter(or_(
+                Therapist.rating < rating,
+                and_(Therapist.rating == rating, Therapist.service_count < service_count),
+                and_(Therapist.rating == rating, Therapist.service_count == service_count, Therapist.id < last_id)
+            ))
+
+        # 多取一条用于判断是否还有下一页
+        items = query.order_by(
+            Therapist.rating.desc(), Therapist.service_count.desc(), Therapist.id.desc()
+        ).limit(size + 1).all()
+
+        next_cursor = None
+        if len(items) > size:
+            items = items[:size]
+            next_cursor = TherapistService._encode_cursor(items[-1])
+
+        return {
+            'items': items,
+            'next_cursor': next_cursor,
+            'size': size
+        }
+
+    @staticmethod
+    def _encode_cursor(therapist):
+        data = json.dumps([therapist.rating, therapist.service_count, therapist.id], separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            rating, service_count, last_id = json.loads(data)
+            # 评分列为两位小数的定点数，按列精度取整后再比较
+            return round(float(rating), 2), int(service_count), int(last_id)
+        except (ValueError, TypeError):
+            raise Exception("无效的分页游标")
+
+    @staticmethod
+    def get_nearby(latitude, longitude, radius_km, limit):
+        """
+        查询附近的技师，按距离由近到远排序，距离相差不到100米时评分高的优先
+        先用网格编号和经纬度矩形在索引上预筛选，再对候选技师计算精确球面距离
+        :return: [(技师, 距离公里数), ...]
+        """
+        max_radius = current_app.config.get('NEARBY_MAX_RADIUS_KM', 50)
+        radius_km = min(radius_km, max_radius)
+        min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+
+        query = db.session.query(
+            Therapist.id, Therapist.latitude, Therapist.longitude, Therapist.rating
+        ).filter(
+            Therapist.status == 1,
+            Therapist.geo_cell.in_(cells_in_box(min_lat, max_lat, min_lon, max_lon)),
+            Therapist.latitude.between(min_lat, max_lat)
+        )
+        if min_lon >= -180 and max_lon <= 180:
+            query = query.filter(Therapist.longitude.between(min_lon, max_lon))
+
+        distance_to = distance_from(latitude, longitude)
+        candidates = []
+        for therapist_id, lat, lon, rating in query:
+            distance = distance_to(lat, lon)
+            if distance <= radius_km:
+                candidates.append((round(distance, 1), -(rating or 0), therapist_id, distance))
+        candidates.sort()
+        candidates = candidates[:limit]
+
+        # 只为最终返回的技师加载完整信息
+        ids = [c[2] for c in candidates]
+        therapists = {t.id: t for t in Therapist.query.filter(Therapist.id.in_(ids)).all()} if ids else {}
+        return [(therapists[c[2]], c[3]) for c in candidates if c[2] in therapists]
+
+    @staticmethod
+    def update_location(therapist, latitude, longitude):
+        """更新技师常驻位置"""
+        latitude, longitude = parse_coordinates(latitude, longitude)
+        if latitude is None:
+            raise Exception("经纬度不能为空")
+        therapist.set_location(latitude, longitude)
+        db.session.commit()
+        return therapist
+
+    @staticmethod
+    def get_detail(therapist_id, feedback_limit=3):
+        """
+        获取技师详情
+        :return: (技师, 最新的feedback_limit条评价)，技师不存在时为(None, [])
+        """
+        # 服务项目用selectin一次加载，避免访问时再懒加载
+        therapist = Therapist.query.options(
+            selectinload(Therapist.service_items)
+        ).filter_by(id=therapist_id, status=1).first()
+        if not therapist:
+            return None, []
+
+        # 只取最新几条评价并连带加载评价用户，不加载整个feedbacks关系
+        feedbacks = Feedback.query.options(
+            joinedload(Feedback.user)
+        ).filter_by(therapist_id=therapist_id).order_by(
+            Feedback.created_at.desc(), Feedback.id.desc()
+        ).limit(feedback_limit).all()
+        return therapist, feedbacks
 
     # 服务项目管理
     @staticmethod
@@ -2,7 +2,12 @@ from app.models.user import User, UserAddress
 from app import db
 from app.utils.auth import generate_token
 from app.services.sms_service import SMSService
-import hashlib
+from app.utils.password import hash_password, verify_password, needs_rehash
+from app.utils.geo import parse_coordinates
+import re
+
+# 中国大陆手机号格式，用于区分手机号登录和用户名登录
+PHONE_PATTERN = re.compile(r'^1\d{10}$')
 
 
 class UserService:
@@ -44,7 +49,7 @@ class UserService:
 
             # 如果提供了密码，则进行加密存储
             if 'password' in data:
-                user.password_hash = hashlib.sha256(data['password'].encode()).hexdigest()
+                user.password_hash = hash_password(data['password'])
                 logger.info("密码已加密存储")
 
             db.session.add(user)
@@ -63,22 +68,35 @@ class UserService:
         if 'phone' not in data:
             raise Exception("缺少必要参数: phone")
         
-        # 尝试同时使用手机号或用户名登录
-        username_or_phone = data['phone']
-        user = User.query.filter((User.phone == username_or_phone) | (User.username == username_or_phone)).first()
+        # 支持手机号或用户名登录
+        user = UserService.resolve_login_user(data['phone'])
         if not user:
             raise Exception("用户不存在")
 
         # 验证密码
         if 'password' in data and hasattr(user, 'password_hash'):
-            password_hash = hashlib.sha256(data['password'].encode()).hexdigest()
-            if user.password_hash != password_hash:
+            if not verify_password(data['password'], user.password_hash):
                 raise Exception("密码错误")
 
+            # 旧的sha256哈希或低成本哈希在登录成功后透明升级
+            if needs_rehash(user.password_hash):
+                user.password_hash = hash_password(data['password'])
+                db.session.commit()
+
         # 生成token
-        token = generate_token(user.id)
+        token = generate_token(user.id, user)
         return token
 
+    @staticmethod
+    def resolve_login_user(identifier):
+        """根据登录标识查找用户，每条查询只走一个索引"""
+        if PHONE_PATTERN.match(identifier):
+            # 手机号格式走phone唯一索引，找不到时再按用户名查找
+            user = User.query.filter_by(phone=identifier).first()
+            if user:
+                return user
+        return User.query.filter_by(username=identifier).first()
+
     @staticmethod
     def login_with_sms(data):
         """通过短信验证码登录"""
@@ -106,9 +124,46 @@ class UserService:
             db.session.commit()
         
         # 生成token
-        token = generate_token(user.id)
+        token = generate_token(user.id, user)
         return token
 
+    @staticmethod
+    def get_user(user_id):
+        """获取完整用户信息"""
+        return User.query.get(user_id)
+
+    @staticmethod
+    def update_role(user_id, role):
+        """修改用户角色"""
+        if role not in ('user', 'therapist', 'admin'):
+            raise Exception("角色参数错误")
+
+        user = User.query.get(user_id)
+        if not user:
+            raise Exception("用户不存在")
+
+        if user.role != role:
+            # 提交时递增版本号，使携带旧角色声明的token失效
+            user.role = role
+            db.session.commit()
+        return user
+
+    @staticmethod
+    def update_status(user_id, status):
+        """修改用户状态（1:正常, 0:禁用）"""
+        if status not in (0, 1):
+            raise Exception("状态参数错误")
+
+        user = User.query.get(user_id)
+        if not user:
+            raise Exception("用户不存在")
+
+        if user.status != status:
+            # 提交时递增版本号，被禁用用户的token立即失效
+            user.status = status
+            db.session.commit()
+        return user
+
     @staticmethod
     def get_user_addresses(user_id):
         """获取用户地址列表"""
@@ -117,6 +172,8 @@ class UserService:
     @staticmethod
     def add_user_address(user_id, data):
         """添加用户地址"""
+        latitude, longitude = parse_coordinates(data.get('latitude'), data.get('longitude'))
+
         # 检查是否需要设置为默认地址
         is_default = data.get('is_default', 0)
         if is_default:
@@ -127,8 +184,8 @@ class UserService:
             user_id=user_id,
             name=data.get('name'),
             address=data['address'],
-            latitude=data.get('latitude'),
-            longitude=data.get('longitude'),
+            latitude=latitude,
+            longitude=longitude,
             is_default=is_default
         )
 
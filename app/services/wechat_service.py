@@ -1,17 +1,32 @@
 import requests
 import logging
+from sqlalchemy.exc import IntegrityError
 from app import db
 from app.models.user import User
 from app.utils.auth import generate_token
+from app.utils.user_cache import invalidate_user
+from app.utils.http_client import create_client
+from app.utils.singleflight import SingleFlight
+from app.utils import metrics
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 微信接口共享客户端，复用到api.weixin.qq.com的连接
+wechat_client = create_client('wechat')
+
+# 小程序冷启动时会并发发起多次登录，同一code/openid的并发请求只执行一次
+code_flight = SingleFlight()
+openid_flight = SingleFlight()
+metrics.register('wechat_login.code_flight', code_flight.stats)
+metrics.register('wechat_login.openid_flight', openid_flight.stats)
+
 class WechatService:
     # 微信开发平台参数，实际部署时应从配置文件读取
     APP_ID = 'your_wechat_app_id'  # 微信小程序AppID
     APP_SECRET = 'your_wechat_app_secret'  # 微信小程序AppSecret
+    API_BASE_URL = 'https://api.weixin.qq.com'
     
     @staticmethod
     def login_with_wechat(code):
@@ -22,7 +37,7 @@ class WechatService:
         """
         try:
             # 1. 用code换取openid和session_key
-            wechat_response = WechatService._get_wechat_openid(code)
+            wechat_response = code_flight.do(code, lambda: WechatService._get_wechat_openid(code))
             if 'errcode' in wechat_response:
                 logger.error(f"微信API错误: {wechat_response}")
                 raise Exception(f"微信登录失败: {wechat_response.get('errmsg', '未知错误')}")
@@ -34,22 +49,12 @@ class WechatService:
                 raise Exception("获取微信openid失败")
             
             # 2. 根据openid查找或创建用户
-            user = User.query.filter_by(wx_openid=openid).first()
-            
-            if not user:
-                # 如果有手机号，尝试通过手机号关联用户
-                # 这里可以扩展为让用户先绑定手机号
-                user = User(
-                    username=f'wx_{openid[:8]}',
-                    phone='',  # 微信登录初始无手机号
-                    wx_openid=openid,
-                    wx_unionid=unionid
-                )
-                db.session.add(user)
-                db.session.commit()
+            # ORM对象不能跨线程共享，合并调用只共享用户ID，各请求再按主键加载
+            user_id = openid_flight.do(openid, lambda: WechatService._get_or_create_user(openid, unionid))
+            user = User.query.get(user_id)
             
             # 3. 生成token
-            token = generate_token(user.id)
+            token = generate_token(user.id, user)
             return token, user
             
         except requests.RequestException as e:
@@ -59,6 +64,36 @@ class WechatService:
             logger.error(f"微信登录处理失败: {str(e)}")
             raise
     
+    @staticmethod
+    def _get_or_create_user(openid, unionid):
+        """
+        按openid查找或创建用户，并发创建时以唯一约束为准
+        :return: 用户ID
+        """
+        user = User.query.filter_by(wx_openid=openid).first()
+        if user:
+            return user.id
+        
+        # 如果有手机号，尝试通过手机号关联用户
+        # 这里可以扩展为让用户先绑定手机号
+        user = User(
+            username=f'wx_{openid[:8]}',
+            phone='',  # 微信登录初始无手机号
+            wx_openid=openid,
+            wx_unionid=unionid
+        )
+        try:
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+        except IntegrityError:
+            # 其他进程已经创建了该用户，直接读取
+            db.session.rollback()
+            user = User.query.filter_by(wx_openid=openid).first()
+            if not user:
+                raise
+            return user.id
+    
     @staticmethod
     def _get_wechat_openid(code):
         """
@@ -66,7 +101,7 @@ class WechatService:
         :param code: 微信登录获取的code
         :return: 微信API返回的结果
         """
-        url = 'https://api.weixin.qq.com/sns/jscode2session'
+        url = f'{WechatService.API_BASE_URL}/sns/jscode2session'
         params = {
             'appid': WechatService.APP_ID,
             'secret': WechatService.APP_SECRET,
@@ -74,7 +109,7 @@ class WechatService:
             'grant_type': 'authorization_code'
         }
         
-        response = requests.get(url, params=params)
+        response = wechat_client.get(url, params=params)
         response.raise_for_status()  # 如果请求失败，抛出异常
         return response.json()
     
@@ -98,6 +133,7 @@ class WechatService:
             
             user.phone = phone
             db.session.commit()
+            invalidate_user(user_id)
             return user
         except Exception as e:
             logger.error(f"绑定手机号失败: {str(e)}")
@@ -130,6 +166,7 @@ class WechatService:
                     user.avatar = wechat_info['avatarUrl']
             
             db.session.commit()
+            invalidate_user(user_id)
             return user
         except Exception as e:
             logger.error(f"更新微信用户信息失败: {str(e)}")
@@ -1,34 +1,80 @@
 import jwt
+import time
+import hashlib
 import datetime
 from functools import wraps
 from flask import request, jsonify, current_app
-from app.models.user import User
+from app.utils.cache import TTLCache
+from app.utils.user_cache import get_user_snapshot, get_user_version
+from app.utils import metrics
 
+# 已验证token缓存：token摘要 -> 解码后的claims，条目在token的exp时过期
+token_cache = TTLCache(maxsize=50000, ttl=0)
+metrics.register('token_cache', token_cache.stats)
 
-def generate_token(user_id):
-    """生成JWT token"""
+
+class Principal:
+    """由token声明构造的当前用户，鉴权时无需加载User"""
+    __slots__ = ('id', 'role', 'status', 'version')
+
+    def __init__(self, id, role, status, version=0):
+        self.id = id
+        self.role = role
+        self.status = status
+        self.version = version
+
+    def __repr__(self):
+        return f'<Principal {self.id} {self.role}>'
+
+
+def generate_token(user_id, user=None):
+    """生成JWT token，传入user时附带角色、状态和版本号声明"""
     payload = {
         'user_id': user_id,
         'exp': datetime.datetime.utcnow() + datetime.timedelta(days=30)
     }
+    if user is not None:
+        payload['role'] = user.role
+        payload['status'] = user.status
+        payload['ver'] = user.token_version or 0
     secret_key = current_app.config.get('JWT_SECRET_KEY', 'default-secret-key')
     return jwt.encode(payload, secret_key, algorithm='HS256')
 
 
-def verify_token(token):
-    """验证JWT token"""
+def decode_token(token):
+    """验证并解码JWT token，返回claims，无效时返回None"""
+    # 移除Bearer前缀
+    if token.startswith('Bearer '):
+        token = token[7:]
+    secret_key = current_app.config.get('JWT_SECRET_KEY', 'default-secret-key')
+
+    # 同一个token在每个进程内只做一次签名校验
+    use_cache = current_app.config.get('JWT_VERIFY_CACHE_ENABLED', True)
+    if use_cache:
+        digest = hashlib.sha256(f'{secret_key}:{token}'.encode()).digest()
+        payload = token_cache.get(digest)
+        if payload is not None:
+            return payload
+
     try:
-        # 移除Bearer前缀
-        if token.startswith('Bearer '):
-            token = token[7:]
-        secret_key = current_app.config.get('JWT_SECRET_KEY', 'default-secret-key')
         payload = jwt.decode(token, secret_key, algorithms=['HS256'])
-        return payload['user_id']
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
 
+    if use_cache and 'exp' in payload:
+        token_cache.set(digest, payload, ttl=payload['exp'] - time.time())
+    return payload
+
+
+def verify_token(token):
+    """验证JWT token"""
+    payload = decode_token(token)
+    if not payload:
+        return None
+    return payload.get('user_id')
+
 
 def token_required(f):
     """装饰器：验证token"""
@@ -48,19 +94,32 @@ def token_required(f):
             }), 401
 
         try:
-            user_id = verify_token(token)
+            payload = decode_token(token)
+            user_id = payload.get('user_id') if payload else None
             if not user_id:
                 return jsonify({
                     'code': 401,
                     'message': '令牌无效'
                 }), 401
 
-            current_user = User.query.filter_by(id=user_id).first()
+            sync_interval = current_app.config.get('USER_VERSION_SYNC_INTERVAL', 30)
+            current_version = get_user_version(user_id, sync_interval)
+            if 'role' in payload and (payload.get('ver') or 0) >= current_version:
+                # 版本号未变化时直接信任token中的声明，不查询users表
+                current_user = Principal(user_id, payload['role'], payload.get('status'), payload.get('ver'))
+            else:
+                # 旧格式token或声明已作废，使用进程内用户快照
+                current_user = get_user_snapshot(user_id, min_version=current_version)
             if not current_user:
                 return jsonify({
                     'code': 401,
                     'message': '用户不存在'
                 }), 401
+            if current_user.status != 1:
+                return jsonify({
+                    'code': 403,
+                    'message': '账号已被禁用'
+                }), 403
 
         except Exception as e:
             return jsonify({
@@ -87,3 +146,19 @@ def admin_required(f):
         return f(current_user, *args, **kwargs)
 
     return decorated
+
+
+def therapist_required(f):
+    """装饰器：验证治疗师权限"""
+
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        if current_user.role != 'therapist':
+            return jsonify({
+                'code': 403,
+                'message': '权限不足，需要治疗师权限'
+            }), 403
+
+        return f(current_user, *args, **kwargs)
+
+    return decorated
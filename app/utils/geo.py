@@ -0,0 +1,88 @@
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+
+# 网格索引的格子边长（度），约11公里；修改后需要重新计算所有技师的geo_cell
+GEO_CELL_SIZE = 0.1
+GEO_CELL_COLUMNS = int(round(360 / GEO_CELL_SIZE))
+
+
+def parse_coordinates(latitude, longitude):
+    """
+    解析经纬度，两者都为空时返回(None, None)
+    :raises Exception: 格式错误或超出范围
+    """
+    if latitude in (None, '') and longitude in (None, ''):
+        return None, None
+    try:
+        latitude = float(latitude)
+        longitude = float(longitude)
+    except (TypeError, ValueError):
+        raise Exception("经纬度格式错误")
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise Exception("经纬度超出范围")
+    return latitude, longitude
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """两点间的球面距离（公里）"""
+    return distance_from(lat1, lon1)(lat2, lon2)
+
+
+def distance_from(latitude, longitude):
+    """返回计算到给定点球面距离（公里）的函数，批量计算时复用起点的三角函数值"""
+    lat1 = math.radians(latitude)
+    lon1 = math.radians(longitude)
+    cos_lat1 = math.cos(lat1)
+    radians, sin, cos, asin, sqrt = math.radians, math.sin, math.cos, math.asin, math.sqrt
+
+    def distance(lat, lon):
+        lat2 = radians(lat)
+        a = sin((lat2 - lat1) / 2) ** 2 + cos_lat1 * cos(lat2) * sin((radians(lon) - lon1) / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(a)))
+
+    return distance
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """以给定点为中心、半径为radius_km的外接经纬度矩形 (min_lat, max_lat, min_lon, max_lon)"""
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat = max(-90.0, latitude - delta_lat)
+    max_lat = min(90.0, latitude + delta_lat)
+    # 矩形触及极点时经度不再有约束
+    if min_lat <= -90 or max_lat >= 90:
+        return min_lat, max_lat, -180.0, 180.0
+    delta_lon = math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(latitude))))
+    if delta_lon >= 180:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, longitude - delta_lon, longitude + delta_lon
+
+
+def _row(latitude):
+    return min(int((latitude + 90) / GEO_CELL_SIZE), int(round(180 / GEO_CELL_SIZE)) - 1)
+
+
+def _column(longitude):
+    return int((longitude + 180) / GEO_CELL_SIZE) % GEO_CELL_COLUMNS
+
+
+def geo_cell(latitude, longitude):
+    """经纬度所在网格的编号，经纬度为空时返回None"""
+    if latitude is None or longitude is None:
+        return None
+    return _row(latitude) * GEO_CELL_COLUMNS + _column(longitude)
+
+
+def cells_in_box(min_lat, max_lat, min_lon, max_lon):
+    """覆盖经纬度矩形的所有网格编号，矩形跨越180度经线时自动回绕"""
+    if max_lon - min_lon >= 360:
+        columns = range(GEO_CELL_COLUMNS)
+    else:
+        first, last = _column(min_lon), _column(max_lon)
+        if first <= last:
+            columns = range(first, last + 1)
+        else:
+            columns = list(range(first, GEO_CELL_COLUMNS)) + list(range(0, last + 1))
+    return [row * GEO_CELL_COLUMNS + column
+            for row in range(_row(min_lat), _row(max_lat) + 1)
+            for column in columns]
@@ -0,0 +1,181 @@
+import bisect
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.utils import metrics
+
+# 延迟直方图分桶上界（毫秒）
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class CircuitOpenError(requests.RequestException):
+    """熔断器打开，请求未发出"""
+
+
+class CircuitBreaker:
+    """连续失败达到阈值后熔断，冷却期结束后放行一个探测请求"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """判断当前是否允许发出请求"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                # 冷却结束，只放行一个探测请求
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class HttpClient:
+    """共享的出站HTTP客户端：连接池复用、超时、带抖动的有限重试和熔断"""
+
+    def __init__(self, name, connect_timeout=2, read_timeout=5, retries=2, backoff=0.2,
+                 pool_size=10, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.session = self._create_session(pool_size)
+        self._lock = threading.Lock()
+        self._buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._latency_sum = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.retried = 0
+        self.short_circuited = 0
+
+    @staticmethod
+    def _create_session(pool_size):
+        session = requests.Session()
+        # 重试由本客户端自行控制，连接池只负责keep-alive复用
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def configure(self, connect_timeout=None, read_timeout=None, retries=None, pool_size=None,
+                  failure_threshold=None, reset_timeout=None):
+        """按应用配置调整参数"""
+        if connect_timeout is not None:
+            self.connect_timeout = connect_timeout
+        if read_timeout is not None:
+            self.read_timeout = read_timeout
+        if retries is not None:
+            self.retries = retries
+        if pool_size is not None:
+            old_session = self.session
+            self.session = self._create_session(pool_size)
+            old_session.close()
+        if failure_threshold is not None:
+            self.breaker.failure_threshold = failure_threshold
+        if reset_timeout is not None:
+            self.breaker.reset_timeout = reset_timeout
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        """发送请求，连接失败和5xx响应会按指数退避加抖动重试"""
+        kwargs.setdefault('timeout', (self.connect_timeout, self.read_timeout))
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                with self._lock:
+                    self.short_circuited += 1
+                raise CircuitOpenError(f"{self.name} 服务暂不可用（熔断中）")
+
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.RequestException as e:
+                # 任何请求异常都记为失败，半开状态的探测请求失败时重新熔断，不会一直停在半开
+                self._observe(start, failed=True)
+                # 只重试连接失败和连接超时；读超时时请求可能已被对方处理，不重试，避免重复消费一次性code
+                retryable = isinstance(e, (requests.ConnectionError, requests.Timeout)) \
+                    and not isinstance(e, requests.ReadTimeout)
+                if not retryable or attempt >= self.retries:
+                    raise
+            else:
+                failed = response.status_code >= 500
+                self._observe(start, failed=failed)
+                if not failed or attempt >= self.retries:
+                    return response
+
+            attempt += 1
+            with self._lock:
+                self.retried += 1
+            time.sleep(self.backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+
+    def _observe(self, start, failed):
+        elapsed = (time.perf_counter() - start) * 1000
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        with self._lock:
+            self.requests += 1
+            if failed:
+                self.failures += 1
+            self._buckets[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+            self._latency_sum += elapsed
+
+    def stats(self):
+        """请求计数、熔断状态和延迟直方图"""
+        with self._lock:
+            # 累计分桶，le_N 表示耗时不超过N毫秒的请求数
+            buckets = {}
+            total = 0
+            for bound, count in zip(LATENCY_BUCKETS, self._buckets):
+                total += count
+                buckets[f'le_{bound}'] = total
+            buckets['le_inf'] = total + self._buckets[-1]
+            return {
+                'requests': self.requests,
+                'failures': self.failures,
+                'retried': self.retried,
+                'short_circuited': self.short_circuited,
+                'circuit_state': self.breaker.state,
+                'latency_ms_sum': round(self._latency_sum, 2),
+                'latency_ms_buckets': buckets
+            }
+
+
+def create_client(name, **kwargs):
+    """创建客户端并注册指标"""
+    client = HttpClient(name, **kwargs)
+    metrics.register(f'http_client.{name}', client.stats)
+    return client
@@ -0,0 +1,172 @@
+import datetime
+import hashlib
+import threading
+from functools import wraps
+
+from flask import request, jsonify, current_app, make_response, Response
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models.idempotency_key import IdempotencyKey
+from app.utils import metrics
+
+
+class IdempotencyStore:
+    """幂等键存储：idempotency_keys表的(scope, key)唯一索引保证并发的重复请求只有一个被处理"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.replayed = 0
+        self.rejected = 0
+
+    def begin(self, scope, key, fingerprint):
+        """
+        占用幂等键
+        :return: None表示占用成功、应处理本次请求；否则返回已有的记录（status_code为空表示处理中）
+        """
+        for _ in range(5):
+            now = datetime.datetime.utcnow()
+            db.session.add(IdempotencyKey(
+                scope=scope, key=key, fingerprint=fingerprint, created_at=now,
+                expires_at=now + datetime.timedelta(seconds=current_app.config.get('IDEMPOTENCY_TTL', 86400))
+            ))
+            try:
+                db.session.commit()
+                return None
+            except IntegrityError:
+                db.session.rollback()
+
+            record = IdempotencyKey.query.filter_by(scope=scope, key=key).first()
+            if record is None:
+                # 刚被删除，重新占用
+                continue
+            lock_timeout = datetime.timedelta(seconds=current_app.config.get('IDEMPOTENCY_LOCK_TIMEOUT', 60))
+            if record.expires_at > now and (record.status_code is not None or record.created_at > now - lock_timeout):
+                return record
+            # 已过期或处理中断：按created_at条件删除，并发时只有一个请求能删掉并重新占用
+            IdempotencyKey.query.filter_by(id=record.id, created_at=record.created_at).delete()
+            db.session.commit()
+        # 多次争用都没有占到（其他请求反复占用又释放），按处理中返回，客户端稍后重试
+        return IdempotencyKey(scope=scope, key=key, fingerprint=fingerprint)
+
+    def complete(self, scope, key, status_code, response):
+        """保存处理结果，之后的重复请求直接返回该结果"""
+        IdempotencyKey.query.filter_by(scope=scope, key=key).update(
+            {'status_code': status_code, 'response': response}, synchronize_session=False
+        )
+        db.session.commit()
+
+    def release(self, scope, key):
+        """处理失败时释放幂等键，允许客户端重试"""
+        db.session.rollback()
+        IdempotencyKey.query.filter_by(scope=scope, key=key, status_code=None).delete(synchronize_session=False)
+        db.session.commit()
+
+    def purge_expired(self, batch_size=1000):
+        """分批删除过期的幂等键，返回删除条数"""
+        deleted = 0
+        while True:
+            ids = [row[0] for row in db.session.query(IdempotencyKey.id).filter(
+                IdempotencyKey.expires_at <= datetime.datetime.utcnow()
+            ).limit(batch_size)]
+            if not ids:
+                return deleted
+            deleted += IdempotencyKey.query.filter(IdempotencyKey.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        with self._lock:
+            return {'processed': self.processed, 'replayed': self.replayed, 'rejected': self.rejected}
+
+
+idempotency_store = IdempotencyStore()
+metrics.register('idempotency', idempotency_store.stats)
+
+
+def _key_value(source, args):
+    """提取幂等键，取不到时按普通请求处理"""
+    if source == 'header':
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return None
+        # 客户端生成的键只在当前用户范围内有效
+        user = args[0] if args else None
+        return f'{user.id}:{key}' if user is not None else key
+    if source == 'transaction_id':
+        data = request.get_json(silent=True) or request.form.to_dict()
+        transaction_id = data.get('transaction_id')
+        # 同一笔交易的支付失败和支付成功通知分别处理
+        return f"{transaction_id}:{data.get('status')}" if transaction_id else None
+    raise ValueError(f"未知的幂等键来源: {source}")
+
+
+def _error(code, message):
+    response = jsonify({'code': code, 'message': message})
+    response.status_code = code
+    return response
+
+
+def _ack():
+    """支付回调的确认响应，支付平台收到非成功响应会持续重试通知"""
+    return jsonify({'code': 200, 'message': '回调已接收'})
+
+
+def idempotent(scope, source='header'):
+    """
+    装饰器：按幂等键去重，重复请求直接返回首次成功处理的响应，不再执行接口逻辑
+    只保存成功的响应（HTTP 2xx且code为200），失败的请求释放幂等键，允许重试
+    支付回调（source为transaction_id）的重复通知只按交易号去重，不校验请求体（签名、通知时间等字段每次不同），
+    首次通知仍在处理中时直接确认
+    :param scope: 接口名称
+    :param source: 幂等键来源，header为请求头Idempotency-Key（按用户区分），transaction_id为支付回调的交易号
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            key = _key_value(source, args)
+            if not key:
+                return f(*args, **kwargs)
+            if len(key) > 200:
+                return _error(400, '幂等键过长')
+
+            fingerprint = hashlib.sha256(
+                request.method.encode() + b' ' + request.path.encode() + b'\n' + request.get_data()
+            ).hexdigest()
+            record = idempotency_store.begin(scope, key, fingerprint)
+            if record is not None:
+                if source != 'transaction_id' and record.fingerprint != fingerprint:
+                    idempotency_store.count('rejected')
+                    return _error(422, '幂等键已用于其他请求')
+                if record.status_code is None:
+                    idempotency_store.count('rejected')
+                    if source == 'transaction_id':
+                        return _ack()
+                    return _error(409, '请求正在处理中，请稍后重试')
+                idempotency_store.count('replayed')
+                response = Response(record.response, status=record.status_code, mimetype='application/json')
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+
+            try:
+                response = make_response(f(*args, **kwargs))
+            except Exception:
+                idempotency_store.release(scope, key)
+                raise
+            body = response.get_json(silent=True) if response.is_json else None
+            if 200 <= response.status_code < 300 and isinstance(body, dict) and body.get('code') == 200 \
+                    and 'error' not in body:
+                idempotency_store.complete(scope, key, response.status_code, response.get_data(as_text=True))
+            else:
+                idempotency_store.release(scope, key)
+            idempotency_store.count('processed')
+            return response
+
+        return decorated
+
+    return decorator
@@ -0,0 +1,24 @@
+import threading
+
+# 指标名称 -> 返回dict的回调函数
+_collectors = {}
+_lock = threading.Lock()
+
+
+def register(name, collector):
+    """注册指标采集函数"""
+    with _lock:
+        _collectors[name] = collector
+
+
+def snapshot():
+    """采集所有已注册的指标"""
+    with _lock:
+        collectors = dict(_collectors)
+    result = {}
+    for name, collector in collectors.items():
+        try:
+            result[name] = collector()
+        except Exception as e:
+            result[name] = {'error': str(e)}
+    return result
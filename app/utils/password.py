@@ -0,0 +1,135 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils import metrics
+
+ALGORITHM = 'pbkdf2_sha256'
+
+
+class PasswordHasher:
+    """密码哈希：在有界线程池中执行PBKDF2，避免阻塞请求线程，兼容旧的sha256哈希"""
+
+    def __init__(self, iterations=120000, workers=4, max_queue=64):
+        self.iterations = iterations
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0  # 排队及执行中的任务数
+        self.completed = 0
+        self.rejected = 0
+        self.total_ms = 0.0
+
+    def configure(self, iterations=None, workers=None, max_queue=None):
+        """调整哈希成本和线程池大小"""
+        with self._lock:
+            if iterations is not None:
+                self.iterations = iterations
+            if workers is not None and workers != self.workers:
+                self.workers = workers
+                if self._executor:
+                    self._executor.shutdown(wait=False)
+                    self._executor = None
+            if max_queue is not None:
+                self.max_queue = max_queue
+
+    def hash(self, password):
+        """生成密码哈希"""
+        salt = base64.b64encode(os.urandom(16)).decode().rstrip('=')
+        iterations = self.iterations
+        digest = self._run(self._pbkdf2, password, salt, iterations)
+        return f'{ALGORITHM}${iterations}${salt}${digest}'
+
+    def verify(self, password, password_hash):
+        """校验密码，支持PBKDF2哈希和旧的sha256十六进制哈希"""
+        if not password_hash:
+            return False
+
+        if '$' not in password_hash:
+            # 旧格式：sha256十六进制摘要
+            legacy = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(legacy, password_hash)
+
+        try:
+            algorithm, iterations, salt, expected = password_hash.split('$')
+            iterations = int(iterations)
+        except ValueError:
+            return False
+        if algorithm != ALGORITHM:
+            return False
+
+        digest = self._run(self._pbkdf2, password, salt, iterations)
+        return hmac.compare_digest(digest, expected)
+
+    def needs_rehash(self, password_hash):
+        """旧格式或成本低于当前配置的哈希需要重新计算"""
+        if not password_hash or '$' not in password_hash:
+            return True
+        try:
+            algorithm, iterations = password_hash.split('$')[:2]
+            return algorithm != ALGORITHM or int(iterations) < self.iterations
+        except ValueError:
+            return True
+
+    @staticmethod
+    def _pbkdf2(password, salt, iterations):
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), iterations)
+        return base64.b64encode(digest).decode().rstrip('=')
+
+    def _run(self, func, *args):
+        # 提交到线程池并等待结果；hashlib计算期间释放GIL，其他请求线程可以继续处理
+        with self._lock:
+            if self.pending >= self.max_queue:
+                self.rejected += 1
+                raise Exception("系统繁忙，请稍后重试")
+            self.pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+            executor = self._executor
+
+        start = time.perf_counter()
+        try:
+            return executor.submit(func, *args).result()
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+                self.total_ms += elapsed
+
+    def stats(self):
+        """线程池队列指标"""
+        with self._lock:
+            return {
+                'iterations': self.iterations,
+                'workers': self.workers,
+                'pending': self.pending,
+                'max_queue': self.max_queue,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'avg_ms': round(self.total_ms / self.completed, 2) if self.completed else 0
+            }
+
+
+password_hasher = PasswordHasher()
+metrics.register('password_hasher', password_hasher.stats)
+
+
+def hash_password(password):
+    """生成密码哈希"""
+    return password_hasher.hash(password)
+
+
+def verify_password(password, password_hash):
+    """校验密码"""
+    return password_hasher.verify(password, password_hash)
+
+
+def needs_rehash(password_hash):
+    """判断密码哈希是否需要升级"""
+    return password_hasher.needs_rehash(password_hash)
@@ -0,0 +1,257 @@
+import math
+import threading
+import time
+from functools import wraps
+
+from flask import request, jsonify, current_app, make_response
+
+from app.utils.cache import TTLCache
+from app.utils import metrics
+
+
+class MemoryRateLimitBackend:
+    """进程内滑动窗口计数，每个key只保存两个窗口的计数"""
+
+    def __init__(self, maxsize=100000):
+        self._windows = TTLCache(maxsize=maxsize, ttl=3600)
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, window, now):
+        """记录一次请求，返回(是否放行, 上一窗口计数, 当前窗口计数, 当前窗口起点)"""
+        current_start = now - now % window
+        with self._lock:
+            entry = self._windows.get(key)
+            if entry is None or entry[0] < current_start - window:
+                entry = [current_start, 0, 0]
+            elif entry[0] < current_start:
+                # 进入新窗口，当前计数转为上一窗口计数
+                entry = [current_start, entry[2], 0]
+
+            allowed = _estimate(entry[1], entry[2], window, now - current_start) + 1 <= limit
+            if allowed:
+                entry[2] += 1
+            self._windows.set(key, entry, ttl=window * 2)
+        return allowed, entry[1], entry[2], current_start
+
+    def undo(self, key, window, now):
+        """撤销now时刻记录的一次请求"""
+        hit_start = now - now % window
+        with self._lock:
+            entry = self._windows.get(key)
+            if entry is None:
+                return
+            if entry[0] == hit_start and entry[2] > 0:
+                entry[2] -= 1
+            elif entry[0] == hit_start + window and entry[1] > 0:
+                # 已进入下一窗口，这次请求计在上一窗口中
+                entry[1] -= 1
+
+
+class RedisRateLimitBackend:
+    """Redis滑动窗口计数，多进程共享限流状态"""
+
+    HIT_SCRIPT = """
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local current_start = now - (now % window)
+local data = redis.call('HMGET', KEYS[1], 'start', 'prev', 'curr')
+local start = tonumber(data[1]) or current_start
+local prev = tonumber(data[2]) or 0
+local curr = tonumber(data[3]) or 0
+if start < current_start - window then
+    prev = 0
+    curr = 0
+elseif start < current_start then
+    prev = curr
+    curr = 0
+end
+local allowed = 0
+if prev * (window - (now - current_start)) / window + curr + 1 <= limit then
+    allowed = 1
+    curr = curr + 1
+end
+redis.call('HSET', KEYS[1], 'start', current_start, 'prev', prev, 'curr', curr)
+redis.call('EXPIRE', KEYS[1], math.ceil(window * 2))
+return {allowed, prev, curr, tostring(current_start)}
+"""
+
+    UNDO_SCRIPT = """
+local hit_start = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local data = redis.call('HMGET', KEYS[1], 'start', 'prev', 'curr')
+local start = tonumber(data[1])
+if not start then return 0 end
+if start == hit_start and tonumber(data[3]) > 0 then
+    redis.call('HINCRBY', KEYS[1], 'curr', -1)
+elseif start == hit_start + window and tonumber(data[2]) > 0 then
+    redis.call('HINCRBY', KEYS[1], 'prev', -1)
+end
+return 1
+"""
+
+    def __init__(self, url, prefix='rate_limit:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATELIMIT_STORAGE=redis需要安装redis包（pip install -r requirements.txt），或改用memory存储")
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self._hit = self.client.register_script(self.HIT_SCRIPT)
+        self._undo = self.client.register_script(self.UNDO_SCRIPT)
+
+    def hit(self, key, limit, window, now):
+        allowed, previous, current, current_start = self._hit(keys=[self.prefix + key], args=[window, limit, now])
+        return bool(allowed), int(previous), int(current), float(current_start)
+
+    def undo(self, key, window, now):
+        self._undo(keys=[self.prefix + key], args=[now - now % window, window])
+
+
+def _estimate(previous, current, window, elapsed):
+    # 滑动窗口估算：上一窗口按剩余比例加权 + 当前窗口计数
+    return previous * (window - elapsed) / window + current
+
+
+def _retry_after(previous, current, limit, window, elapsed):
+    # 估算再发起一次请求能被放行所需等待的秒数
+    if current + 1 > limit:
+        # 当前窗口已满，需等到下一窗口且本窗口计数的权重降到阈值以下
+        wait = window - elapsed
+        if current > 0 and limit > 1:
+            wait += window * max(0.0, 1 - (limit - 1) / current)
+        elif current > 0:
+            wait += window
+        return wait
+    if previous > 0:
+        return max(0.0, window * (1 - (limit - 1 - current) / previous) - elapsed)
+    return 0.0
+
+
+class RateLimiter:
+    """滑动窗口限流器，可按手机号、IP、设备等维度限流"""
+
+    def __init__(self):
+        self.backend = MemoryRateLimitBackend()
+        self.enabled = True
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+
+    def configure(self, enabled=None, backend=None, redis_url=None):
+        if enabled is not None:
+            self.enabled = enabled
+        if backend == 'redis':
+            self.backend = RedisRateLimitBackend(redis_url)
+        elif backend == 'memory':
+            self.backend = MemoryRateLimitBackend()
+        elif backend is not None:
+            raise ValueError(f"未知的限流存储类型: {backend}")
+
+    def check(self, key, limit, window, now=None):
+        """
+        记录一次请求并判断是否超限
+        :param now: 请求时间戳，为空时取当前时间；撤销时需传入同一时间戳
+        :return: (是否放行, 剩余次数, 重置时间戳, 建议重试秒数)
+        """
+        if now is None:
+            now = time.time()
+        allowed, previous, current, current_start = self.backend.hit(key, limit, window, now)
+        with self._lock:
+            if allowed:
+                self.allowed += 1
+            else:
+                self.rejected += 1
+
+        elapsed = now - current_start
+        remaining = max(0, math.floor(limit - _estimate(previous, current, window, elapsed)))
+        reset_at = math.ceil(current_start + window)
+        retry_after = 0
+        if not allowed:
+            retry_after = max(1, math.ceil(_retry_after(previous, current, limit, window, elapsed)))
+        return allowed, remaining, reset_at, retry_after
+
+    def undo(self, key, window, now):
+        """撤销check记录的一次请求，用于同一接口的后续规则拒绝时退还前面规则已计的次数"""
+        self.backend.undo(key, window, now)
+        with self._lock:
+            self.allowed -= 1
+
+    def stats(self):
+        with self._lock:
+            return {'enabled': self.enabled, 'allowed': self.allowed, 'rejected': self.rejected}
+
+
+rate_limiter = RateLimiter()
+metrics.register('rate_limiter', rate_limiter.stats)
+
+
+def _scope_value(scope):
+    """提取限流维度的值，取不到时跳过该规则"""
+    if scope == 'ip':
+        return request.remote_addr
+    if scope == 'device':
+        return request.headers.get('X-Device-Id')
+    if scope == 'phone':
+        data = request.get_json(silent=True) or {}
+        phone = data.get('phone')
+        return str(phone) if phone else None
+    raise ValueError(f"未知的限流维度: {scope}")
+
+
+def rate_limit(name, rules, refund_on_error=False):
+    """
+    装饰器：滑动窗口限流
+    :param name: 限流规则组名称，用于区分不同接口
+    :param rules: [(维度, 次数, 窗口秒数), ...]，维度为 phone / ip / device
+    :param refund_on_error: 接口返回错误时退还本次计数，用于发送短信等失败时没有产生实际消耗的接口
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if not rate_limiter.enabled or not current_app.config.get('RATELIMIT_ENABLED', True):
+                return f(*args, **kwargs)
+
+            headers = None
+            now = time.time()
+            counted = []
+            for scope, limit, window in rules:
+                value = _scope_value(scope)
+                if not value:
+                    continue
+                key = f'{name}:{scope}:{window}:{value}'
+                allowed, remaining, reset_at, retry_after = rate_limiter.check(key, limit, window, now)
+                # 返回触发限流或剩余次数最少的规则对应的头信息
+                if not allowed or headers is None or remaining < headers['X-RateLimit-Remaining']:
+                    headers = {
+                        'X-RateLimit-Limit': limit,
+                        'X-RateLimit-Remaining': remaining,
+                        'X-RateLimit-Reset': reset_at
+                    }
+                if allowed:
+                    counted.append((key, window))
+                else:
+                    # 请求被拒绝，前面规则已计的次数全部退还，避免未发出的请求占用额度
+                    for counted_key, counted_window in counted:
+                        rate_limiter.undo(counted_key, counted_window, now)
+                    headers['Retry-After'] = retry_after
+                    response = jsonify({
+                        'code': 429,
+                        'message': '请求过于频繁，请稍后再试'
+                    })
+                    response.status_code = 429
+                    response.headers.update({k: str(v) for k, v in headers.items()})
+                    return response
+
+            response = make_response(f(*args, **kwargs))
+            if refund_on_error and response.status_code >= 400:
+                for counted_key, counted_window in counted:
+                    rate_limiter.undo(counted_key, counted_window, now)
+            if headers:
+                response.headers.update({k: str(v) for k, v in headers.items()})
+            return response
+
+        return decorated
+
+    return decorator
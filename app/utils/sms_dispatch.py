@@ -0,0 +1,211 @@
+import logging
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SMSMessage:
+    __slots__ = ('phone', 'content', 'provider', 'attempts')
+
+    def __init__(self, phone, content, provider):
+        self.phone = phone
+        self.content = content
+        self.provider = provider
+        self.attempts = 0
+
+    def __repr__(self):
+        return f'<SMSMessage {self.phone} via {self.provider}>'
+
+
+class LogSMSProvider:
+    """仅记录日志的短信通道，接入真实短信平台前使用"""
+    name = 'log'
+
+    def send_batch(self, messages):
+        """批量发送，返回发送失败的消息列表"""
+        for message in messages:
+            logger.info(f"向{message.phone}发送短信: {message.content}")
+        return []
+
+
+class FakeSMSProvider:
+    """本地测试用短信通道：记录已发送消息，可按次数模拟失败，可暂停以模拟发送阻塞"""
+    name = 'fake'
+
+    def __init__(self, fail_times=0, delay=0):
+        self.fail_times = fail_times
+        self.delay = delay
+        self.sent = []
+        self.batches = []
+        self.sending = threading.Event()  # 工作线程已取走一批并开始发送
+        self._resumed = threading.Event()
+        self._resumed.set()
+        self._lock = threading.Lock()
+
+    def pause(self):
+        """暂停发送，工作线程取走消息后阻塞在发送中"""
+        self._resumed.clear()
+
+    def resume(self):
+        self._resumed.set()
+
+    def send_batch(self, messages):
+        self.sending.set()
+        self._resumed.wait()
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            if self.fail_times > 0:
+                self.fail_times -= 1
+                raise Exception("模拟短信平台故障")
+            self.batches.append(len(messages))
+            self.sent.extend(messages)
+        return []
+
+
+class SMSDispatcher:
+    """异步短信发送：有界队列 + 工作线程，按通道批量发送，失败退避重试，最终失败进入死信列表"""
+
+    def __init__(self, workers=2, queue_size=1000, batch_size=50, batch_wait=0.05,
+                 max_retries=3, backoff=0.5, dead_letter_size=1000):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.providers = {LogSMSProvider.name: LogSMSProvider()}
+        self.default_provider = LogSMSProvider.name
+        self.dead_letters = deque(maxlen=dead_letter_size)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.sent = 0
+        self.retried = 0
+        self.dropped = 0
+
+    def configure(self, workers=None, queue_size=None, batch_size=None, max_retries=None, provider=None):
+        """按应用配置调整参数，需在发送第一条短信前调用"""
+        with self._lock:
+            if workers is not None:
+                self.workers = workers
+            if queue_size is not None and not self._threads:
+                self._queue = queue.Queue(maxsize=queue_size)
+            if batch_size is not None:
+                self.batch_size = batch_size
+            if max_retries is not None:
+                self.max_retries = max_retries
+            if provider is not None:
+                self.default_provider = provider
+
+    def register_provider(self, provider):
+        """注册短信通道"""
+        self.providers[provider.name] = provider
+
+    def send(self, phone, content, provider=None):
+        """投递短信，入队后立即返回，不等待短信平台响应"""
+        message = SMSMessage(phone, content, provider or self.default_provider)
+        if message.provider not in self.providers:
+            raise Exception(f"未知的短信通道: {message.provider}")
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            raise Exception("短信发送繁忙，请稍后重试")
+        with self._lock:
+            self.enqueued += 1
+
+    def join(self, timeout=5):
+        """等待队列中已有消息处理完（用于测试和优雅退出）"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self._queue.unfinished_tasks == 0
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'sms-dispatch-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # 短暂等待以凑满一批
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                by_provider = {}
+                for message in batch:
+                    by_provider.setdefault(message.provider, []).append(message)
+                for name, messages in by_provider.items():
+                    self._deliver(self.providers[name], messages)
+            except Exception as e:
+                logger.error(f"短信分发异常: {str(e)}", exc_info=True)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _deliver(self, provider, messages):
+        pending = messages
+        while pending:
+            for message in pending:
+                message.attempts += 1
+            try:
+                failed = provider.send_batch(pending) or []
+            except Exception as e:
+                logger.warning(f"短信通道{provider.name}发送失败: {str(e)}")
+                failed = pending
+
+            with self._lock:
+                self.sent += len(pending) - len(failed)
+
+            retry = [m for m in failed if m.attempts <= self.max_retries]
+            for message in failed:
+                if message.attempts > self.max_retries:
+                    logger.error(f"短信发送最终失败，进入死信列表: {message}")
+                    self.dead_letters.append(message)
+            if retry:
+                with self._lock:
+                    self.retried += len(retry)
+                # 指数退避加抖动
+                attempt = retry[0].attempts
+                time.sleep(self.backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+            pending = retry
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'workers': len(self._threads),
+                'enqueued': self.enqueued,
+                'sent': self.sent,
+                'retried': self.retried,
+                'dropped': self.dropped,
+                'dead_letters': len(self.dead_letters)
+            }
+
+
+sms_dispatcher = SMSDispatcher()
+metrics.register('sms_dispatcher', sms_dispatcher.stats)
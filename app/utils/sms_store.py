@@ -0,0 +1,173 @@
+import datetime
+import threading
+
+from sqlalchemy import func
+
+from app import db
+from app.models.sms_code import SMSCode
+from app.utils.cache import TTLCache
+from app.utils import metrics
+
+# 校验结果
+VERIFY_OK = 'ok'
+VERIFY_MISSING = 'missing'  # 不存在、已使用或已过期
+VERIFY_EXPIRED = 'expired'
+VERIFY_MISMATCH = 'mismatch'
+VERIFY_LOCKED = 'locked'  # 错误次数过多，验证码已作废
+
+
+class MemorySMSCodeStore:
+    """进程内验证码存储，适用于单进程部署"""
+
+    def __init__(self, maxsize=100000):
+        self._codes = TTLCache(maxsize=maxsize, ttl=600)
+        self._lock = threading.Lock()
+
+    def save(self, phone, code, ttl):
+        # 值使用列表以便在不重置过期时间的情况下累加错误次数
+        # 与consume互斥，避免并发校验把刚重新发送的验证码删除
+        with self._lock:
+            self._codes.set(phone, [code, 0], ttl=ttl)
+
+    def consume(self, phone, code, max_attempts):
+        with self._lock:
+            entry = self._codes.get(phone)
+            if entry is None:
+                return VERIFY_MISSING
+            if entry[0] == code:
+                self._codes.pop(phone)
+                return VERIFY_OK
+            entry[1] += 1
+            if entry[1] >= max_attempts:
+                self._codes.pop(phone)
+                return VERIFY_LOCKED
+            return VERIFY_MISMATCH
+
+    def stats(self):
+        return self._codes.stats()
+
+
+class RedisSMSCodeStore:
+    """Redis验证码存储，适用于多进程部署，兼容任意Redis协议的服务"""
+
+    # 比对、计数和删除在一个脚本内完成，保证原子性
+    CONSUME_SCRIPT = """
+local code = redis.call('HGET', KEYS[1], 'code')
+if not code then return 0 end
+if code == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return 1
+end
+local attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+if attempts >= tonumber(ARGV[2]) then
+    redis.call('DEL', KEYS[1])
+    return 3
+end
+return 2
+"""
+    RESULTS = {0: VERIFY_MISSING, 1: VERIFY_OK, 2: VERIFY_MISMATCH, 3: VERIFY_LOCKED}
+
+    def __init__(self, url, prefix='sms_code:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SMS_CODE_STORE=redis需要安装redis包（pip install -r requirements.txt），或改用memory/sql存储")
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self._consume = self.client.register_script(self.CONSUME_SCRIPT)
+
+    def save(self, phone, code, ttl):
+        key = self.prefix + phone
+        pipe = self.client.pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping={'code': code, 'attempts': 0})
+        pipe.expire(key, int(ttl))
+        pipe.execute()
+
+    def consume(self, phone, code, max_attempts):
+        result = self._consume(keys=[self.prefix + phone], args=[code, max_attempts])
+        return self.RESULTS[int(result)]
+
+    def stats(self):
+        return {'backend': 'redis'}
+
+
+class SQLSMSCodeStore:
+    """数据库验证码存储（sms_codes表），作为兜底方案"""
+
+    def save(self, phone, code, ttl):
+        expires_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=ttl)
+
+        # 清理该手机号已使用或已过期的记录，避免表无限增长
+        SMSCode.query.filter(SMSCode.phone == phone, SMSCode.status != 0).delete(synchronize_session=False)
+
+        # 检查是否已存在未使用的验证码，如果有则更新
+        existing_code = SMSCode.query.filter_by(phone=phone, status=0).first()
+        if existing_code:
+            existing_code.code = code
+            existing_code.expires_at = expires_at
+            existing_code.attempts = 0
+        else:
+            db.session.add(SMSCode(phone=phone, code=code, expires_at=expires_at))
+        db.session.commit()
+
+    def consume(self, phone, code, max_attempts):
+        # 查找最新的未使用验证码
+        sms_code = SMSCode.query.filter_by(phone=phone, status=0).order_by(SMSCode.created_at.desc()).first()
+        if not sms_code:
+            return VERIFY_MISSING
+
+        if sms_code.is_expired():
+            sms_code.status = 2  # 标记为已过期
+            db.session.commit()
+            return VERIFY_EXPIRED
+
+        # 错误次数在数据库内按条件累加，并发的错误请求不会丢失计数，也不会超过上限
+        unused = (SMSCode.id == sms_code.id, SMSCode.status == 0, func.coalesce(SMSCode.attempts, 0) < max_attempts)
+        if sms_code.code != code:
+            counted = SMSCode.query.filter(*unused).update(
+                {'attempts': func.coalesce(SMSCode.attempts, 0) + 1}, synchronize_session=False
+            )
+            if not counted:
+                db.session.commit()
+                return VERIFY_MISSING
+            locked = SMSCode.query.filter(
+                SMSCode.id == sms_code.id, SMSCode.status == 0, SMSCode.attempts >= max_attempts
+            ).update({'status': 2}, synchronize_session=False)
+            db.session.commit()
+            return VERIFY_LOCKED if locked else VERIFY_MISMATCH
+
+        # 条件更新，并发校验时只有一个请求能消费成功，已达错误上限的验证码不能再使用
+        consumed = SMSCode.query.filter(*unused).update({'status': 1}, synchronize_session=False)
+        db.session.commit()
+        return VERIFY_OK if consumed else VERIFY_MISSING
+
+    def stats(self):
+        return {'backend': 'sql'}
+
+
+_store = None
+metrics.register('sms_store', lambda: get_sms_store().stats())
+
+
+def init_sms_store(config):
+    """根据配置创建验证码存储"""
+    global _store
+    backend = config.get('SMS_CODE_STORE', 'memory')
+    if backend == 'memory':
+        _store = MemorySMSCodeStore()
+    elif backend == 'redis':
+        _store = RedisSMSCodeStore(config.get('SMS_CODE_REDIS_URL', 'redis://localhost:6379/0'))
+    elif backend == 'sql':
+        _store = SQLSMSCodeStore()
+    else:
+        raise ValueError(f"未知的验证码存储类型: {backend}")
+    return _store
+
+
+def get_sms_store():
+    """获取当前验证码存储，未初始化时使用进程内存储"""
+    global _store
+    if _store is None:
+        _store = MemorySMSCodeStore()
+    return _store
@@ -0,0 +1,139 @@
+import itertools
+import threading
+import time
+
+# 自定义纪元 2024-01-01 00:00:00 UTC（毫秒），41位时间戳可用约69年
+EPOCH_MS = 1704067200000
+SEQUENCE_BITS = 12
+WORKER_BITS = 10
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+TIMESTAMP_SHIFT = SEQUENCE_BITS + WORKER_BITS
+# 十进制最多19位，补齐到固定宽度后按字符串排序即按时间排序
+ID_WIDTH = 19
+ID_FORMAT = '%%s%%0%dd' % ID_WIDTH
+# 固定机器号不会过期
+NO_EXPIRY = 1 << 62
+
+
+class SnowflakeGenerator:
+    """
+    雪花算法ID生成器：毫秒时间戳(41位) + 毫秒内序号(12位) + 机器号(10位)
+    机器号放在最低位，计数器按机器号的步长自增即可直接得到ID；
+    同一进程内用itertools.count自增（CPython下next()是原子操作），生成ID不加锁，
+    只有计数落后于当前时间时才加锁把计数器跳到当前毫秒。
+    多进程部署（如gunicorn多个worker）时每个进程需使用不同的机器号：
+    可以直接配置，也可以设置worker_id_provider，在首次生成ID时领取（见worker_lease）；
+    领取的机器号有租约期限，超过lease_expires_at后先通过lease_refresher续约或换号，续约失败时拒绝生成
+    """
+
+    def __init__(self, worker_id=0):
+        self._lock = threading.Lock()
+        self._acquire_lock = threading.Lock()
+        self.worker_id = None
+        self.worker_id_provider = None
+        self.lease_refresher = None
+        self.lease_expires_at = NO_EXPIRY  # 机器号可使用到的时间（距纪元毫秒数）
+        self._counter = None
+        self.configure(worker_id)
+
+    def configure(self, worker_id=None):
+        if worker_id is None:
+            return
+        worker_id = int(worker_id)
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"机器号必须在0到{MAX_WORKER_ID}之间")
+        with self._lock:
+            if worker_id == self.worker_id:
+                return
+            self.worker_id = worker_id
+            start = self._now() << TIMESTAMP_SHIFT
+            if self._counter is not None:
+                # 重新配置后不回退到已经生成过的时间
+                start = max(start, (next(self._counter) >> TIMESTAMP_SHIFT) + 1 << TIMESTAMP_SHIFT)
+            self._counter = itertools.count(start | worker_id, 1 << WORKER_BITS)
+
+    def reset(self):
+        """清除机器号，下次生成ID时通过worker_id_provider重新领取（用于fork出的子进程）"""
+        self._lock = threading.Lock()
+        self._acquire_lock = threading.Lock()
+        self.worker_id = None
+        self.lease_expires_at = NO_EXPIRY
+        self._counter = None
+
+    @staticmethod
+    def _now():
+        return time.time_ns() // 1000000 - EPOCH_MS
+
+    def next_id(self):
+        """生成一个64位整数ID"""
+        # 每毫秒超过4096个时序号进位到下一毫秒，相当于预支时间，ID仍然唯一且递增；
+        # 时钟回拨时计数器不回退，继续沿用原计数
+        try:
+            snowflake_id = next(self._counter)
+        except TypeError:
+            # 还没有机器号，先领取
+            self._acquire_worker_id()
+            snowflake_id = next(self._counter)
+        now = time.time_ns() // 1000000 - EPOCH_MS
+        if now >= self.lease_expires_at:
+            # 租约可能已被其他进程领取，续约或换号后重新生成
+            self.refresh_lease()
+            return self.next_id()
+        if snowflake_id >> TIMESTAMP_SHIFT < now:
+            snowflake_id = self._advance(now)
+        return snowflake_id
+
+    def _advance(self, now):
+        with self._lock:
+            current = next(self._counter)
+            if current >> TIMESTAMP_SHIFT >= now:
+                # 其他线程已经跳过
+                return current
+            # 已经取到旧计数器的线程还可能再取一个值，留出一毫秒的序号空间避免和新计数器重叠
+            start = max(now << TIMESTAMP_SHIFT | self.worker_id, current + (1 << TIMESTAMP_SHIFT))
+            self._counter = itertools.count(start + (1 << WORKER_BITS), 1 << WORKER_BITS)
+            return start
+
+    def _acquire_worker_id(self):
+        if self.worker_id_provider is None:
+            raise RuntimeError("订单号生成器未配置机器号")
+        # 单独的锁保证并发的首次调用只领取一次；领取可能访问数据库，不阻塞已有机器号时的生成
+        with self._acquire_lock:
+            if self._counter is None:
+                self.configure(self.worker_id_provider())
+
+    def refresh_lease(self, force=False):
+        """续约机器号租约，force为False时只在租约到期后续约；与首次领取共用一把锁，同一时间只有一个线程续约或换号"""
+        with self._acquire_lock:
+            if not force and self._now() < self.lease_expires_at:
+                # 其他线程已经续约
+                return
+            if self.lease_refresher is None:
+                raise RuntimeError("订单号机器号租约已过期")
+            # 续约失败（如数据库不可用）时抛出异常，不再使用可能已被其他进程领取的机器号
+            self.lease_refresher()
+
+    def next_str(self, prefix=''):
+        """生成固定宽度的字符串ID，按字符串排序即大致按生成时间排序"""
+        # 展开next_id的常规路径，省去一次方法调用；计数器未初始化、租约到期和跨毫秒时交给next_id处理
+        counter = self._counter
+        if counter is not None:
+            snowflake_id = next(counter)
+            now = time.time_ns() // 1000000 - EPOCH_MS
+            if snowflake_id >> TIMESTAMP_SHIFT >= now and now < self.lease_expires_at:
+                return ID_FORMAT % (prefix, snowflake_id)
+        return ID_FORMAT % (prefix, self.next_id())
+
+    @staticmethod
+    def parse(snowflake_id):
+        """拆解ID，返回(毫秒时间戳, 机器号, 序号)"""
+        snowflake_id = int(snowflake_id)
+        return (
+            (snowflake_id >> TIMESTAMP_SHIFT) + EPOCH_MS,
+            snowflake_id & MAX_WORKER_ID,
+            (snowflake_id >> WORKER_BITS) & ((1 << SEQUENCE_BITS) - 1)
+        )
+
+
+# 机器号在init_app中配置，或在首次生成订单号时领取
+order_no_generator = SnowflakeGenerator(None)
@@ -0,0 +1,32 @@
+import datetime
+import os
+import socket
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models.task_lease import TaskLease
+
+
+def acquire_task_lease(name, ttl):
+    """
+    领取后台任务租约，在独立的事务中提交，不影响调用方会话中未提交的修改
+    :param ttl: 租约有效期（秒），期间其他进程领取失败
+    :return: 是否领取成功
+    """
+    now = datetime.datetime.utcnow()
+    owner = f'{socket.gethostname()}:{os.getpid()}'
+    expires_at = now + datetime.timedelta(seconds=ttl)
+    try:
+        with db.engine.begin() as conn:
+            # 按过期条件更新，并发领取时只有一个进程能成功
+            taken = conn.execute(update(TaskLease).where(
+                TaskLease.name == name, TaskLease.expires_at <= now
+            ).values(owner=owner, expires_at=expires_at)).rowcount
+            if not taken:
+                conn.execute(insert(TaskLease).values(name=name, owner=owner, expires_at=expires_at))
+        return True
+    except IntegrityError:
+        # 租约仍由其他进程持有
+        return False
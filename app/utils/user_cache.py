@@ -0,0 +1,121 @@
+import datetime
+import threading
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app import db
+from app.models.user import User
+from app.utils.cache import TTLCache
+from app.utils import metrics
+
+# 已认证用户快照缓存，按user_id索引（每个进程一份）
+user_cache = TTLCache(maxsize=10000, ttl=300)
+metrics.register('user_cache', user_cache.stats)
+
+
+class UserSnapshot:
+    """轻量用户快照，只包含鉴权需要的字段，不持有数据库会话"""
+    __slots__ = ('id', 'role', 'status', 'phone', 'version')
+
+    def __init__(self, id, role, status, phone, version=0):
+        self.id = id
+        self.role = role
+        self.status = status
+        self.phone = phone
+        self.version = version
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.role, user.status, user.phone, user.token_version or 0)
+
+    def __repr__(self):
+        return f'<UserSnapshot {self.id} {self.role}>'
+
+
+def get_user_snapshot(user_id, min_version=0):
+    """获取用户快照，缓存未命中或版本过旧时查询数据库"""
+    snapshot = user_cache.get(user_id)
+    if snapshot is not None and snapshot.version >= min_version:
+        return snapshot
+
+    user = User.query.filter_by(id=user_id).first()
+    if not user:
+        return None
+
+    snapshot = UserSnapshot.from_user(user)
+    user_cache.set(user_id, snapshot)
+    record_user_version(user_id, snapshot.version)
+    return snapshot
+
+
+def invalidate_user(user_id):
+    """用户信息变更后清除缓存"""
+    user_cache.pop(user_id)
+
+
+# 已知的用户token版本号：user_id -> token_version，只记录版本号大于0的用户
+_user_versions = {}
+_versions_lock = threading.Lock()
+_versions_synced_at = None
+
+
+def record_user_version(user_id, version):
+    """记录用户当前的token版本号"""
+    if not version:
+        return
+    with _versions_lock:
+        if version > _user_versions.get(user_id, 0):
+            _user_versions[user_id] = version
+
+
+def get_user_version(user_id, sync_interval=30):
+    """获取用户当前的token版本号，用于判断token中的声明是否已作废"""
+    _sync_user_versions(sync_interval)
+    with _versions_lock:
+        return _user_versions.get(user_id, 0)
+
+
+def _sync_user_versions(interval):
+    # 每个进程每隔interval秒增量同步一次其他进程写入的版本号，而不是每个请求查库
+    global _versions_synced_at
+    now = datetime.datetime.utcnow()
+    with _versions_lock:
+        since = _versions_synced_at
+        if since and (now - since).total_seconds() < interval:
+            return
+        _versions_synced_at = now
+
+    query = db.session.query(User.id, User.token_version).filter(User.token_version > 0)
+    if since:
+        # 多回看一个周期，避免漏掉同步期间提交的更新
+        query = query.filter(User.updated_at >= since - datetime.timedelta(seconds=interval))
+    try:
+        rows = query.all()
+    except Exception:
+        with _versions_lock:
+            _versions_synced_at = since
+        raise
+    for user_id, version in rows:
+        record_user_version(user_id, version)
+
+
+# 角色或状态变更时递增版本号，使携带旧声明的token失效；任何修改路径（接口、脚本）都会经过这里
+@event.listens_for(User, 'before_update')
+def _bump_token_version(mapper, connection, target):
+    state = inspect(target)
+    if not (state.attrs.role.history.has_changes() or state.attrs.status.history.has_changes()):
+        return
+    target.token_version = (target.token_version or 0) + 1
+    if state.session is not None:
+        state.session.info.setdefault('user_versions', []).append((target.id, target.token_version))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_user_versions(session):
+    for user_id, version in session.info.pop('user_versions', ()):
+        record_user_version(user_id, version)
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_user_versions(session):
+    session.info.pop('user_versions', None)
@@ -0,0 +1,155 @@
+import datetime
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+
+from sqlalchemy import select, insert, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models.worker_lease import WorkerLease
+from app.utils.snowflake import order_no_generator, MAX_WORKER_ID, EPOCH_MS
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerLeaseManager:
+    """
+    雪花ID机器号租约：未配置固定机器号时，每个进程从worker_leases表领取一个未被占用的机器号，
+    后台线程每隔ttl/3续约一次；进程退出后租约过期，机器号才能被其他进程领取，
+    新进程生成的ID时间戳晚于原进程，不会重复。
+    生成器只在最近一次成功续约后的2/3个ttl内使用该机器号，续约持续失败（如数据库不可用）时
+    在租约过期前停止生成，不会与之后领取该机器号的进程重复。
+    gunicorn等fork出的子进程不继承父进程的机器号，在首次生成ID时重新领取
+    """
+
+    def __init__(self, generator, ttl=60):
+        self.generator = generator
+        self.ttl = ttl
+        self.app = None
+        self.worker_id = None
+        self.owner = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.lost = 0
+
+    def configure(self, app=None, **options):
+        """按应用配置调整参数，值为None的参数保持不变"""
+        if app is not None:
+            self.app = app
+        for name, value in options.items():
+            if value is not None:
+                setattr(self, name, value)
+
+    def acquire(self):
+        """领取一个空闲的机器号，在独立的事务中提交，不影响调用方会话中未提交的修改"""
+        worker_id, started = self._acquire()
+        self._extend(started)
+        return worker_id
+
+    def _acquire(self):
+        if self.app is None:
+            raise RuntimeError("机器号租约未初始化，请先调用configure(app=app)")
+        with self._lock:
+            owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+            started = time.time()
+            with self.app.app_context():
+                worker_id = self._claim(owner)
+            self.worker_id, self.owner = worker_id, owner
+            self.acquired += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='worker-lease', daemon=True)
+                self._thread.start()
+        logger.info(f"已领取订单号机器号{worker_id}")
+        return worker_id, started
+
+    def _extend(self, started):
+        # 按写入数据库之前的时间计算，提前ttl/3停止使用，留出续约重试和时钟误差的余量
+        self.generator.lease_expires_at = int((started + self.ttl * 2 / 3) * 1000) - EPOCH_MS
+
+    def refresh(self):
+        """
+        续约当前机器号，租约已失效时换一个机器号，由生成器的refresh_lease调用
+        数据库不可用时抛出异常，生成器的租约期限不延长
+        """
+        started = time.time()
+        if self.renew():
+            self._extend(started)
+            return
+        # 续约失败期间租约已过期并被其他进程领取，先停止使用原机器号再换号
+        logger.error(f"订单号机器号{self.worker_id}的租约已失效，重新领取")
+        with self._lock:
+            self.lost += 1
+        self.generator.lease_expires_at = 0
+        worker_id, started = self._acquire()
+        self.generator.configure(worker_id)
+        self._extend(started)
+
+    def _claim(self, owner):
+        now = datetime.datetime.utcnow()
+        expires_at = now + datetime.timedelta(seconds=self.ttl)
+        with db.engine.connect() as conn:
+            active = {row[0] for row in conn.execute(
+                select(WorkerLease.worker_id).where(WorkerLease.expires_at > now)
+            )}
+        # 随机顺序尝试，减少多个进程同时启动时争抢同一个机器号
+        candidates = [i for i in range(MAX_WORKER_ID + 1) if i not in active]
+        random.shuffle(candidates)
+        for worker_id in candidates:
+            try:
+                with db.engine.begin() as conn:
+                    # 按过期条件更新已过期的租约，并发领取时只有一个进程能成功
+                    taken = conn.execute(update(WorkerLease).where(
+                        WorkerLease.worker_id == worker_id, WorkerLease.expires_at <= now
+                    ).values(owner=owner, expires_at=expires_at)).rowcount
+                    if not taken:
+                        conn.execute(insert(WorkerLease).values(
+                            worker_id=worker_id, owner=owner, expires_at=expires_at
+                        ))
+                return worker_id
+            except IntegrityError:
+                # 被其他进程抢先领取
+                continue
+        raise RuntimeError("没有空闲的订单号机器号，请检查worker_leases表")
+
+    def _run(self):
+        while True:
+            time.sleep(self.ttl / 3)
+            try:
+                self.generator.refresh_lease(force=True)
+            except Exception as e:
+                logger.error(f"订单号机器号续约异常: {str(e)}", exc_info=True)
+
+    def renew(self):
+        """续约当前机器号，返回是否仍持有租约"""
+        with self._lock:
+            worker_id, owner = self.worker_id, self.owner
+        expires_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=self.ttl)
+        with self.app.app_context():
+            with db.engine.begin() as conn:
+                return conn.execute(update(WorkerLease).where(
+                    WorkerLease.worker_id == worker_id, WorkerLease.owner == owner
+                ).values(expires_at=expires_at)).rowcount == 1
+
+    def _after_fork(self):
+        # 子进程没有续约线程，不能沿用父进程的机器号
+        if self.worker_id is None:
+            return
+        self._lock = threading.Lock()
+        self._thread = None
+        self.worker_id = self.owner = None
+        self.generator.reset()
+
+    def stats(self):
+        return {'worker_id': self.worker_id, 'acquired': self.acquired, 'lost': self.lost}
+
+
+worker_lease = WorkerLeaseManager(order_no_generator)
+metrics.register('worker_lease', worker_lease.stats)
+os.register_at_fork(after_in_child=worker_lease._after_fork)
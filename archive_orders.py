@@ -0,0 +1,15 @@
+import os
+
+# 一次性脚本不启动派单等后台任务
+os.environ.setdefault('BACKGROUND_TASKS_ENABLED', '0')
+
+from main import create_app
+from app.services.order_archive import OrderArchiveService
+
+app = create_app()
+
+with app.app_context():
+    # 把较早的已完成、已取消订单及聊天消息移到归档表，可由定时任务每天低峰期执行
+    print('正在归档历史订单...')
+    archived = OrderArchiveService.archive()
+    print(f'归档完成，共归档{archived}个订单')
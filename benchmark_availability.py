@@ -0,0 +1,154 @@
+"""
+技师可预约时段基准测试：对比逐次扫描订单表判断时段重叠与内存时段索引
+
+用法：
+    python benchmark_availability.py --therapists 2000 --orders 50 --lookups 500
+默认使用临时SQLite文件，可通过 --database-uri 指定MySQL等数据库
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from flask import Flask
+
+from app import db, init_app
+from app.models.order import Order, OrderStatus
+from app.models.therapist import Therapist
+from app.services.availability import availability_index, list_free_therapists
+
+START = datetime.datetime.now().replace(minute=0, second=0, microsecond=0) + datetime.timedelta(days=1)
+DAYS = 30
+
+
+def create_bench_app(database_uri):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_app(app)
+    return app
+
+
+def random_slot():
+    """营业时间9:00-21:00内的随机半点时段"""
+    day = START + datetime.timedelta(days=random.randrange(DAYS))
+    start = day.replace(hour=9) + datetime.timedelta(minutes=30 * random.randrange(24))
+    return start, random.choice([60, 90, 120])
+
+
+def seed(therapists, orders_per_therapist, chunk_size=20000):
+    """批量写入技师和订单"""
+    start = time.perf_counter()
+    db.session.execute(Therapist.__table__.insert(), [{
+        'name': f'技师{i}', 'phone': f'1{i:010d}', 'status': 1, 'rating': 5.0,
+        'rating_sum': 0, 'rating_count': 0, 'service_count': 0
+    } for i in range(therapists)])
+    db.session.commit()
+
+    rows = []
+    for therapist_id in range(1, therapists + 1):
+        for _ in range(orders_per_therapist):
+            service_time, duration = random_slot()
+            rows.append({
+                'order_no': f'BENCH{len(rows)}',
+                'therapist_id': therapist_id,
+                'user_id': 1,
+                'service_time': service_time,
+                'duration': duration,
+                'status': random.choice([OrderStatus.PENDING, OrderStatus.ACCEPTED, OrderStatus.CANCELLED])
+            })
+    for offset in range(0, len(rows), chunk_size):
+        db.session.execute(Order.__table__.insert(), rows[offset:offset + chunk_size])
+        db.session.commit()
+    print(f"写入{therapists}个技师、{len(rows)}个订单耗时: {time.perf_counter() - start:.1f}s")
+
+
+def _overlaps(order, start, end):
+    order_end = order.service_time + datetime.timedelta(minutes=order.duration)
+    return order.service_time < end and order_end > start
+
+
+def naive_is_free(therapist_id, start, duration):
+    """优化前：查询技师在该时段附近的订单并逐条判断重叠"""
+    end = start + datetime.timedelta(minutes=duration)
+    orders = Order.query.filter(
+        Order.therapist_id == therapist_id,
+        Order.status != OrderStatus.CANCELLED,
+        Order.service_time < end,
+        Order.service_time >= start - datetime.timedelta(days=1)
+    ).all()
+    return not any(_overlaps(o, start, end) for o in orders)
+
+
+def naive_free_therapists(start, duration):
+    """优化前：扫描该时段附近的全部订单，排除有冲突的技师"""
+    end = start + datetime.timedelta(minutes=duration)
+    busy = {o.therapist_id for o in Order.query.filter(
+        Order.status != OrderStatus.CANCELLED,
+        Order.service_time < end,
+        Order.service_time >= start - datetime.timedelta(days=1)
+    ) if _overlaps(o, start, end)}
+    return [t.id for t in Therapist.query.filter_by(status=1) if t.id not in busy]
+
+
+def measure(name, func, calls):
+    latencies = []
+    for args in calls:
+        start = time.perf_counter()
+        func(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+        db.session.expunge_all()
+    latencies.sort()
+    p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+    print(f"{name:<36} mean={statistics.mean(latencies):.3f}ms p50={latencies[len(latencies) // 2]:.3f}ms p99={p99:.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='技师可预约时段基准测试')
+    parser.add_argument('--therapists', type=int, default=2000)
+    parser.add_argument('--orders', type=int, default=50, help='每个技师的订单数')
+    parser.add_argument('--lookups', type=int, default=500)
+    parser.add_argument('--database-uri')
+    args = parser.parse_args()
+
+    db_file = None
+    database_uri = args.database_uri
+    if not database_uri:
+        db_file = os.path.join(tempfile.mkdtemp(), 'bench_availability.db')
+        database_uri = f'sqlite:///{db_file}'
+
+    app = create_bench_app(database_uri)
+    with app.app_context():
+        seed(args.therapists, args.orders)
+
+        start = time.perf_counter()
+        availability_index.reset()
+        availability_index.is_free(1, START, 60)
+        print(f"构建时段索引耗时: {(time.perf_counter() - start) * 1000:.1f}ms {availability_index.stats()}")
+
+        checks = [(random.randint(1, args.therapists), *random_slot()) for _ in range(args.lookups)]
+        slots = [random_slot() for _ in range(20)]
+
+        # 结果一致性检查
+        for therapist_id, service_time, duration in checks[:100]:
+            assert naive_is_free(therapist_id, service_time, duration) == \
+                availability_index.is_free(therapist_id, service_time, duration)
+        for service_time, duration in slots[:3]:
+            assert naive_free_therapists(service_time, duration) == sorted(
+                t.id for t in list_free_therapists(service_time, duration))
+
+        measure('before: 单个技师 扫描订单', naive_is_free, checks)
+        measure('after: 单个技师 时段索引', availability_index.is_free, checks)
+        measure('before: 空闲技师列表 扫描订单', naive_free_therapists, slots)
+        measure('after: 空闲技师列表 时段索引', lambda s, d: list_free_therapists(s, d, limit=20), slots)
+        measure('after: 空闲技师全量 时段索引', list_free_therapists, slots)
+
+    if db_file:
+        os.remove(db_file)
+
+
+if __name__ == '__main__':
+    main()
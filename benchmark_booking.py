@@ -0,0 +1,164 @@
+"""
+并发预约基准测试：50个用户同时预约同一技师，对比无冲突检查的旧流程与加锁的时段冲突检查
+
+用法：
+    python benchmark_booking.py --bookers 50 --attempts 20
+默认使用临时SQLite文件，可通过 --database-uri 指定MySQL等数据库
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from flask import Flask
+
+from app import db, init_app
+from app.models.order import Order, OrderStatus
+from app.models.therapist import Therapist, ServiceItem
+from app.models.user import User
+from app.services.availability import availability_index
+from app.services.order_service import OrderService, BookingConflictError
+
+DAY = datetime.datetime.now().replace(hour=9, minute=0, second=0, microsecond=0) + datetime.timedelta(days=1)
+
+
+def create_bench_app(database_uri):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_app(app)
+    return app
+
+
+def seed(bookers):
+    therapist = Therapist(name='技师', phone='13900000000', status=1)
+    item = ServiceItem(name='推拿', price=198, duration=90)
+    users = [User(username=f'user{i}', phone=f'1380000{i:04d}') for i in range(bookers)]
+    db.session.add_all([therapist, item] + users)
+    db.session.commit()
+    return therapist.id, item.id, [u.id for u in users]
+
+
+def legacy_create_order(user_id, data):
+    """优化前：不检查时段冲突直接写入"""
+    service_item = db.session.get(ServiceItem, data['service_item_id'])
+    order = Order(
+        order_no=OrderService._generate_order_no() + str(random.random())[2:8],
+        user_id=user_id,
+        therapist_id=data['therapist_id'],
+        service_item_id=service_item.id,
+        service_name=service_item.name,
+        duration=service_item.duration,
+        price=service_item.price,
+        service_time=OrderService.parse_service_time(data['service_time']),
+        service_address=data['service_address'],
+        contact_phone=data['contact_phone']
+    )
+    db.session.add(order)
+    db.session.commit()
+    return order
+
+
+def count_overlaps(therapist_id):
+    orders = Order.query.filter(Order.therapist_id == therapist_id, Order.status != OrderStatus.CANCELLED) \
+        .order_by(Order.service_time).all()
+    overlaps = 0
+    for i, order in enumerate(orders):
+        end = order.service_time + datetime.timedelta(minutes=order.duration)
+        for other in orders[i + 1:]:
+            if other.service_time >= end:
+                break
+            overlaps += 1
+    return len(orders), overlaps
+
+
+def run(app, name, create, therapist_id, item_id, user_ids, attempts):
+    latencies = []
+    conflicts = []
+    errors = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(len(user_ids))
+
+    def booker(user_id):
+        rng = random.Random(user_id)
+        with app.app_context():
+            barrier.wait()
+            for _ in range(attempts):
+                slot = DAY + datetime.timedelta(minutes=30 * rng.randrange(48))
+                data = {
+                    'therapist_id': therapist_id,
+                    'service_item_id': item_id,
+                    'service_time': slot.strftime('%Y-%m-%dT%H:%M'),
+                    'service_address': '测试地址',
+                    'contact_phone': '13800000000'
+                }
+                start = time.perf_counter()
+                try:
+                    create(user_id, data)
+                except BookingConflictError:
+                    with lock:
+                        conflicts.append(1)
+                except Exception as e:
+                    db.session.rollback()
+                    with lock:
+                        errors.append(str(e))
+                with lock:
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=booker, args=(user_id,)) for user_id in user_ids]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        booked, overlaps = count_overlaps(therapist_id)
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{name:<20} 请求={len(latencies)} 成功={booked} 冲突拒绝={len(conflicts)} 错误={len(errors)} "
+          f"重叠预约={overlaps} 吞吐={len(latencies) / elapsed:.0f}/s "
+          f"mean={statistics.mean(latencies):.2f}ms p50={latencies[len(latencies) // 2]:.2f}ms p99={p99:.2f}ms")
+    if errors:
+        print(f"  错误示例: {errors[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='并发预约基准测试')
+    parser.add_argument('--bookers', type=int, default=50)
+    parser.add_argument('--attempts', type=int, default=20, help='每个用户的预约次数')
+    parser.add_argument('--database-uri')
+    args = parser.parse_args()
+
+    db_file = None
+    database_uri = args.database_uri
+    if not database_uri:
+        db_file = os.path.join(tempfile.mkdtemp(), 'bench_booking.db')
+        database_uri = f'sqlite:///{db_file}'
+
+    app = create_bench_app(database_uri)
+    with app.app_context():
+        therapist_id, item_id, user_ids = seed(args.bookers)
+
+    run(app, 'before: 无冲突检查', legacy_create_order, therapist_id, item_id, user_ids, args.attempts)
+
+    with app.app_context():
+        Order.query.delete()
+        db.session.commit()
+        # 预热时段索引，模拟稳定运行时的状态
+        availability_index.reset()
+        availability_index.is_free(therapist_id, DAY, 60)
+
+    run(app, 'after: 加锁冲突检查', OrderService.create_order, therapist_id, item_id, user_ids, args.attempts)
+
+    if db_file:
+        os.remove(db_file)
+
+
+if __name__ == '__main__':
+    main()
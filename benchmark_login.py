@@ -0,0 +1,102 @@
+"""
+登录查询基准测试：对比旧的 phone OR username 查询与按标识分路的索引查询
+
+用法：
+    python benchmark_login.py --users 1000000 --lookups 2000
+默认使用临时SQLite文件，可通过 --database-uri 指定MySQL等数据库
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from flask import Flask
+
+from app import db, init_app
+from app.models.user import User
+from app.services.user_service import UserService
+
+
+def create_bench_app(database_uri):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_app(app)
+    return app
+
+
+def seed_users(total, chunk_size=20000):
+    """批量写入测试用户"""
+    start = time.perf_counter()
+    for offset in range(0, total, chunk_size):
+        rows = [{
+            'username': f'user{i}',
+            'phone': f'1{i:010d}',
+            'status': 1,
+            'role': 'user',
+            'token_version': 0
+        } for i in range(offset, min(offset + chunk_size, total))]
+        db.session.execute(User.__table__.insert(), rows)
+        db.session.commit()
+    print(f"写入{total}个用户耗时: {time.perf_counter() - start:.1f}s")
+
+
+def legacy_lookup(identifier):
+    return User.query.filter((User.phone == identifier) | (User.username == identifier)).first()
+
+
+def measure(name, lookup, identifiers):
+    db.session.expire_all()
+    latencies = []
+    for identifier in identifiers:
+        start = time.perf_counter()
+        user = lookup(identifier)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert user is not None, identifier
+        db.session.expunge_all()
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{name:<32} mean={statistics.mean(latencies):.3f}ms p50={latencies[len(latencies) // 2]:.3f}ms p99={p99:.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='登录查询基准测试')
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--database-uri')
+    args = parser.parse_args()
+
+    db_file = None
+    database_uri = args.database_uri
+    if not database_uri:
+        db_file = os.path.join(tempfile.mkdtemp(), 'bench_login.db')
+        database_uri = f'sqlite:///{db_file}'
+
+    app = create_bench_app(database_uri)
+    with app.app_context():
+        seed_users(args.users)
+
+        ids = [random.randrange(args.users) for _ in range(args.lookups)]
+        phones = [f'1{i:010d}' for i in ids]
+        usernames = [f'user{i}' for i in ids]
+
+        username_index = next(ix for ix in User.__table__.indexes if ix.name == 'ix_users_username')
+
+        # 优化前：username无索引，OR条件查询
+        username_index.drop(bind=db.engine)
+        measure('before: OR 查询 (phone)', legacy_lookup, phones[:200])
+        measure('before: OR 查询 (username)', legacy_lookup, usernames[:200])
+
+        # 优化后：username索引 + 按标识分路
+        username_index.create(bind=db.engine)
+        measure('after: 分路查询 (phone)', UserService.resolve_login_user, phones)
+        measure('after: 分路查询 (username)', UserService.resolve_login_user, usernames)
+
+    if db_file:
+        os.remove(db_file)
+
+
+if __name__ == '__main__':
+    main()
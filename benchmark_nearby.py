@@ -0,0 +1,120 @@
+"""
+附近技师查询基准测试：对比全表扫描计算距离与网格索引预筛选 + 精确距离计算
+
+用法：
+    python benchmark_nearby.py --therapists 100000 --lookups 500
+默认使用临时SQLite文件，技师随机分布在上海周边约100公里范围内，可通过 --database-uri 指定MySQL等数据库
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from flask import Flask
+
+from app import db, init_app
+from app.models.therapist import Therapist
+from app.services.therapist_service import TherapistService
+from app.utils.geo import geo_cell, haversine
+
+CENTER = (31.23, 121.47)
+SPREAD = 0.5  # 纬度/经度方向的分布范围（度）
+
+
+def create_bench_app(database_uri):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_app(app)
+    return app
+
+
+def random_point():
+    return (CENTER[0] + random.uniform(-SPREAD, SPREAD), CENTER[1] + random.uniform(-SPREAD, SPREAD))
+
+
+def seed_therapists(total, chunk_size=20000):
+    """批量写入测试技师"""
+    start = time.perf_counter()
+    for offset in range(0, total, chunk_size):
+        rows = []
+        for i in range(offset, min(offset + chunk_size, total)):
+            latitude, longitude = random_point()
+            rows.append({
+                'name': f'技师{i}',
+                'phone': f'1{i:010d}',
+                'status': 1,
+                'rating': random.choice([4.5, 4.8, 5.0]),
+                'rating_sum': 0,
+                'rating_count': 0,
+                'latitude': latitude,
+                'longitude': longitude,
+                'geo_cell': geo_cell(latitude, longitude)
+            })
+        db.session.execute(Therapist.__table__.insert(), rows)
+        db.session.commit()
+    print(f"写入{total}个技师耗时: {time.perf_counter() - start:.1f}s")
+
+
+def legacy_nearby(latitude, longitude, radius_km, limit):
+    """优化前：取出所有技师逐个计算距离"""
+    result = []
+    for therapist in Therapist.query.filter_by(status=1).all():
+        if therapist.latitude is None:
+            continue
+        distance = haversine(latitude, longitude, therapist.latitude, therapist.longitude)
+        if distance <= radius_km:
+            result.append((distance, therapist))
+    result.sort(key=lambda item: item[0])
+    return result[:limit]
+
+
+def measure(name, lookup, points, radius_km, limit):
+    latencies = []
+    for latitude, longitude in points:
+        start = time.perf_counter()
+        lookup(latitude, longitude, radius_km, limit)
+        latencies.append((time.perf_counter() - start) * 1000)
+        db.session.expunge_all()
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{name:<32} mean={statistics.mean(latencies):.3f}ms p50={latencies[len(latencies) // 2]:.3f}ms p99={p99:.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='附近技师查询基准测试')
+    parser.add_argument('--therapists', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=500)
+    parser.add_argument('--radius', type=float, default=5)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--database-uri')
+    args = parser.parse_args()
+
+    db_file = None
+    database_uri = args.database_uri
+    if not database_uri:
+        db_file = os.path.join(tempfile.mkdtemp(), 'bench_nearby.db')
+        database_uri = f'sqlite:///{db_file}'
+
+    app = create_bench_app(database_uri)
+    with app.app_context():
+        seed_therapists(args.therapists)
+        points = [random_point() for _ in range(args.lookups)]
+
+        # 结果一致性检查
+        for latitude, longitude in points[:20]:
+            expected = {t.id for _, t in legacy_nearby(latitude, longitude, args.radius, args.therapists)}
+            actual = {t.id for t, _ in TherapistService.get_nearby(latitude, longitude, args.radius, args.therapists)}
+            assert expected == actual, (latitude, longitude)
+
+        measure('before: 全表扫描', legacy_nearby, points[:10], args.radius, args.limit)
+        measure('after: 网格索引 + 精确距离', TherapistService.get_nearby, points, args.radius, args.limit)
+
+    if db_file:
+        os.remove(db_file)
+
+
+if __name__ == '__main__':
+    main()
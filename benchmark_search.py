@@ -0,0 +1,111 @@
+"""
+技师关键词搜索基准测试：对比原来的 name LIKE '%kw%' 与全文检索索引（SQLite FTS5 / MySQL ngram）
+
+用法：
+    python benchmark_search.py --therapists 100000 --lookups 200
+默认使用临时SQLite文件，可通过 --database-uri 指定MySQL等数据库（需先执行迁移创建全文索引）
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from flask import Flask
+
+from app import db, init_app
+from app.models.therapist import Therapist
+from app.services.therapist_search import TherapistSearch
+
+SURNAMES = '张王李赵刘陈杨黄周吴'
+SPECIALTIES = ['推拿', '足疗', '精油SPA', '肩颈理疗', '拔罐', '刮痧', '艾灸', '中医按摩', '产后修复', '运动康复']
+KEYWORDS = ['推拿', '足疗', '肩颈', '艾灸', '康复', 'spa', '推', '灸']
+
+
+def create_bench_app(database_uri):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_app(app)
+    return app
+
+
+def seed_therapists(total, chunk_size=20000):
+    """批量写入测试技师，批量INSERT不经过ORM事件，写入后重建检索索引"""
+    start = time.perf_counter()
+    for offset in range(0, total, chunk_size):
+        rows = []
+        for i in range(offset, min(offset + chunk_size, total)):
+            specialties = random.sample(SPECIALTIES, 2)
+            rows.append({
+                'name': f'{random.choice(SURNAMES)}技师{i}',
+                'phone': f'1{i:010d}',
+                'status': 1,
+                'rating': random.choice([4.5, 4.8, 5.0]),
+                'rating_sum': 0,
+                'rating_count': 0,
+                'specialty': ' '.join(specialties),
+                'introduction': f'从业{random.randint(1, 15)}年，擅长{specialties[0]}'
+            })
+        db.session.execute(Therapist.__table__.insert(), rows)
+        db.session.commit()
+    TherapistSearch.rebuild()
+    print(f"写入{total}个技师并建立索引耗时: {time.perf_counter() - start:.1f}s")
+
+
+def legacy_search(keyword, page, size):
+    """优化前：只按姓名LIKE匹配"""
+    query = Therapist.query.filter_by(status=1).filter(Therapist.name.contains(keyword))
+    pagination = query.order_by(Therapist.rating.desc()).paginate(page=page, per_page=size, error_out=False)
+    return {'items': pagination.items, 'total': pagination.total}
+
+
+def measure(name, search, keywords, size):
+    latencies = []
+    for keyword in keywords:
+        start = time.perf_counter()
+        search(keyword, 1, size)
+        latencies.append((time.perf_counter() - start) * 1000)
+        db.session.expunge_all()
+    latencies.sort()
+    p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+    print(f"{name:<32} mean={statistics.mean(latencies):.3f}ms p50={latencies[len(latencies) // 2]:.3f}ms p99={p99:.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='技师关键词搜索基准测试')
+    parser.add_argument('--therapists', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=200)
+    parser.add_argument('--size', type=int, default=20)
+    parser.add_argument('--database-uri')
+    args = parser.parse_args()
+
+    db_file = None
+    database_uri = args.database_uri
+    if not database_uri:
+        db_file = os.path.join(tempfile.mkdtemp(), 'bench_search.db')
+        database_uri = f'sqlite:///{db_file}'
+
+    app = create_bench_app(database_uri)
+    with app.app_context():
+        seed_therapists(args.therapists)
+        keywords = [random.choice(KEYWORDS) for _ in range(args.lookups)]
+
+        # 结果一致性检查：全文检索的命中数与三个字段LIKE匹配一致，单字关键词也能命中
+        for keyword in KEYWORDS:
+            expected = TherapistSearch._search_like(keyword, 1, args.size)['total']
+            actual = TherapistSearch.search(keyword, 1, args.size)['total']
+            assert actual == expected, (keyword, expected, actual)
+            assert actual > 0, keyword
+
+        measure('before: name LIKE', legacy_search, keywords, args.size)
+        measure('LIKE三个字段', TherapistSearch._search_like, keywords, args.size)
+        measure('after: 全文检索', TherapistSearch.search, keywords, args.size)
+
+    if db_file:
+        os.remove(db_file)
+
+
+if __name__ == '__main__':
+    main()
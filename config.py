@@ -26,6 +26,93 @@ class Config:
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=2)  # 访问令牌过期时间
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)  # 刷新令牌过期时间
     
+    # 已认证用户缓存配置
+    USER_CACHE_SIZE = 10000  # 最多缓存的用户数
+    USER_CACHE_TTL = 300  # 用户快照过期时间（秒）
+    
+    # JWT校验缓存配置
+    JWT_VERIFY_CACHE_ENABLED = True  # 关闭后每次请求都重新校验签名
+    JWT_VERIFY_CACHE_SIZE = 50000  # 最多缓存的token数
+    USER_VERSION_SYNC_INTERVAL = 30  # 同步其他进程用户版本号的间隔（秒）
+    
+    # 密码哈希配置
+    PASSWORD_HASH_ITERATIONS = 120000  # PBKDF2迭代次数
+    PASSWORD_HASH_WORKERS = 4  # 哈希线程池大小
+    PASSWORD_HASH_MAX_QUEUE = 64  # 排队上限，超出后直接拒绝
+    
+    # 微信接口HTTP客户端配置
+    WECHAT_HTTP_CONNECT_TIMEOUT = 2  # 连接超时（秒）
+    WECHAT_HTTP_READ_TIMEOUT = 5  # 读取超时（秒）
+    WECHAT_HTTP_RETRIES = 2  # 连接失败或5xx时的最大重试次数
+    WECHAT_HTTP_POOL_SIZE = 10  # keep-alive连接池大小
+    WECHAT_HTTP_FAILURE_THRESHOLD = 5  # 连续失败多少次后熔断
+    WECHAT_HTTP_RESET_TIMEOUT = 30  # 熔断冷却时间（秒）
+    
+    # 短信验证码存储配置
+    # memory: 进程内存储（单进程部署）；redis: 多进程共享；sql: sms_codes表兜底
+    SMS_CODE_STORE = os.environ.get('SMS_CODE_STORE') or 'memory'
+    SMS_CODE_REDIS_URL = os.environ.get('SMS_CODE_REDIS_URL') or 'redis://localhost:6379/0'
+    SMS_CODE_TTL = 600  # 验证码有效期（秒）
+    SMS_CODE_MAX_ATTEMPTS = 5  # 最多允许输错次数
+    
+    # 短信异步发送配置
+    SMS_PROVIDER = 'log'  # 短信通道，目前仅记录日志
+    SMS_DISPATCH_WORKERS = 2  # 发送线程数
+    SMS_DISPATCH_QUEUE_SIZE = 1000  # 待发送队列上限
+    SMS_DISPATCH_BATCH_SIZE = 50  # 每批最多发送条数
+    SMS_DISPATCH_MAX_RETRIES = 3  # 失败重试次数，超过后进入死信列表
+    
+    # 登录/短信接口限流配置
+    RATELIMIT_ENABLED = True
+    RATELIMIT_STORAGE = os.environ.get('RATELIMIT_STORAGE') or 'memory'  # memory 或 redis
+    RATELIMIT_REDIS_URL = os.environ.get('RATELIMIT_REDIS_URL') or 'redis://localhost:6379/1'
+    
+    # 技师搜索配置
+    SEARCH_RATING_WEIGHT = 0.5  # 搜索排序中评分相对于相关度的权重
+    SEARCH_NGRAM_TOKEN_SIZE = 2  # 与MySQL的ngram_token_size一致，更短的关键词退回LIKE匹配
+    NEARBY_MAX_RADIUS_KM = 50  # 附近技师查询的最大半径（公里）
+    
+    # 技师可预约时段索引配置
+    AVAILABILITY_SYNC_INTERVAL = 30  # 同步其他进程订单变更的间隔（秒）
+    
+    # 订单号生成配置：设置ORDER_NO_WORKER_ID(0-1023)时使用固定机器号，仅适用于单进程部署；
+    # 未设置时每个进程（包括gunicorn fork出的worker）从worker_leases表领取不重复的机器号
+    ORDER_NO_WORKER_ID = int(os.environ['ORDER_NO_WORKER_ID']) if os.environ.get('ORDER_NO_WORKER_ID') else None
+    ORDER_NO_LEASE_TTL = 60  # 机器号租约有效期（秒），每1/3周期续约一次
+    
+    # 幂等键配置
+    IDEMPOTENCY_TTL = 86400  # 已完成请求的响应保留时间（秒）
+    IDEMPOTENCY_LOCK_TIMEOUT = 60  # 处理中的请求超过该时间未完成（如进程崩溃）后允许重新处理（秒）
+    
+    # 支付回调异步处理配置
+    PAYMENT_PIPELINE_WORKERS = 2  # 处理线程数
+    PAYMENT_PIPELINE_BATCH_SIZE = 200  # 每批最多处理的回调数，每批提交一次
+    PAYMENT_PIPELINE_POLL_INTERVAL = 1  # 检查其他进程写入的回调日志的间隔（秒）
+    PAYMENT_PIPELINE_CLAIM_TIMEOUT = 60  # 领取后超过该时间未完成则重新处理（秒）
+    
+    # 订单超时自动取消配置（仅未支付的订单）
+    ORDER_PENDING_TIMEOUT = 1800  # 下单后超过该时间仍未接单则取消（秒）
+    ORDER_UNPAID_TIMEOUT = 7200  # 下单后超过该时间仍未支付则取消（秒）
+    ORDER_TIMEOUT_BATCH_SIZE = 500  # 每批取消的订单数
+    
+    # 订单冷热分离配置
+    ORDER_ARCHIVE_AGE_DAYS = 90  # 创建超过该天数的已完成、已取消订单移到归档表
+    ORDER_ARCHIVE_BATCH_SIZE = 500  # 每个事务归档的订单数
+    ORDER_ARCHIVE_COUNT_CACHE_TTL = 600  # 订单列表total中归档订单数的缓存时间（秒），其他进程归档后最多延迟该时间
+    
+    # 自动派单配置
+    DISPATCH_BATCH_SIZE = 50  # 每批撮合的订单数
+    DISPATCH_RADIUS_KM = 10  # 候选技师的最大距离（公里）
+    DISPATCH_MAX_LOAD = 5  # 技师未完成订单数达到该值后不再派单
+    DISPATCH_DISTANCE_WEIGHT = 0.5  # 打分权重：距离
+    DISPATCH_RATING_WEIGHT = 0.3  # 打分权重：评分
+    DISPATCH_LOAD_WEIGHT = 0.2  # 打分权重：当前负载
+    DISPATCH_RETRY_DELAY = 30  # 未匹配或派单失败的订单重试间隔（秒）
+    DISPATCH_RECOVER_LEASE_TTL = 60  # 多个进程同时启动时只有一个进程恢复待派单订单，该时间内其他进程不再恢复（秒）
+    
+    # 后台任务（自动派单、支付回调处理、订单超时取消）随应用在init_app中启动，每个进程只启动一次；一次性脚本可设置环境变量为0关闭
+    BACKGROUND_TASKS_ENABLED = os.environ.get('BACKGROUND_TASKS_ENABLED', '1') != '0'
+    
     # 文件上传配置
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(BASE_DIR, 'uploads')
@@ -111,6 +198,7 @@ class TestingConfig(Config):
     
     # 测试环境特定配置
     WTF_CSRF_ENABLED = False  # 测试环境中禁用CSRF保护
+    BACKGROUND_TASKS_ENABLED = False  # 测试中按需手动启动后台任务
     SQLALCHEMY_ECHO = True  # 打印SQL语句
 
 
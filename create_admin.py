@@ -1,7 +1,7 @@
 from main import create_app
 from app import db
 from app.models.user import User
-import hashlib
+from app.utils.password import hash_password
 
 app = create_app()
 
@@ -15,7 +15,7 @@ with app.app_context():
         admin = User(
             username='admin',
             phone='13800138888',
-            password_hash=hashlib.sha256('admin123'.encode()).hexdigest(),  # 使用SHA256加密密码
+            password_hash=hash_password('admin123'),  # 使用PBKDF2加密密码
             role='admin',
             status=1
         )
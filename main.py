@@ -15,6 +15,7 @@ from app.api.service import service_bp
 from app.api.feedback import feedback_bp
 from app.api.message import message_bp
 from app.api.websocket import socketio
+from app.utils import metrics
 
 # 导入配置
 from config import config
@@ -69,6 +70,11 @@ def create_app(config_name=None):
     def health_check():
         return {'status': 'healthy', 'service': 'aiyue-daojia'}
 
+    # 进程内指标（缓存命中率等）
+    @app.route('/metrics')
+    def metrics_snapshot():
+        return jsonify(metrics.snapshot())
+
     # 根路径
     @app.route('/')
     def index():
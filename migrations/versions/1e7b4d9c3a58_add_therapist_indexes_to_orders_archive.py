@@ -0,0 +1,28 @@
+"""Add therapist indexes to orders_archive
+
+Revision ID: 1e7b4d9c3a58
+Revises: 5d9a3f7c2e84
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1e7b4d9c3a58'
+down_revision = '5d9a3f7c2e84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_archive_therapist_id_created_at', ['therapist_id', 'created_at'], unique=False)
+        batch_op.create_index('ix_orders_archive_therapist_id_status_created_at', ['therapist_id', 'status', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('orders_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_archive_therapist_id_status_created_at')
+        batch_op.drop_index('ix_orders_archive_therapist_id_created_at')
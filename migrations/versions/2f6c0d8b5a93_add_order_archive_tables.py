@@ -0,0 +1,75 @@
+"""Add orders_archive and message_archive tables
+
+Revision ID: 2f6c0d8b5a93
+Revises: 7e1a4c9b3f28
+Create Date: 2026-10-19 00:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2f6c0d8b5a93'
+down_revision = '7e1a4c9b3f28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('orders_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('order_no', sa.String(length=50), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('therapist_id', sa.Integer(), nullable=True),
+    sa.Column('service_item_id', sa.Integer(), nullable=True),
+    sa.Column('service_name', sa.String(length=100), nullable=True),
+    sa.Column('duration', sa.Integer(), nullable=True),
+    sa.Column('price', sa.Float(), nullable=True),
+    sa.Column('service_time', sa.DateTime(), nullable=True),
+    sa.Column('service_address', sa.Text(), nullable=True),
+    sa.Column('latitude', sa.Float(), nullable=True),
+    sa.Column('longitude', sa.Float(), nullable=True),
+    sa.Column('contact_phone', sa.String(length=20), nullable=True),
+    sa.Column('status', sa.Integer(), nullable=True),
+    sa.Column('remark', sa.Text(), nullable=True),
+    sa.Column('payment_status', sa.Integer(), nullable=True),
+    sa.Column('payment_method', sa.String(length=20), nullable=True),
+    sa.Column('transaction_id', sa.String(length=100), nullable=True),
+    sa.Column('paid_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('order_no')
+    )
+    with op.batch_alter_table('orders_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_archive_user_id_created_at', ['user_id', 'created_at'], unique=False)
+        batch_op.create_index('ix_orders_archive_user_id_status_created_at', ['user_id', 'status', 'created_at'], unique=False)
+
+    op.create_table('message_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('sender_id', sa.Integer(), nullable=False),
+    sa.Column('sender_role', sa.String(length=20), nullable=False),
+    sa.Column('receiver_id', sa.Integer(), nullable=False),
+    sa.Column('receiver_role', sa.String(length=20), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('is_read', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('message_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_message_archive_order_id'), ['order_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('message_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_message_archive_order_id'))
+
+    op.drop_table('message_archive')
+    with op.batch_alter_table('orders_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_archive_user_id_status_created_at')
+        batch_op.drop_index('ix_orders_archive_user_id_created_at')
+
+    op.drop_table('orders_archive')
@@ -0,0 +1,26 @@
+"""Add updated_at index to orders for incremental availability sync
+
+Revision ID: 3b8d5f2a9e61
+Revises: 6f1a8c3e5d27
+Create Date: 2026-10-19 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8d5f2a9e61'
+down_revision = '6f1a8c3e5d27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_updated_at', ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_updated_at')
@@ -0,0 +1,26 @@
+"""Add token_version index to users
+
+Revision ID: 4a7c2e9f1b36
+Revises: 2f6c0d8b5a93
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a7c2e9f1b36'
+down_revision = '2f6c0d8b5a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index('ix_users_token_version_updated_at', ['token_version', 'updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index('ix_users_token_version_updated_at')
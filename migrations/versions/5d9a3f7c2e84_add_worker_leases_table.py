@@ -0,0 +1,29 @@
+"""Add worker_leases table
+
+Revision ID: 5d9a3f7c2e84
+Revises: 8b3e6d1f4c72
+Create Date: 2026-10-19 09:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d9a3f7c2e84'
+down_revision = '8b3e6d1f4c72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('worker_leases',
+    sa.Column('worker_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('owner', sa.String(length=100), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('worker_id')
+    )
+
+
+def downgrade():
+    op.drop_table('worker_leases')
@@ -0,0 +1,26 @@
+"""Add attempts column to sms_codes table
+
+Revision ID: 5e7a9b3c2d18
+Revises: 8c4d2e6f1a93
+Create Date: 2026-10-18 14:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e7a9b3c2d18'
+down_revision = '8c4d2e6f1a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('sms_codes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('attempts', sa.Integer(), nullable=True, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('sms_codes', schema=None) as batch_op:
+        batch_op.drop_column('attempts')
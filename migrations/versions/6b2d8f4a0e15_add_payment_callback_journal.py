@@ -0,0 +1,48 @@
+"""Add payment_callback_journal table
+
+Revision ID: 6b2d8f4a0e15
+Revises: 3c8e5a1f9d72
+Create Date: 2026-10-18 22:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6b2d8f4a0e15'
+down_revision = '3c8e5a1f9d72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('payment_callback_journal',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_no', sa.String(length=50), nullable=False),
+    sa.Column('transaction_id', sa.String(length=100), nullable=False),
+    sa.Column('payment_method', sa.String(length=20), nullable=True),
+    sa.Column('amount', sa.Float(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('payload', sa.Text(), nullable=True),
+    sa.Column('state', sa.Integer(), nullable=False),
+    sa.Column('claim_token', sa.String(length=32), nullable=True),
+    sa.Column('claimed_at', sa.DateTime(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('error', sa.String(length=255), nullable=True),
+    sa.Column('received_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('applied_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('payment_callback_journal', schema=None) as batch_op:
+        batch_op.create_index('ix_payment_callback_journal_state_id', ['state', 'id'], unique=False)
+        batch_op.create_index('ix_payment_callback_journal_claim_token', ['claim_token'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('payment_callback_journal', schema=None) as batch_op:
+        batch_op.drop_index('ix_payment_callback_journal_claim_token')
+        batch_op.drop_index('ix_payment_callback_journal_state_id')
+
+    op.drop_table('payment_callback_journal')
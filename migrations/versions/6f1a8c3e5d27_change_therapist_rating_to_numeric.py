@@ -0,0 +1,33 @@
+"""Store therapist rating as NUMERIC(3,2)
+
+Revision ID: 6f1a8c3e5d27
+Revises: 9c4e2a7d6b15
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1a8c3e5d27'
+down_revision = '9c4e2a7d6b15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # MySQL的FLOAT为单精度，游标分页按评分等值比较时取回的值与存储值对不上，改为定点数
+    with op.batch_alter_table('therapists', schema=None) as batch_op:
+        batch_op.alter_column('rating', existing_type=sa.Float(), type_=sa.Numeric(3, 2),
+                              existing_nullable=False, existing_server_default='5.0')
+    op.execute(
+        "UPDATE therapists SET rating = CASE WHEN rating_count > 0 "
+        "THEN ROUND(rating_sum / rating_count, 1) ELSE 5.0 END"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('therapists', schema=None) as batch_op:
+        batch_op.alter_column('rating', existing_type=sa.Numeric(3, 2), type_=sa.Float(),
+                              existing_nullable=False, existing_server_default='5.0')
@@ -0,0 +1,26 @@
+"""Add index on orders(status, created_at)
+
+Revision ID: 7e1a4c9b3f28
+Revises: 6b2d8f4a0e15
+Create Date: 2026-10-18 23:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e1a4c9b3f28'
+down_revision = '6b2d8f4a0e15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_status_created_at', ['status', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_status_created_at')
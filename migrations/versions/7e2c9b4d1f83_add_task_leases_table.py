@@ -0,0 +1,29 @@
+"""Add task_leases table so startup recovery runs in one process
+
+Revision ID: 7e2c9b4d1f83
+Revises: 3b8d5f2a9e61
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e2c9b4d1f83'
+down_revision = '3b8d5f2a9e61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('task_leases',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('owner', sa.String(length=100), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('task_leases')
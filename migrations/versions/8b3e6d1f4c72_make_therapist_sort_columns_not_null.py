@@ -0,0 +1,34 @@
+"""Make therapist rating and service_count not null
+
+Revision ID: 8b3e6d1f4c72
+Revises: 4a7c2e9f1b36
+Create Date: 2026-10-19 09:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b3e6d1f4c72'
+down_revision = '4a7c2e9f1b36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 技师列表的游标分页按(rating, service_count, id)比较，NULL值会被跳过，先回填再加非空约束
+    op.execute(
+        "UPDATE therapists SET rating = CASE WHEN rating_count > 0 "
+        "THEN ROUND(rating_sum / rating_count, 1) ELSE 5.0 END WHERE rating IS NULL"
+    )
+    op.execute("UPDATE therapists SET service_count = 0 WHERE service_count IS NULL")
+    with op.batch_alter_table('therapists', schema=None) as batch_op:
+        batch_op.alter_column('rating', existing_type=sa.Float(), nullable=False, server_default='5.0')
+        batch_op.alter_column('service_count', existing_type=sa.Integer(), nullable=False, server_default='0')
+
+
+def downgrade():
+    with op.batch_alter_table('therapists', schema=None) as batch_op:
+        batch_op.alter_column('service_count', existing_type=sa.Integer(), nullable=True, server_default=None)
+        batch_op.alter_column('rating', existing_type=sa.Float(), nullable=True, server_default=None)
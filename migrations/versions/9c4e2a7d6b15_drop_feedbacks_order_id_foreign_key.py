@@ -0,0 +1,34 @@
+"""Drop the orders foreign key on feedbacks.order_id so reviewed orders can be archived
+
+Revision ID: 9c4e2a7d6b15
+Revises: 1e7b4d9c3a58
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4e2a7d6b15'
+down_revision = '1e7b4d9c3a58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # feedbacks表由create_all建立，外键名由数据库生成（MySQL为feedbacks_ibfk_N），按引用的表查找
+    inspector = sa.inspect(op.get_bind())
+    names = [fk['name'] for fk in inspector.get_foreign_keys('feedbacks')
+             if fk['referred_table'] == 'orders' and fk['name']]
+    if not names:
+        return
+    with op.batch_alter_table('feedbacks', schema=None) as batch_op:
+        for name in names:
+            batch_op.drop_constraint(name, type_='foreignkey')
+
+
+def downgrade():
+    # 需先把已归档订单的评价删除或恢复订单，否则无法重建外键
+    with op.batch_alter_table('feedbacks', schema=None) as batch_op:
+        batch_op.create_foreign_key('fk_feedbacks_order_id_orders', 'orders', ['order_id'], ['id'])
@@ -0,0 +1,28 @@
+"""Add composite indexes for user and therapist order lists
+
+Revision ID: 9d4f2b7c1e56
+Revises: e8f2b6d4a930
+Create Date: 2026-10-18 21:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4f2b7c1e56'
+down_revision = 'e8f2b6d4a930'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_user_id_status_created_at', ['user_id', 'status', 'created_at'], unique=False)
+        batch_op.create_index('ix_orders_therapist_id_status_created_at', ['therapist_id', 'status', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_therapist_id_status_created_at')
+        batch_op.drop_index('ix_orders_user_id_status_created_at')
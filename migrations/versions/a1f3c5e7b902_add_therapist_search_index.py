@@ -0,0 +1,52 @@
+"""Add full-text search index for therapists
+
+Revision ID: a1f3c5e7b902
+Revises: 5e7a9b3c2d18
+Create Date: 2026-10-18 15:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1f3c5e7b902'
+down_revision = '5e7a9b3c2d18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'mysql':
+        # ngram解析器支持中文分词，默认ngram_token_size=2
+        op.execute(
+            "ALTER TABLE therapists ADD FULLTEXT INDEX ft_therapists_search "
+            "(name, specialty, introduction) WITH PARSER ngram"
+        )
+    elif dialect == 'sqlite':
+        # FTS5虚拟表，内容由应用分词后写入，并在技师增删改时同步
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS therapist_search "
+            "USING fts5(name, specialty, introduction, tokenize='unicode61')"
+        )
+        from app.services.therapist_search import tokenize
+        rows = op.get_bind().execute(sa.text("SELECT id, name, specialty, introduction FROM therapists")).all()
+        for row in rows:
+            op.get_bind().execute(sa.text(
+                "INSERT INTO therapist_search (rowid, name, specialty, introduction) "
+                "VALUES (:id, :name, :specialty, :introduction)"
+            ), {
+                'id': row.id,
+                'name': tokenize(row.name),
+                'specialty': tokenize(row.specialty),
+                'introduction': tokenize(row.introduction)
+            })
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'mysql':
+        op.drop_index('ft_therapists_search', table_name='therapists')
+    elif dialect == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS therapist_search")
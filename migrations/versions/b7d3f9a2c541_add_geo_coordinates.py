@@ -0,0 +1,44 @@
+"""Add numeric coordinates and geo grid index
+
+Revision ID: b7d3f9a2c541
+Revises: f2c9e7b4a168
+Create Date: 2026-10-18 18:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3f9a2c541'
+down_revision = 'f2c9e7b4a168'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 地址经纬度由字符串改为数值，先清理无法转换的空字符串
+    op.execute("UPDATE user_addresses SET latitude = NULL WHERE latitude = ''")
+    op.execute("UPDATE user_addresses SET longitude = NULL WHERE longitude = ''")
+    with op.batch_alter_table('user_addresses', schema=None) as batch_op:
+        batch_op.alter_column('latitude', existing_type=sa.String(length=20), type_=sa.Float(), existing_nullable=True)
+        batch_op.alter_column('longitude', existing_type=sa.String(length=20), type_=sa.Float(), existing_nullable=True)
+
+    with op.batch_alter_table('therapists', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('geo_cell', sa.Integer(), nullable=True))
+        batch_op.create_index('ix_therapists_status_geo_cell',
+                              ['status', 'geo_cell', 'latitude', 'longitude', 'rating'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('therapists', schema=None) as batch_op:
+        batch_op.drop_index('ix_therapists_status_geo_cell')
+        batch_op.drop_column('geo_cell')
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
+
+    with op.batch_alter_table('user_addresses', schema=None) as batch_op:
+        batch_op.alter_column('latitude', existing_type=sa.Float(), type_=sa.String(length=20), existing_nullable=True)
+        batch_op.alter_column('longitude', existing_type=sa.Float(), type_=sa.String(length=20), existing_nullable=True)
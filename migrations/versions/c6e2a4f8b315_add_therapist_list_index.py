@@ -0,0 +1,27 @@
+"""Add composite index for therapist list pagination
+
+Revision ID: c6e2a4f8b315
+Revises: a1f3c5e7b902
+Create Date: 2026-10-18 16:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6e2a4f8b315'
+down_revision = 'a1f3c5e7b902'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('therapists', schema=None) as batch_op:
+        batch_op.create_index('ix_therapists_status_rating_service_count_id',
+                              ['status', 'rating', 'service_count', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('therapists', schema=None) as batch_op:
+        batch_op.drop_index('ix_therapists_status_rating_service_count_id')
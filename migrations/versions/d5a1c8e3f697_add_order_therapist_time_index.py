@@ -0,0 +1,26 @@
+"""Add index on orders(therapist_id, service_time)
+
+Revision ID: d5a1c8e3f697
+Revises: b7d3f9a2c541
+Create Date: 2026-10-18 19:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a1c8e3f697'
+down_revision = 'b7d3f9a2c541'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_therapist_id_service_time', ['therapist_id', 'service_time'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_therapist_id_service_time')
@@ -0,0 +1,26 @@
+"""Add index for latest feedbacks of a therapist
+
+Revision ID: e4b8d1a6c027
+Revises: c6e2a4f8b315
+Create Date: 2026-10-18 16:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b8d1a6c027'
+down_revision = 'c6e2a4f8b315'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('feedbacks', schema=None) as batch_op:
+        batch_op.create_index('ix_feedbacks_therapist_id_created_at', ['therapist_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('feedbacks', schema=None) as batch_op:
+        batch_op.drop_index('ix_feedbacks_therapist_id_created_at')
@@ -0,0 +1,40 @@
+"""Add rating_sum and rating_count to therapists
+
+Revision ID: f2c9e7b4a168
+Revises: e4b8d1a6c027
+Create Date: 2026-10-18 17:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c9e7b4a168'
+down_revision = 'e4b8d1a6c027'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('therapists', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rating_sum', sa.Float(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # 用已有评价回填汇总值
+    op.execute(
+        "UPDATE therapists SET "
+        "rating_sum = COALESCE((SELECT SUM(rating) FROM feedbacks WHERE feedbacks.therapist_id = therapists.id), 0), "
+        "rating_count = (SELECT COUNT(*) FROM feedbacks WHERE feedbacks.therapist_id = therapists.id)"
+    )
+    # 按汇总值重新计算评分，与FeedbackService的计算方式一致，暂无评价时为默认值5.0
+    op.execute(
+        "UPDATE therapists SET rating = CASE WHEN rating_count > 0 "
+        "THEN ROUND(rating_sum / rating_count, 1) ELSE 5.0 END"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('therapists', schema=None) as batch_op:
+        batch_op.drop_column('rating_count')
+        batch_op.drop_column('rating_sum')
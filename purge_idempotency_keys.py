@@ -0,0 +1,15 @@
+import os
+
+# 一次性脚本不启动派单等后台任务
+os.environ.setdefault('BACKGROUND_TASKS_ENABLED', '0')
+
+from main import create_app
+from app.utils.idempotency import idempotency_store
+
+app = create_app()
+
+with app.app_context():
+    # 删除已过期的幂等键，可由定时任务每天执行
+    print('正在清理过期的幂等键...')
+    deleted = idempotency_store.purge_expired()
+    print(f'清理完成，删除了{deleted}条记录')
@@ -0,0 +1,15 @@
+import os
+
+# 一次性脚本不启动派单等后台任务
+os.environ.setdefault('BACKGROUND_TASKS_ENABLED', '0')
+
+from main import create_app
+from app.services.feedback_service import FeedbackService
+
+app = create_app()
+
+with app.app_context():
+    # 从评价表重新统计技师的评分总和、评价数和平均分
+    print('正在重新统计技师评分...')
+    fixed = FeedbackService.reconcile_ratings()
+    print(f'统计完成，修正了{fixed}位技师的评分')
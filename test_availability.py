@@ -0,0 +1,124 @@
+"""
+可预约时段索引测试：增量同步走updated_at索引，同步查询期间其他线程不等待，查询期间本进程提交的变更不被旧数据覆盖
+用法：python test_availability.py 或 pytest test_availability.py
+"""
+import datetime
+import threading
+
+from flask import Flask
+from sqlalchemy import event
+
+from app import db, init_app
+from app.models.user import User
+from app.models.order import Order, OrderStatus
+from app.models.therapist import Therapist
+from app.services.availability import availability_index
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    init_app(app)
+    availability_index.reset()
+    return app
+
+
+def seed():
+    user = User(username='user', phone='13800000000')
+    therapist = Therapist(name='张技师', phone='13900000000', status=1)
+    db.session.add_all([user, therapist])
+    db.session.flush()
+    service_time = datetime.datetime.now().replace(microsecond=0) + datetime.timedelta(days=1)
+    order = Order(order_no='NO1', user_id=user.id, therapist_id=therapist.id, status=OrderStatus.PENDING,
+                  service_time=service_time, duration=60)
+    db.session.add(order)
+    db.session.commit()
+    return order.id, therapist.id, service_time
+
+
+def expire_sync():
+    """让下一次查询触发增量同步"""
+    availability_index._synced_at -= datetime.timedelta(seconds=availability_index.sync_interval + 1)
+
+
+def during_sync_query(callback):
+    """在增量同步的SQL执行前调用callback，返回注销函数"""
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if 'orders.updated_at >=' in statement and not statement.startswith('EXPLAIN'):
+            callback(statement, parameters)
+
+    event.listen(db.engine, 'before_cursor_execute', before)
+    return lambda: event.remove(db.engine, 'before_cursor_execute', before)
+
+
+def test_incremental_sync_uses_updated_at_index():
+    app = create_app()
+    with app.app_context():
+        order_id, therapist_id, service_time = seed()
+        availability_index.is_free(therapist_id, service_time, 60)
+        expire_sync()
+        plans = []
+
+        def explain(statement, parameters):
+            with db.engine.connect() as conn:
+                plans.append(' | '.join(row[-1] for row in conn.exec_driver_sql(
+                    'EXPLAIN QUERY PLAN ' + statement, parameters)))
+
+        remove = during_sync_query(explain)
+        try:
+            assert not availability_index.is_free(therapist_id, service_time, 60)
+        finally:
+            remove()
+        assert len(plans) == 1
+        assert 'ix_orders_updated_at' in plans[0], plans[0]
+
+
+def test_sync_query_does_not_block_other_threads():
+    app = create_app()
+    with app.app_context():
+        order_id, therapist_id, service_time = seed()
+        availability_index.is_free(therapist_id, service_time, 60)
+        expire_sync()
+        results = []
+
+        def query_from_other_thread(statement, parameters):
+            # 同步查询执行中，其他线程直接使用当前索引返回，不等待同步完成
+            thread = threading.Thread(target=lambda: results.append(
+                availability_index.is_free(therapist_id, service_time, 60)))
+            thread.start()
+            thread.join(timeout=2)
+            results.append(thread.is_alive())
+
+        remove = during_sync_query(query_from_other_thread)
+        try:
+            availability_index.is_free(therapist_id, service_time, 60)
+        finally:
+            remove()
+        assert results == [False, False]
+
+
+def test_local_commit_during_sync_is_kept():
+    app = create_app()
+    with app.app_context():
+        order_id, therapist_id, service_time = seed()
+        availability_index.is_free(therapist_id, service_time, 60)
+        expire_sync()
+
+        def cancel_locally(statement, parameters):
+            # 同步查询读到的是取消前的数据，查询期间本进程提交了取消
+            availability_index.apply(order_id, therapist_id, None, False)
+
+        remove = during_sync_query(cancel_locally)
+        try:
+            availability_index.is_free(therapist_id, service_time, 60)
+        finally:
+            remove()
+        assert availability_index.is_free(therapist_id, service_time, 60)
+        assert availability_index.stats()['orders'] == 0
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'✓ {name}')
@@ -0,0 +1,125 @@
+"""
+自动派单测试：每个订单单独提交，一个订单派单失败（如数据库死锁）不影响同批其他订单；
+多个进程同时启动时只有一个进程恢复待派单订单
+用法：python test_dispatch.py 或 pytest test_dispatch.py
+"""
+import datetime
+
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+
+from app import db, init_app
+from app.models.order import Order, OrderStatus
+from app.models.task_lease import TaskLease
+from app.models.therapist import Therapist, ServiceItem
+from app.services.availability import availability_index
+from app.services.dispatch_service import DispatchEngine
+from app.utils.geo import geo_cell
+from app.utils.task_lease import acquire_task_lease
+
+LOCATION = (31.23, 121.47)
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    init_app(app)
+    availability_index.reset()
+    return app
+
+
+def seed(order_count):
+    item = ServiceItem(name='推拿', price=100, duration=60)
+    therapists = [Therapist(name=f'技师{i}', phone=f'1390000{i:04d}', status=1, latitude=LOCATION[0],
+                            longitude=LOCATION[1], geo_cell=geo_cell(*LOCATION)) for i in range(3)]
+    for therapist in therapists:
+        therapist.service_items = [item]
+    db.session.add_all(therapists)
+    db.session.flush()
+    day = datetime.datetime.now().replace(microsecond=0) + datetime.timedelta(days=1)
+    orders = [Order(order_no=f'NO{i}', user_id=1, status=OrderStatus.PENDING, service_item_id=item.id,
+                    duration=60, service_time=day + datetime.timedelta(hours=2 * i),
+                    latitude=LOCATION[0], longitude=LOCATION[1]) for i in range(order_count)]
+    db.session.add_all(orders)
+    db.session.commit()
+    return [order.id for order in orders]
+
+
+class DeadlockEngine(DispatchEngine):
+    """为指定订单分配技师时模拟数据库死锁"""
+
+    def __init__(self, deadlock_ids, **kwargs):
+        super().__init__(**kwargs)
+        self.deadlock_ids = set(deadlock_ids)
+
+    def _assign(self, order, candidates, loads):
+        therapist_id = super()._assign(order, candidates, loads)
+        if order.id in self.deadlock_ids:
+            raise OperationalError('UPDATE therapists', {}, Exception('Deadlock found when trying to get lock'))
+        return therapist_id
+
+
+def assigned(order_ids):
+    db.session.expire_all()
+    return [db.session.get(Order, order_id).therapist_id is not None for order_id in order_ids]
+
+
+def test_deadlock_only_fails_its_own_order():
+    app = create_app()
+    with app.app_context():
+        order_ids = seed(4)
+        engine = DeadlockEngine([order_ids[1]], max_attempts=2)
+        engine.configure(app=app)
+
+        retry = engine.dispatch_batch(order_ids)
+        # 死锁的订单回滚后稍后重试，同批其他订单已分配
+        assert retry == [order_ids[1]]
+        assert assigned(order_ids) == [True, False, True, True]
+        assert engine.stats()['errors'] == 1
+        assert engine.stats()['matched'] == 3
+
+        # 持续失败达到上限后不再重试
+        assert engine.dispatch_batch(retry) == []
+        assert engine.stats()['errors'] == 2
+
+        engine.deadlock_ids.clear()
+        assert engine.dispatch_batch(retry) == []
+        assert assigned(order_ids) == [True, True, True, True]
+
+
+def test_task_lease_taken_by_one_process():
+    app = create_app()
+    with app.app_context():
+        assert acquire_task_lease('dispatch_recover', 60)
+        # 租约有效期内其他进程领取失败
+        assert not acquire_task_lease('dispatch_recover', 60)
+        assert acquire_task_lease('other_task', 60)
+
+        # 过期后可以重新领取
+        TaskLease.query.filter_by(name='dispatch_recover').update(
+            {'expires_at': datetime.datetime.utcnow() - datetime.timedelta(seconds=1)})
+        db.session.commit()
+        assert acquire_task_lease('dispatch_recover', 60)
+        assert TaskLease.query.count() == 2
+
+
+def test_only_lease_holder_recovers_pending_orders():
+    app = create_app()
+    with app.app_context():
+        seed(2)
+        first, second = DispatchEngine(), DispatchEngine()
+        for engine in (first, second):
+            engine.configure(app=app)
+        first.start()
+        second.start()
+        assert first.join()
+        assert first.stats()['matched'] == 2
+        assert second.stats()['batches'] == 0
+        assert second._submitted_at == {}
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'✓ {name}')
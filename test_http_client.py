@@ -0,0 +1,169 @@
+"""
+出站HTTP客户端测试：在本地启动桩服务器，验证连接复用、重试、熔断和超时
+用法：python test_http_client.py 或 pytest test_http_client.py
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from app.utils.http_client import HttpClient, CircuitOpenError
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """模拟jscode2session：按预设顺序返回状态码，可设置延迟"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        server.ports.add(self.client_address[1])
+        status = server.statuses.pop(0) if server.statuses else 200
+        if server.delay:
+            time.sleep(server.delay)
+        body = json.dumps({'openid': 'stub-openid', 'session_key': 'stub'}).encode()
+        if server.redirect_loop:
+            status = 302
+        self.send_response(status)
+        if status == 302:
+            self.send_header('Location', self.path)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # 客户端超时断开连接属于预期情况
+        pass
+
+
+def start_stub(statuses=None, delay=0):
+    server = StubServer(('127.0.0.1', 0), StubHandler)
+    server.requests = 0
+    server.ports = set()
+    server.statuses = list(statuses or [])
+    server.delay = delay
+    server.redirect_loop = False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/sns/jscode2session'
+
+
+def test_keep_alive_reuses_connection():
+    server, url = start_stub()
+    client = HttpClient('stub')
+    try:
+        for _ in range(5):
+            assert client.get(url).json()['openid'] == 'stub-openid'
+        assert server.requests == 5
+        assert len(server.ports) == 1  # 5次请求复用同一个TCP连接
+        assert client.stats()['latency_ms_buckets']['le_inf'] == 5
+    finally:
+        server.shutdown()
+
+
+def test_retries_5xx_then_succeeds():
+    server, url = start_stub(statuses=[503, 502])
+    client = HttpClient('stub', retries=2, backoff=0.01)
+    try:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert server.requests == 3
+        assert client.stats()['retried'] == 2
+    finally:
+        server.shutdown()
+
+
+def test_circuit_opens_after_failures():
+    server, url = start_stub(statuses=[500] * 10)
+    client = HttpClient('stub', retries=0, failure_threshold=3, reset_timeout=60)
+    try:
+        for _ in range(3):
+            assert client.get(url).status_code == 500
+        try:
+            client.get(url)
+            assert False, '熔断后不应发出请求'
+        except CircuitOpenError:
+            pass
+        assert server.requests == 3
+        assert client.stats()['circuit_state'] == 'open'
+    finally:
+        server.shutdown()
+
+
+def test_half_open_probe_closes_circuit():
+    server, url = start_stub(statuses=[500])
+    client = HttpClient('stub', retries=0, failure_threshold=1, reset_timeout=0.05)
+    try:
+        assert client.get(url).status_code == 500
+        time.sleep(0.1)
+        assert client.get(url).status_code == 200
+        assert client.stats()['circuit_state'] == 'closed'
+    finally:
+        server.shutdown()
+
+
+def test_half_open_probe_error_reopens_circuit():
+    server, url = start_stub(statuses=[500])
+    client = HttpClient('stub', retries=0, failure_threshold=1, reset_timeout=0.05)
+    try:
+        assert client.get(url).status_code == 500
+        time.sleep(0.1)
+        client.retries = 2
+        # 探测请求抛出连接、超时以外的异常（重定向循环），同样记为失败并重新熔断，且不重试
+        server.redirect_loop = True
+        client.session.max_redirects = 3
+        try:
+            client.get(url)
+            assert False, '应当抛出TooManyRedirects'
+        except requests.TooManyRedirects:
+            pass
+        assert client.stats()['circuit_state'] == 'open'
+        assert client.stats()['retried'] == 0
+        server.redirect_loop = False
+        time.sleep(0.1)
+        assert client.get(url).status_code == 200
+        assert client.stats()['circuit_state'] == 'closed'
+    finally:
+        server.shutdown()
+
+
+def test_read_timeout_is_not_retried():
+    server, url = start_stub(delay=0.5)
+    client = HttpClient('stub', read_timeout=0.1, retries=2, backoff=0.01)
+    try:
+        try:
+            client.get(url)
+            assert False, '应当超时'
+        except requests.ReadTimeout:
+            pass
+        assert server.requests == 1
+    finally:
+        server.shutdown()
+
+
+def test_wechat_code2session_uses_shared_client():
+    from app.services.wechat_service import WechatService, wechat_client
+    server, url = start_stub()
+    base_url = WechatService.API_BASE_URL
+    WechatService.API_BASE_URL = url.rsplit('/sns/', 1)[0]
+    try:
+        before = wechat_client.stats()['requests']
+        assert WechatService._get_wechat_openid('test-code')['openid'] == 'stub-openid'
+        assert wechat_client.stats()['requests'] == before + 1
+    finally:
+        WechatService.API_BASE_URL = base_url
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'✓ {name}')
@@ -0,0 +1,123 @@
+"""
+幂等键测试：重复请求返回首次的响应，同一个键用于不同请求时拒绝，处理中的重复请求返回409，
+处理中断超过锁定时间后允许重新处理；支付回调的重复通知不校验请求体，处理中直接确认
+用法：python test_idempotency.py 或 pytest test_idempotency.py
+"""
+import datetime
+
+from flask import Flask, jsonify
+
+from app import db, init_app
+from app.models.idempotency_key import IdempotencyKey
+from app.utils.idempotency import idempotent
+
+calls = []
+nested = []
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    init_app(app)
+    calls.clear()
+    nested.clear()
+    return app
+
+
+@idempotent('test_create')
+def create():
+    calls.append(1)
+    if nested:
+        # 首次请求处理期间收到同一个键的重复请求
+        nested.append(nested.pop()())
+    return jsonify({'code': 200, 'data': {'id': len(calls)}})
+
+
+@idempotent('test_callback', source='transaction_id')
+def callback():
+    calls.append(1)
+    if nested:
+        nested.append(nested.pop()())
+    return jsonify({'code': 200, 'message': '回调处理成功', 'data': {'journal_id': len(calls)}})
+
+
+def post(app, view, json, key='k1'):
+    headers = {'Idempotency-Key': key} if key else {}
+    with app.test_request_context('/test', method='POST', json=json, headers=headers):
+        return view()
+
+
+def test_replay_returns_first_response():
+    app = create_app()
+    with app.app_context():
+        first = post(app, create, {'amount': 100})
+        second = post(app, create, {'amount': 100})
+        assert len(calls) == 1
+        assert second.status_code == 200
+        assert second.get_json() == first.get_json()
+        assert second.headers['Idempotent-Replayed'] == 'true'
+        # 不带幂等键的请求正常处理
+        post(app, create, {'amount': 100}, key=None)
+        assert len(calls) == 2
+
+
+def test_key_reused_for_other_request():
+    app = create_app()
+    with app.app_context():
+        post(app, create, {'amount': 100})
+        response = post(app, create, {'amount': 200})
+        assert response.status_code == 422
+        assert len(calls) == 1
+
+
+def test_concurrent_duplicate_gets_409():
+    app = create_app()
+    with app.app_context():
+        nested.append(lambda: post(app, create, {'amount': 100}))
+        assert post(app, create, {'amount': 100}).status_code == 200
+        assert nested[0].status_code == 409
+        assert len(calls) == 1
+        # 首次请求完成后重复请求返回其响应
+        assert post(app, create, {'amount': 100}).get_json()['data'] == {'id': 1}
+
+
+def test_takeover_after_lock_timeout():
+    app = create_app()
+    with app.app_context():
+        # 进程在处理中崩溃，幂等键未完成也未释放
+        now = datetime.datetime.utcnow()
+        db.session.add(IdempotencyKey(scope='test_create', key='k1', fingerprint='x', created_at=now,
+                                      expires_at=now + datetime.timedelta(days=1)))
+        db.session.commit()
+        assert post(app, create, {'amount': 100}).status_code == 422
+
+        timeout = app.config.get('IDEMPOTENCY_LOCK_TIMEOUT', 60)
+        IdempotencyKey.query.update({'created_at': now - datetime.timedelta(seconds=timeout + 1)})
+        db.session.commit()
+        response = post(app, create, {'amount': 100})
+        assert response.status_code == 200
+        assert len(calls) == 1
+        assert IdempotencyKey.query.one().status_code == 200
+
+
+def test_payment_callback_duplicates_are_acknowledged():
+    app = create_app()
+    with app.app_context():
+        notify = {'transaction_id': 'T1', 'status': 'success', 'sign': 'a', 'notify_time': '10:00:00'}
+        nested.append(lambda: post(app, callback, dict(notify, notify_time='10:00:01'), key=None))
+        first = post(app, callback, notify, key=None)
+        # 处理中收到的重复通知直接确认，不返回409
+        assert nested[0].status_code == 200
+        assert nested[0].get_json()['code'] == 200
+        # 重发的通知签名和时间不同，仍按交易号返回首次处理结果
+        again = post(app, callback, dict(notify, sign='b', notify_time='10:05:00'), key=None)
+        assert again.status_code == 200
+        assert again.get_json() == first.get_json()
+        assert len(calls) == 1
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'✓ {name}')
@@ -0,0 +1,200 @@
+"""
+订单归档测试：分多批归档后，用户、技师订单列表翻页跨过热数据边界结果不变，有评价的订单也能归档，
+已归档订单仍能查看聊天记录、提交评价；页码分页在近期订单内不查询归档表，创建时间为空的订单也能翻到
+用法：python test_order_archive.py 或 pytest test_order_archive.py
+"""
+import datetime
+
+from flask import Flask
+from sqlalchemy import event
+
+from app import db, init_app
+from app.models.user import User
+from app.models.order import Order, OrderStatus
+from app.models.therapist import Therapist
+from app.models.feedback import Feedback
+from app.models.message import Message
+from app.models.archive import OrderArchive, MessageArchive
+from app.services.order_service import OrderService
+from app.services.order_archive import OrderArchiveService, archive_count_cache
+from app.services.feedback_service import FeedbackService
+from app.services.message_service import MessageService
+
+STATUSES = [OrderStatus.COMPLETED, OrderStatus.CANCELLED, OrderStatus.PENDING, OrderStatus.IN_SERVICE]
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    init_app(app)
+    archive_count_cache.clear()
+    return app
+
+
+def seed():
+    """40个订单：一半早于热数据边界（其中未结束的不归档），部分已完成订单有评价和聊天消息"""
+    user = User(username='user', phone='13800000000')
+    therapist = Therapist(name='张技师', phone='13900000000', status=1)
+    db.session.add_all([user, therapist])
+    db.session.flush()
+    now = datetime.datetime.utcnow()
+    orders = []
+    for i in range(40):
+        age = datetime.timedelta(days=200 if i < 20 else 1, minutes=i * 7)
+        orders.append(Order(order_no=f'NO{i}', user_id=user.id, therapist_id=therapist.id,
+                            status=STATUSES[i % 4], created_at=now - age))
+    db.session.add_all(orders)
+    db.session.flush()
+    for order in orders[:12]:
+        if order.status == OrderStatus.COMPLETED and order.id % 2:
+            db.session.add(Feedback(order_id=order.id, user_id=user.id, therapist_id=therapist.id, rating=4))
+        db.session.add(Message(sender_id=user.id, sender_role='user', receiver_id=therapist.id,
+                               receiver_role='therapist', order_id=order.id, content=f'消息{order.id}',
+                               created_at=order.created_at))
+    db.session.commit()
+    return user.id, therapist.id
+
+
+def page_through(func, owner_id, size, status=None):
+    ids, totals, page = [], set(), 1
+    while True:
+        result = func(owner_id, page, size, status)
+        totals.add(result['total'])
+        if not result['items']:
+            return ids, totals
+        ids += [order.id for order in result['items']]
+        page += 1
+
+
+def cursor_through(user_id, size, status=None):
+    ids, cursor = [], None
+    while True:
+        result = OrderService.get_user_orders_by_cursor(user_id, cursor, size, status)
+        ids += [order.id for order in result['items']]
+        cursor = result['next_cursor']
+        if cursor is None:
+            return ids
+
+
+def snapshot(user_id, therapist_id):
+    result = {}
+    for size in (3, 7, 20):
+        for status in (None, OrderStatus.COMPLETED, OrderStatus.PENDING):
+            result[('user', size, status)] = page_through(OrderService.get_user_orders, user_id, size, status)
+            result[('therapist', size, status)] = page_through(
+                OrderService.get_therapist_orders, therapist_id, size, status)
+            result[('cursor', size, status)] = cursor_through(user_id, size, status)
+    return result
+
+
+def test_lists_unchanged_after_archiving_in_batches():
+    app = create_app()
+    with app.app_context():
+        user_id, therapist_id = seed()
+        before = snapshot(user_id, therapist_id)
+        assert before[('user', 7, None)][1] == {40}
+        feedbacks = Feedback.query.count()
+        assert feedbacks > 0
+
+        # 每批4个，10个可归档订单分3批
+        assert OrderArchiveService.archive(batch_size=4) == 10
+        assert OrderArchive.query.count() == 10
+        assert Order.query.count() == 30
+        db.session.expunge_all()
+
+        assert snapshot(user_id, therapist_id) == before
+        # 评价随订单ID保留
+        assert Feedback.query.count() == feedbacks
+        assert OrderArchiveService.archive(batch_size=4) == 0
+
+
+def test_archived_order_messages_and_feedback():
+    app = create_app()
+    with app.app_context():
+        user_id, therapist_id = seed()
+        OrderArchiveService.archive(batch_size=4)
+        archived = {order.status: order for order in OrderArchive.query.filter(OrderArchive.id.in_(
+            db.session.query(MessageArchive.order_id)))}
+        completed = [order for order in OrderArchive.query.filter_by(status=OrderStatus.COMPLETED)
+                     if Feedback.query.filter_by(order_id=order.id).first() is None][0]
+
+        # 已归档订单的聊天记录从归档表读取
+        order = archived[OrderStatus.CANCELLED]
+        history = MessageService.get_message_history(therapist_id, 'therapist', order.id)
+        assert history['total'] == 1
+        assert history['items'][0]['content'] == f'消息{order.id}'
+        assert history['items'][0]['is_read'] is False
+        assert MessageService.get_message_history(user_id, 'user', order.id)['total'] == 1
+        assert MessageService.get_message_history(user_id + 1, 'user', order.id)['total'] == 0
+
+        # 已归档的已完成订单仍可评价，已取消订单不可评价
+        feedback = FeedbackService.create_feedback(user_id, completed.id, {'rating': 5})
+        assert feedback.therapist_id == therapist_id
+        assert feedback.order is None
+        assert feedback.archived_order.id == completed.id
+        try:
+            FeedbackService.create_feedback(user_id, order.id, {'rating': 5})
+            assert False, '已取消订单不能评价'
+        except Exception as e:
+            assert str(e) == '订单不存在或未完成，无法评价'
+        try:
+            FeedbackService.create_feedback(user_id, completed.id, {'rating': 5})
+            assert False, '同一订单不能重复评价'
+        except Exception as e:
+            assert str(e) == '该订单已经评价过'
+
+
+def test_recent_pages_do_not_query_archive():
+    app = create_app()
+    with app.app_context():
+        user_id, therapist_id = seed()
+        OrderArchiveService.archive()
+        statements = []
+
+        def before(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before)
+        try:
+            first = OrderService.get_user_orders(user_id, 1, 10)
+            archive_queries = [s for s in statements if 'orders_archive' in s]
+            # 首次查询统计一次归档订单数并缓存
+            assert len(archive_queries) == 1 and 'count' in archive_queries[0].lower()
+            assert first['total'] == 40
+
+            statements.clear()
+            second = OrderService.get_user_orders(user_id, 2, 10)
+            assert second['total'] == 40
+            assert not [s for s in statements if 'orders_archive' in s]
+            assert len([s for s in statements if 'count' in s.lower()]) == 1
+
+            # 翻过近期订单后才读取归档表
+            statements.clear()
+            OrderService.get_user_orders(user_id, 3, 10)
+            assert [s for s in statements if 'orders_archive' in s]
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before)
+
+
+def test_orders_without_created_at():
+    app = create_app()
+    with app.app_context():
+        user_id, therapist_id = seed()
+        OrderArchiveService.archive()
+        # 历史数据中创建时间为空的订单排在最后
+        missing = [order.id for order in Order.query.filter_by(status=OrderStatus.PENDING).limit(3)]
+        Order.query.filter(Order.id.in_(missing)).update({'created_at': None}, synchronize_session=False)
+        db.session.commit()
+
+        for size in (1, 3, 7, 40):
+            ids = cursor_through(user_id, size)
+            assert sorted(ids) == sorted(page_through(OrderService.get_user_orders, user_id, size)[0])
+            assert len(set(ids)) == 40
+            assert sorted(ids[-3:]) == sorted(missing)
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'✓ {name}')
@@ -0,0 +1,109 @@
+"""
+订单列表索引检查：用EXPLAIN QUERY PLAN验证用户、技师订单列表查询走复合索引
+用法：python test_order_list_index.py 或 pytest test_order_list_index.py
+"""
+import datetime
+
+from flask import Flask
+from sqlalchemy import event, text
+
+from app import db, init_app
+from app.models.user import User
+from app.models.order import Order
+from app.models.therapist import Therapist
+from app.services.order_service import OrderService
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    init_app(app)
+    return app
+
+
+def seed():
+    therapist = Therapist(name='张技师', phone='13900000000', status=1)
+    user = User(username='user', phone='13800000000')
+    db.session.add_all([therapist, user])
+    db.session.flush()
+    start = datetime.datetime(2026, 1, 1)
+    db.session.add_all([
+        Order(order_no=f'NO{i}', user_id=user.id, therapist_id=therapist.id, status=i % 6,
+              created_at=start + datetime.timedelta(minutes=i))
+        for i in range(50)
+    ])
+    db.session.commit()
+    return user.id, therapist.id
+
+
+def query_plans(func, *args):
+    """执行func并返回其中每条订单查询的执行计划"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM orders' in statement:
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        func(*args)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+    plans = []
+    with db.engine.connect() as conn:
+        for statement, parameters in statements:
+            rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+            plans.append(' | '.join(row[-1] for row in rows))
+    return plans
+
+
+def assert_uses_index(plans, index_name):
+    """
+    按状态筛选的列表和计数查询都走复合索引，列表按索引顺序返回，不需要额外排序
+    翻页越过热数据边界时归档表的查询走归档表上对应的索引
+    """
+    assert plans, '没有捕获到订单查询'
+    for plan in plans:
+        expected = index_name.replace('ix_orders_', 'ix_orders_archive_') if 'orders_archive' in plan else index_name
+        assert expected in plan, f'未使用{expected}: {plan}'
+        assert 'TEMP B-TREE' not in plan, f'列表查询需要额外排序: {plan}'
+
+
+def assert_no_full_scan(plans):
+    """不按状态筛选时至少按用户或技师定位，不扫描全表"""
+    assert plans, '没有捕获到订单查询'
+    for plan in plans:
+        assert plan.startswith('SEARCH orders'), f'全表扫描: {plan}'
+
+
+def test_user_orders_use_index():
+    app = create_app()
+    with app.app_context():
+        user_id, _ = seed()
+        plans = query_plans(OrderService.get_user_orders, user_id, 1, 10, 0)
+        assert_uses_index(plans, 'ix_orders_user_id_status_created_at')
+        assert_no_full_scan(query_plans(OrderService.get_user_orders, user_id, 1, 10))
+
+
+def test_therapist_orders_use_index():
+    app = create_app()
+    with app.app_context():
+        _, therapist_id = seed()
+        plans = query_plans(OrderService.get_therapist_orders, therapist_id, 1, 10, 0)
+        assert_uses_index(plans, 'ix_orders_therapist_id_status_created_at')
+        assert_no_full_scan(query_plans(OrderService.get_therapist_orders, therapist_id, 1, 10))
+
+
+def test_indexes_declared():
+    app = create_app()
+    with app.app_context():
+        names = {row[1] for row in db.session.execute(text("PRAGMA index_list('orders')"))}
+        assert {'ix_orders_user_id_status_created_at', 'ix_orders_therapist_id_status_created_at'} <= names
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'✓ {name}')
@@ -0,0 +1,143 @@
+"""
+订单号机器号租约测试：验证每个进程领取到不同的机器号，fork出的子进程不沿用父进程的机器号，
+续约失败时在租约过期前停止使用原机器号
+用法：python test_order_no.py 或 pytest test_order_no.py
+"""
+import datetime
+import os
+import tempfile
+
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+
+from app import db, init_app
+from app.models.worker_lease import WorkerLease
+from app.utils.snowflake import SnowflakeGenerator, order_no_generator, MAX_WORKER_ID, NO_EXPIRY
+from app.utils.worker_lease import WorkerLeaseManager, worker_lease
+
+
+def create_app(database_uri='sqlite://'):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    init_app(app)
+    return app
+
+
+def new_manager(app):
+    generator = SnowflakeGenerator(None)
+    manager = WorkerLeaseManager(generator)
+    manager.configure(app=app)
+    generator.worker_id_provider = manager.acquire
+    generator.lease_refresher = manager.refresh
+    return generator, manager
+
+
+def test_processes_get_different_worker_ids():
+    app = create_app()
+    with app.app_context():
+        managers = [new_manager(app) for _ in range(20)]
+        # 首次生成ID时才领取机器号
+        ids = [generator.next_id() for generator, _ in managers]
+        worker_ids = [SnowflakeGenerator.parse(i)[1] for i in ids]
+        assert len(set(worker_ids)) == 20
+        assert worker_ids == [manager.worker_id for _, manager in managers]
+        assert WorkerLease.query.count() == 20
+
+
+def test_expired_lease_is_reused_and_lost_lease_detected():
+    app = create_app()
+    with app.app_context():
+        first, first_lease = new_manager(app)
+        first.next_id()
+        # 模拟进程退出后租约过期，其他机器号都被占用
+        now = datetime.datetime.utcnow()
+        WorkerLease.query.update({'expires_at': now - datetime.timedelta(seconds=1)})
+        db.session.add_all([
+            WorkerLease(worker_id=i, owner='other', expires_at=now + datetime.timedelta(seconds=60))
+            for i in range(MAX_WORKER_ID + 1) if i != first_lease.worker_id
+        ])
+        db.session.commit()
+
+        second_lease = new_manager(app)[1]
+        assert second_lease.acquire() == first_lease.worker_id
+        # 原进程续约失败，得知租约已失效
+        assert not first_lease.renew()
+        assert second_lease.renew()
+
+        third_lease = new_manager(app)[1]
+        try:
+            third_lease.acquire()
+            assert False, '没有空闲机器号时应报错'
+        except RuntimeError:
+            pass
+
+
+def test_generation_stops_when_lease_not_renewed():
+    app = create_app()
+    with app.app_context():
+        generator, manager = new_manager(app)
+        worker_id = SnowflakeGenerator.parse(generator.next_id())[1]
+        assert generator.lease_expires_at < NO_EXPIRY
+
+        # 到达续约期限时先续约，租约仍有效则继续使用原机器号
+        generator.lease_expires_at = 0
+        assert SnowflakeGenerator.parse(generator.next_id())[1] == worker_id
+        assert generator.lease_expires_at > generator._now()
+
+        # 续约持续失败（数据库不可用）时拒绝生成
+        renew = manager.renew
+
+        def unavailable():
+            raise OperationalError('UPDATE worker_leases', {}, Exception('database is locked'))
+
+        manager.renew = unavailable
+        generator.lease_expires_at = 0
+        for method in (generator.next_id, generator.next_str):
+            try:
+                method()
+                assert False, '租约过期后不应继续生成'
+            except OperationalError:
+                pass
+
+        # 恢复后发现租约已被其他进程领取，换一个机器号
+        manager.renew = renew
+        WorkerLease.query.filter_by(worker_id=worker_id).update({'owner': 'other'})
+        db.session.commit()
+        assert SnowflakeGenerator.parse(generator.next_id())[1] != worker_id
+        assert manager.lost == 1
+        assert generator.worker_id == manager.worker_id
+
+
+def test_forked_child_acquires_new_worker_id():
+    db_file = os.path.join(tempfile.mkdtemp(), 'order_no.db')
+    app = create_app(f'sqlite:///{db_file}')
+    with app.app_context():
+        order_no_generator.reset()
+        parent_worker = SnowflakeGenerator.parse(order_no_generator.next_id())[1]
+        assert parent_worker == worker_lease.worker_id
+
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                # 子进程不能复用父进程的数据库连接
+                db.engine.dispose(close=False)
+                child_worker = SnowflakeGenerator.parse(order_no_generator.next_id())[1]
+                os.write(write_fd, str(child_worker).encode())
+            finally:
+                os._exit(0)
+        os.close(write_fd)
+        child_worker = int(os.read(read_fd, 16).decode())
+        os.waitpid(pid, 0)
+
+        assert child_worker != parent_worker
+        assert order_no_generator.worker_id == parent_worker
+        assert WorkerLease.query.count() == 2
+    os.remove(db_file)
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'✓ {name}')
@@ -0,0 +1,142 @@
+"""
+订单超时自动取消测试：验证最小堆按到期时间出堆、取消时重新检查订单状态、取消后释放技师时段
+用法：python test_order_timeout.py 或 pytest test_order_timeout.py
+"""
+import datetime
+import time
+
+from flask import Flask
+
+from app import db, init_app
+from app.models.user import User
+from app.models.order import Order, OrderStatus, PaymentStatus
+from app.models.therapist import Therapist
+from app.services.availability import availability_index
+from app.services.order_timeout import OrderTimeoutScheduler
+
+PENDING_TIMEOUT = 1800
+UNPAID_TIMEOUT = 7200
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    init_app(app)
+    availability_index.reset()
+    return app
+
+
+def create_scheduler(app, **options):
+    scheduler = OrderTimeoutScheduler(pending_timeout=PENDING_TIMEOUT, unpaid_timeout=UNPAID_TIMEOUT)
+    scheduler.configure(app=app, **options)
+    return scheduler
+
+
+def seed(*orders):
+    """orders: [(下单多少秒前, 订单状态, 支付状态), ...]，返回订单ID列表"""
+    user = User(username='user', phone='13800000000')
+    therapist = Therapist(name='张技师', phone='13900000000', status=1)
+    db.session.add_all([user, therapist])
+    db.session.flush()
+    now = datetime.datetime.utcnow()
+    service_time = datetime.datetime.now() + datetime.timedelta(days=1)
+    rows = [Order(order_no=f'NO{i}', user_id=user.id, therapist_id=therapist.id, status=status,
+                  payment_status=payment_status, service_time=service_time + datetime.timedelta(hours=2 * i),
+                  duration=60, created_at=now - datetime.timedelta(seconds=age))
+            for i, (age, status, payment_status) in enumerate(orders)]
+    db.session.add_all(rows)
+    db.session.commit()
+    return [order.id for order in rows]
+
+
+def statuses(order_ids):
+    return [db.session.get(Order, order_id).status for order_id in order_ids]
+
+
+def test_heap_pops_orders_by_deadline():
+    app = create_app()
+    with app.app_context():
+        a, b, c, d, e = seed(
+            (1000, OrderStatus.PENDING, PaymentStatus.UNPAID),  # 800秒后接单超时，6200秒后支付超时
+            (7000, OrderStatus.ACCEPTED, PaymentStatus.UNPAID),  # 200秒后支付超时
+            (1900, OrderStatus.PENDING, None),  # 已接单超时，5300秒后支付超时
+            (9000, OrderStatus.COMPLETED, PaymentStatus.UNPAID),  # 已结束，不登记
+            (9000, OrderStatus.PENDING, PaymentStatus.PAID)  # 已支付，不登记
+        )
+        scheduler = create_scheduler(app)
+        assert scheduler._load() == 3
+        # 重复加载不会重复登记
+        scheduler._load()
+        assert scheduler.stats()['scheduled'] == 5
+
+        popped = []
+        while scheduler._heap:
+            popped.append(scheduler._pop())
+        assert popped == [c, b, a, c, a]
+        assert scheduler._scheduled == {}
+
+
+def test_cancel_rechecks_status_and_payment():
+    app = create_app()
+    with app.app_context():
+        order_ids = seed(
+            (2000, OrderStatus.PENDING, PaymentStatus.UNPAID),  # 接单超时，取消
+            (2000, OrderStatus.ACCEPTED, PaymentStatus.UNPAID),  # 期间已接单，未到支付超时，保留
+            (8000, OrderStatus.PENDING, PaymentStatus.PAID),  # 期间已支付，保留
+            (8000, OrderStatus.ACCEPTED, PaymentStatus.PAY_FAILED),  # 支付超时，取消
+            (100, OrderStatus.PENDING, PaymentStatus.UNPAID),  # 未到期，保留
+            (8000, OrderStatus.IN_SERVICE, PaymentStatus.UNPAID)  # 已开始服务，保留
+        )
+        scheduler = create_scheduler(app)
+        cancelled = scheduler.cancel_expired(order_ids)
+
+        assert sorted(row[0] for row in cancelled) == [order_ids[0], order_ids[3]]
+        assert statuses(order_ids) == [
+            OrderStatus.CANCELLED, OrderStatus.ACCEPTED, OrderStatus.PENDING,
+            OrderStatus.CANCELLED, OrderStatus.PENDING, OrderStatus.IN_SERVICE
+        ]
+        # 再次执行不会重复取消
+        assert scheduler.cancel_expired(order_ids) == []
+        assert scheduler.stats()['cancelled'] == 2
+
+
+def test_cancel_releases_therapist_slot():
+    app = create_app()
+    with app.app_context():
+        order_id, = seed((2000, OrderStatus.PENDING, PaymentStatus.UNPAID))
+        order = db.session.get(Order, order_id)
+        therapist_id, service_time = order.therapist_id, order.service_time
+        assert not availability_index.is_free(therapist_id, service_time, 60)
+
+        create_scheduler(app).cancel_expired([order_id])
+        assert availability_index.is_free(therapist_id, service_time, 60)
+        # 重新从数据库加载索引，时段同样空闲
+        availability_index.reset()
+        assert availability_index.is_free(therapist_id, service_time, 60)
+
+
+def test_scheduler_thread_cancels_due_orders():
+    app = create_app()
+    with app.app_context():
+        expired, fresh = seed(
+            (0, OrderStatus.PENDING, PaymentStatus.UNPAID),
+            (0, OrderStatus.ACCEPTED, PaymentStatus.UNPAID)
+        )
+        scheduler = create_scheduler(app, pending_timeout=0.2, unpaid_timeout=3600)
+        scheduler.start()
+        # 重复启动时忽略
+        scheduler.start()
+
+        deadline = time.monotonic() + 5
+        while scheduler.stats()['cancelled'] < 1 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        db.session.expire_all()
+        assert statuses([expired, fresh]) == [OrderStatus.CANCELLED, OrderStatus.ACCEPTED]
+        assert scheduler.stats()['scheduled'] == 2
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'✓ {name}')
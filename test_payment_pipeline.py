@@ -0,0 +1,140 @@
+"""
+支付回调日志处理测试：整批写入订单，批中有异常日志时逐条重试不影响其他日志，
+超时未完成的日志重放，订单不存在的回调标记为失败
+用法：python test_payment_pipeline.py 或 pytest test_payment_pipeline.py
+"""
+import datetime
+
+from flask import Flask
+
+from app import db, init_app
+from app.models.order import Order, OrderStatus, PaymentStatus
+from app.models.payment_journal import PaymentCallbackJournal, JournalState
+from app.services.payment_pipeline import PaymentCallbackPipeline
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    init_app(app)
+    return app
+
+
+class PoisonPipeline(PaymentCallbackPipeline):
+    """写入指定订单时模拟数据库异常"""
+
+    def __init__(self, poison_order_nos, **kwargs):
+        super().__init__(**kwargs)
+        self.poison_order_nos = set(poison_order_nos)
+
+    def _apply(self, entries):
+        super()._apply(entries)
+        if any(entry.order_no in self.poison_order_nos for entry in entries):
+            raise ValueError('Data truncated for column transaction_id')
+
+
+def new_pipeline(app, cls=PaymentCallbackPipeline, *args, **kwargs):
+    # 不启动工作线程，由测试直接调用process_batch
+    pipeline = cls(*args, workers=0, **kwargs)
+    pipeline.configure(app=app)
+    return pipeline
+
+
+def seed(order_nos, callbacks):
+    db.session.add_all([
+        Order(order_no=order_no, user_id=1, status=OrderStatus.PENDING, payment_status=PaymentStatus.UNPAID)
+        for order_no in order_nos
+    ])
+    entries = [PaymentCallbackJournal(order_no=order_no, transaction_id=f'T{i}', payment_method='wechat',
+                                      amount=100, status=status)
+               for i, (order_no, status) in enumerate(callbacks)]
+    db.session.add_all(entries)
+    db.session.commit()
+    return [entry.id for entry in entries]
+
+
+def states(entry_ids):
+    db.session.expire_all()
+    return [db.session.get(PaymentCallbackJournal, entry_id).state for entry_id in entry_ids]
+
+
+def payment_status(order_no):
+    db.session.expire_all()
+    return Order.query.filter_by(order_no=order_no).one().payment_status
+
+
+def test_batch_applied_in_order():
+    app = create_app()
+    with app.app_context():
+        entry_ids = seed(['NO1', 'NO2'], [('NO1', 'fail'), ('NO2', 'success'), ('NO1', 'success')])
+        pipeline = new_pipeline(app)
+        assert pipeline.process_batch() == 3
+        assert pipeline.process_batch() == 0
+        assert states(entry_ids) == [JournalState.APPLIED] * 3
+        # 同一订单先失败后成功，按接收顺序最终为已支付
+        assert payment_status('NO1') == PaymentStatus.PAID
+        assert Order.query.filter_by(order_no='NO1').one().transaction_id == 'T2'
+        assert payment_status('NO2') == PaymentStatus.PAID
+        assert pipeline.stats()['applied'] == 3
+        assert pipeline.stats()['batches'] == 1
+
+
+def test_poison_entry_does_not_block_batch():
+    app = create_app()
+    with app.app_context():
+        entry_ids = seed(['NO1', 'BAD', 'NO3'], [('NO1', 'success'), ('BAD', 'success'), ('NO3', 'success')])
+        pipeline = new_pipeline(app, PoisonPipeline, ['BAD'], max_attempts=2)
+        pipeline.process_batch()
+        # 整批回滚后逐条提交，其他日志正常写入，异常日志放回待处理
+        assert states(entry_ids) == [JournalState.APPLIED, JournalState.PENDING, JournalState.APPLIED]
+        assert payment_status('NO1') == PaymentStatus.PAID
+        assert payment_status('NO3') == PaymentStatus.PAID
+        assert payment_status('BAD') == PaymentStatus.UNPAID
+        assert 'Data truncated' in db.session.get(PaymentCallbackJournal, entry_ids[1]).error
+
+        # 达到重试上限后标记为失败，不再领取
+        pipeline.process_batch()
+        assert states(entry_ids)[1] == JournalState.FAILED
+        assert pipeline.process_batch() == 0
+        assert pipeline.stats()['failed'] == 1
+
+
+def test_recover_replays_stale_claims():
+    app = create_app()
+    with app.app_context():
+        entry_ids = seed(['NO1', 'NO2'], [('NO1', 'success'), ('NO2', 'success')])
+        pipeline = new_pipeline(app, claim_timeout=60)
+        now = datetime.datetime.utcnow()
+        # 第一条被已崩溃的进程领取，第二条刚被其他线程领取
+        for entry_id, claimed_at in zip(entry_ids, (now - datetime.timedelta(seconds=61), now)):
+            PaymentCallbackJournal.query.filter_by(id=entry_id).update({
+                'state': JournalState.PROCESSING, 'claim_token': f'token{entry_id}',
+                'claimed_at': claimed_at, 'attempts': 1})
+        db.session.commit()
+
+        assert pipeline.recover() == 1
+        assert states(entry_ids) == [JournalState.PENDING, JournalState.PROCESSING]
+        assert pipeline.process_batch() == 1
+        assert states(entry_ids) == [JournalState.APPLIED, JournalState.PROCESSING]
+        assert payment_status('NO1') == PaymentStatus.PAID
+        assert db.session.get(PaymentCallbackJournal, entry_ids[0]).attempts == 2
+        assert pipeline.stats()['replayed'] == 1
+
+
+def test_unknown_order_marked_failed():
+    app = create_app()
+    with app.app_context():
+        entry_ids = seed(['NO1'], [('NO1', 'success'), ('MISSING', 'success')])
+        pipeline = new_pipeline(app)
+        pipeline.process_batch()
+        assert states(entry_ids) == [JournalState.APPLIED, JournalState.FAILED]
+        assert db.session.get(PaymentCallbackJournal, entry_ids[1]).error == '订单不存在'
+        assert pipeline.process_batch() == 0
+        assert pipeline.stats()['failed'] == 1
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'✓ {name}')
@@ -0,0 +1,119 @@
+"""
+限流测试：验证滑动窗口估算、Retry-After恰好等到可放行的时刻，以及后续规则拒绝时退还前面规则已计的次数
+用法：python test_rate_limit.py 或 pytest test_rate_limit.py
+"""
+from flask import Flask, jsonify
+
+from app.utils.rate_limit import RateLimiter, rate_limit, rate_limiter, MemoryRateLimitBackend
+
+
+def new_limiter():
+    limiter = RateLimiter()
+    limiter.configure(backend='memory')
+    return limiter
+
+
+def test_sliding_window_weights_previous_window():
+    limiter = new_limiter()
+    for t in range(120, 130):
+        assert limiter.check('k', 10, 60, t)[0]
+    allowed, remaining, reset_at, retry_after = limiter.check('k', 10, 60, 130)
+    assert not allowed
+    assert remaining == 0
+    assert reset_at == 180
+
+    # 下一窗口过了30秒，上一窗口的10次按一半计入，还可以再放行5次
+    results = [limiter.check('k', 10, 60, 210)[0] for _ in range(6)]
+    assert results == [True] * 5 + [False]
+    # 隔了两个窗口后计数清零
+    assert limiter.check('k', 10, 60, 300)[1] == 9
+
+
+def test_retry_after_when_current_window_full():
+    limiter = new_limiter()
+    for _ in range(10):
+        limiter.check('k', 10, 60, 125)
+    allowed, _, _, retry_after = limiter.check('k', 10, 60, 125)
+    assert not allowed
+    # 125+61=186：进入下一窗口6秒后，上一窗口的10次权重降到9，恰好能再放行1次
+    assert retry_after == 61
+    assert not limiter.check('k', 10, 60, 125 + retry_after - 1)[0]
+    assert limiter.check('k', 10, 60, 125 + retry_after)[0]
+
+
+def test_retry_after_when_previous_window_weighs():
+    limiter = new_limiter()
+    for _ in range(10):
+        limiter.check('k', 10, 60, 100)
+    # 新窗口开始10秒后，上一窗口10次的权重约8.33，只能再放行1次
+    assert limiter.check('k', 10, 60, 130)[0]
+    allowed, _, _, retry_after = limiter.check('k', 10, 60, 130)
+    assert not allowed
+    # 132时上一窗口权重降到8，8+1+1恰好不超限
+    assert retry_after == 2
+    assert not limiter.check('k', 10, 60, 130 + retry_after - 1)[0]
+    assert limiter.check('k', 10, 60, 130 + retry_after)[0]
+
+
+def test_undo_returns_quota():
+    backend = MemoryRateLimitBackend()
+    assert backend.hit('k', 1, 60, 10)[0]
+    assert not backend.hit('k', 1, 60, 20)[0]
+    backend.undo('k', 60, 10)
+    assert backend.hit('k', 1, 60, 30)[0]
+    # 跨入下一窗口后撤销，退还的是上一窗口的计数
+    backend.undo('k', 60, 30)
+    backend.hit('k', 1, 60, 50)
+    backend.undo('k', 60, 50)
+    assert backend.hit('k', 1, 60, 61)[0]
+
+
+@rate_limit('test-send', [('phone', 1, 60), ('ip', 2, 60)])
+def send():
+    return jsonify({'code': 200})
+
+
+def post(app, phone, ip):
+    with app.test_request_context('/send', method='POST', json={'phone': phone},
+                                  environ_base={'REMOTE_ADDR': ip}):
+        return send()
+
+
+def test_rejected_request_does_not_charge_earlier_rules():
+    rate_limiter.configure(enabled=True, backend='memory')
+    app = Flask(__name__)
+    assert post(app, '13800000001', '10.0.0.1').status_code == 200
+    assert post(app, '13800000002', '10.0.0.1').status_code == 200
+
+    # IP超限被拒绝，手机号规则已计的一次要退还
+    response = post(app, '13800000003', '10.0.0.1')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert post(app, '13800000003', '10.0.0.2').status_code == 200
+
+    # 手机号超限时拒绝，不影响IP规则的余量
+    response = post(app, '13800000003', '10.0.0.3')
+    assert response.status_code == 429
+    assert post(app, '13800000004', '10.0.0.3').status_code == 200
+    assert post(app, '13800000005', '10.0.0.3').status_code == 200
+
+
+@rate_limit('test-send-busy', [('phone', 1, 60)], refund_on_error=True)
+def send_busy():
+    return jsonify({'code': 400, 'message': '短信发送繁忙，请稍后重试'}), 400
+
+
+def test_failed_request_is_refunded():
+    rate_limiter.configure(enabled=True, backend='memory')
+    app = Flask(__name__)
+    # 发送失败的请求不占用额度，可以立即重试
+    for _ in range(3):
+        with app.test_request_context('/send', method='POST', json={'phone': '13800000001'}):
+            assert send_busy().status_code == 400
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'✓ {name}')
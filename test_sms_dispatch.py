@@ -0,0 +1,118 @@
+"""
+短信异步发送队列测试：使用本地FakeSMSProvider验证批量发送、重试和死信
+用法：python test_sms_dispatch.py 或 pytest test_sms_dispatch.py
+"""
+import time
+
+from flask import Flask
+
+from app.services.sms_service import SMSService
+from app.utils import sms_store
+from app.utils.sms_dispatch import SMSDispatcher, FakeSMSProvider
+from app.utils.sms_store import MemorySMSCodeStore
+
+
+def create_dispatcher(provider, **kwargs):
+    dispatcher = SMSDispatcher(workers=1, backoff=0.01, **kwargs)
+    dispatcher.register_provider(provider)
+    dispatcher.configure(provider=provider.name)
+    return dispatcher
+
+
+def test_send_returns_before_provider_round_trip():
+    provider = FakeSMSProvider(delay=0.3)
+    dispatcher = create_dispatcher(provider)
+    start = time.perf_counter()
+    dispatcher.send('13800000000', '验证码123456')
+    assert time.perf_counter() - start < 0.1
+    assert dispatcher.join()
+    assert [m.phone for m in provider.sent] == ['13800000000']
+
+
+def test_messages_are_batched():
+    provider = FakeSMSProvider()
+    dispatcher = create_dispatcher(provider, batch_size=10, batch_wait=0.2)
+    for i in range(25):
+        dispatcher.send(f'1380000{i:04d}', '验证码')
+    assert dispatcher.join()
+    assert len(provider.sent) == 25
+    assert max(provider.batches) > 1
+
+
+def test_failed_batch_is_retried():
+    provider = FakeSMSProvider(fail_times=2)
+    dispatcher = create_dispatcher(provider, max_retries=3)
+    dispatcher.send('13800000000', '验证码')
+    assert dispatcher.join()
+    assert len(provider.sent) == 1
+    assert dispatcher.stats()['retried'] == 2
+    assert not dispatcher.dead_letters
+
+
+def test_exhausted_retries_go_to_dead_letters():
+    provider = FakeSMSProvider(fail_times=10)
+    dispatcher = create_dispatcher(provider, max_retries=2)
+    dispatcher.send('13800000000', '验证码')
+    assert dispatcher.join()
+    assert not provider.sent
+    assert [m.attempts for m in dispatcher.dead_letters] == [3]
+
+
+def create_full_dispatcher():
+    """工作线程阻塞在发送第一条短信，队列中还有一条，队列已满"""
+    provider = FakeSMSProvider()
+    provider.pause()
+    dispatcher = create_dispatcher(provider, queue_size=1, batch_size=1)
+    dispatcher.send('13800000000', '验证码')
+    assert provider.sending.wait(timeout=5)  # 第一条已被工作线程取走
+    dispatcher.send('13800000001', '验证码')
+    return provider, dispatcher
+
+
+def test_full_queue_rejects_send():
+    provider, dispatcher = create_full_dispatcher()
+    try:
+        dispatcher.send('13800000002', '验证码')
+        assert False, '队列已满时应拒绝'
+    except Exception as e:
+        assert '繁忙' in str(e)
+    assert dispatcher.stats()['dropped'] == 1
+    provider.resume()
+    assert dispatcher.join()
+    assert [m.phone for m in provider.sent] == ['13800000000', '13800000001']
+
+
+def test_code_not_saved_when_queue_full():
+    import app.services.sms_service as sms_service
+    app = Flask(__name__)
+    provider, dispatcher = create_full_dispatcher()
+    store = MemorySMSCodeStore()
+    store.save('13800000002', '123456', 600)
+    original_dispatcher, sms_service.sms_dispatcher = sms_service.sms_dispatcher, dispatcher
+    original_store, sms_store._store = sms_store._store, store
+    try:
+        with app.app_context():
+            try:
+                SMSService.generate_code('13800000002')
+                assert False, '队列已满时应报错'
+            except Exception as e:
+                assert '繁忙' in str(e)
+            # 新验证码没有发出，也没有保存，之前发出的验证码仍然有效
+            assert SMSService.verify_code('13800000002', '123456')
+
+            provider.resume()
+            assert dispatcher.join()
+            code = SMSService.generate_code('13800000002')
+            assert dispatcher.join()
+            assert code in provider.sent[-1].content
+            assert SMSService.verify_code('13800000002', code)
+    finally:
+        sms_service.sms_dispatcher = original_dispatcher
+        sms_store._store = original_store
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'✓ {name}')
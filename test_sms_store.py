@@ -0,0 +1,132 @@
+"""
+验证码存储测试：内存、数据库、Redis三种存储的校验结果一致，重新发送后错误次数清零，并发校验只能消费一次
+Redis存储只在设置了SMS_CODE_REDIS_URL环境变量时测试
+用法：python test_sms_store.py 或 pytest test_sms_store.py
+"""
+import os
+import tempfile
+import threading
+import uuid
+
+from flask import Flask
+
+from app import db, init_app
+from app.utils.sms_store import (
+    MemorySMSCodeStore, RedisSMSCodeStore, SQLSMSCodeStore,
+    VERIFY_OK, VERIFY_MISSING, VERIFY_EXPIRED, VERIFY_MISMATCH, VERIFY_LOCKED
+)
+
+MAX_ATTEMPTS = 3
+
+
+def create_app(database_uri='sqlite://'):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    init_app(app)
+    return app
+
+
+def check_store(store, phone='13800000000', app=None):
+    """三种存储共同遵守的校验规则，数据库存储需传入app以便在线程内使用应用上下文"""
+    assert store.consume(phone, '123456', MAX_ATTEMPTS) == VERIFY_MISSING
+
+    # 正确验证码只能使用一次
+    store.save(phone, '123456', 600)
+    assert store.consume(phone, '123456', MAX_ATTEMPTS) == VERIFY_OK
+    assert store.consume(phone, '123456', MAX_ATTEMPTS) == VERIFY_MISSING
+
+    # 输错达到上限后验证码作废，正确的验证码也不能再用
+    store.save(phone, '123456', 600)
+    assert store.consume(phone, '000000', MAX_ATTEMPTS) == VERIFY_MISMATCH
+    assert store.consume(phone, '000000', MAX_ATTEMPTS) == VERIFY_MISMATCH
+    assert store.consume(phone, '000000', MAX_ATTEMPTS) == VERIFY_LOCKED
+    assert store.consume(phone, '123456', MAX_ATTEMPTS) == VERIFY_MISSING
+
+    # 重新发送后旧验证码失效，错误次数清零
+    store.save(phone, '111111', 600)
+    assert store.consume(phone, '000000', MAX_ATTEMPTS) == VERIFY_MISMATCH
+    assert store.consume(phone, '000000', MAX_ATTEMPTS) == VERIFY_MISMATCH
+    store.save(phone, '222222', 600)
+    assert store.consume(phone, '111111', MAX_ATTEMPTS) == VERIFY_MISMATCH
+    assert store.consume(phone, '000000', MAX_ATTEMPTS) == VERIFY_MISMATCH
+    assert store.consume(phone, '222222', MAX_ATTEMPTS) == VERIFY_OK
+
+    # 并发提交正确验证码，只有一个请求成功
+    store.save(phone, '333333', 600)
+    results = []
+    barrier = threading.Barrier(8)
+
+    def consume():
+        barrier.wait()
+        if app is None:
+            results.append(store.consume(phone, '333333', MAX_ATTEMPTS))
+            return
+        with app.app_context():
+            results.append(store.consume(phone, '333333', MAX_ATTEMPTS))
+
+    run_threads(consume, 8)
+    assert results.count(VERIFY_OK) == 1
+    assert results.count(VERIFY_MISSING) == 7
+
+
+def run_threads(target, count):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_memory_store():
+    check_store(MemorySMSCodeStore())
+
+
+def test_memory_save_waits_for_consume():
+    store = MemorySMSCodeStore()
+    store.save('13800000000', '123456', 600)
+    # consume持有锁期间，重新发送的验证码要等它完成后才写入，不会被这次校验删除
+    store._lock.acquire()
+    saver = threading.Thread(target=store.save, args=('13800000000', '654321', 600))
+    saver.start()
+    saver.join(timeout=0.1)
+    assert saver.is_alive()
+    store._codes.pop('13800000000')
+    store._lock.release()
+    saver.join()
+    assert store.consume('13800000000', '654321', MAX_ATTEMPTS) == VERIFY_OK
+
+
+def test_sql_store():
+    # 并发校验时每个线程使用独立连接，使用临时文件数据库
+    db_file = os.path.join(tempfile.mkdtemp(), 'sms_store.db')
+    app = create_app(f'sqlite:///{db_file}')
+    with app.app_context():
+        check_store(SQLSMSCodeStore(), app=app)
+        db.session.remove()
+        db.engine.dispose()
+    os.remove(db_file)
+
+
+def test_sql_store_expired_code():
+    app = create_app()
+    with app.app_context():
+        store = SQLSMSCodeStore()
+        store.save('13800000000', '123456', -1)
+        assert store.consume('13800000000', '123456', MAX_ATTEMPTS) == VERIFY_EXPIRED
+        assert store.consume('13800000000', '123456', MAX_ATTEMPTS) == VERIFY_MISSING
+
+
+def test_redis_store():
+    url = os.environ.get('SMS_CODE_REDIS_URL')
+    if not url:
+        print('未设置SMS_CODE_REDIS_URL，跳过Redis存储测试')
+        return
+    store = RedisSMSCodeStore(url, prefix=f'test_sms_code:{uuid.uuid4().hex}:')
+    check_store(store)
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'✓ {name}')
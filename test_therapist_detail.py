@@ -0,0 +1,98 @@
+"""
+技师详情查询测试：验证详情页只取最新3条评价，且SQL条数不随评价数量增长
+用法：python test_therapist_detail.py 或 pytest test_therapist_detail.py
+"""
+import datetime
+
+from flask import Flask
+from sqlalchemy import event
+
+from app import db, init_app
+from app.models.user import User
+from app.models.order import Order
+from app.models.feedback import Feedback
+from app.models.therapist import Therapist, ServiceItem
+from app.services.therapist_service import TherapistService
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    init_app(app)
+    return app
+
+
+def seed(feedback_count):
+    therapist = Therapist(name='张技师', phone='13900000000', status=1)
+    therapist.service_items = [ServiceItem(name=f'项目{i}', price=100 + i, duration=60) for i in range(3)]
+    db.session.add(therapist)
+    db.session.flush()
+
+    start = datetime.datetime(2026, 1, 1)
+    for i in range(feedback_count):
+        user = User(username=f'user{i}', phone=f'1380000{i:04d}')
+        order = Order(order_no=f'NO{i}', user=user, therapist_id=therapist.id)
+        db.session.add(Feedback(order=order, user=user, therapist_id=therapist.id, rating=5,
+                                content=f'评价{i}', created_at=start + datetime.timedelta(minutes=i)))
+    db.session.commit()
+    return therapist.id
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._count)
+
+
+def load_detail(therapist_id):
+    """按接口的序列化方式访问详情数据"""
+    therapist, feedbacks = TherapistService.get_detail(therapist_id)
+    items = [(item.id, item.name, item.price) for item in therapist.service_items]
+    reviews = [(f.id, f.content, f.user.username if f.user else None) for f in feedbacks]
+    return items, reviews
+
+
+def test_detail_returns_latest_three_feedbacks():
+    app = create_app()
+    with app.app_context():
+        therapist_id = seed(10)
+        db.session.expunge_all()
+
+        items, reviews = load_detail(therapist_id)
+        assert len(items) == 3
+        assert [r[1] for r in reviews] == ['评价9', '评价8', '评价7']
+        assert [r[2] for r in reviews] == ['user9', 'user8', 'user7']
+
+
+def test_detail_query_count_is_fixed():
+    app = create_app()
+    with app.app_context():
+        therapist_id = seed(200)
+        db.session.expunge_all()
+
+        with QueryCounter(db.engine) as counter:
+            load_detail(therapist_id)
+        assert counter.count <= 3, f'技师详情执行了{counter.count}条SQL'
+
+
+def test_missing_therapist():
+    app = create_app()
+    with app.app_context():
+        assert TherapistService.get_detail(1) == (None, [])
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'✓ {name}')
@@ -0,0 +1,71 @@
+"""
+技师列表游标分页测试：评分相同的技师跨页时不被跳过，游标中的评分带有单精度误差时仍能等值匹配
+用法：python test_therapist_list.py 或 pytest test_therapist_list.py
+"""
+import base64
+import json
+
+from flask import Flask
+
+from app import db, init_app
+from app.models.therapist import Therapist
+from app.services.therapist_service import TherapistService
+
+RATINGS = [4.8, 4.5, 5.0, 4.7]
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    init_app(app)
+    return app
+
+
+def seed():
+    db.session.add_all([
+        Therapist(name=f'技师{i}', phone=f'1390000{i:04d}', status=1, rating=RATINGS[i % 4], service_count=i % 3)
+        for i in range(30)
+    ])
+    db.session.commit()
+
+
+def expected_ids():
+    return [t.id for t in TherapistService.get_list(1, 100)['items']]
+
+
+def test_cursor_pages_cover_all_therapists():
+    app = create_app()
+    with app.app_context():
+        seed()
+        for size in (1, 4, 7):
+            ids, cursor = [], None
+            while True:
+                result = TherapistService.get_list_by_cursor(cursor, size)
+                ids += [t.id for t in result['items']]
+                cursor = result['next_cursor']
+                if cursor is None:
+                    break
+            assert ids == expected_ids(), size
+        assert isinstance(Therapist.query.first().rating, float)
+
+
+def test_cursor_rating_with_float_error():
+    app = create_app()
+    with app.app_context():
+        seed()
+        ordered = TherapistService.get_list(1, 100)['items']
+        # 取一个后面还有同评分技师的位置作为上一页末尾
+        index = next(i for i in range(len(ordered) - 1) if ordered[i].rating == ordered[i + 1].rating == 4.8)
+        last = ordered[index]
+        # 单精度FLOAT列取回的4.8为4.800000190734863，按列精度取整后仍与存储值相等
+        data = json.dumps([4.800000190734863, last.service_count, last.id]).encode()
+        cursor = base64.urlsafe_b64encode(data).decode().rstrip('=')
+        result = TherapistService.get_list_by_cursor(cursor, 100)
+        assert [t.id for t in result['items']] == [t.id for t in ordered[index + 1:]]
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'✓ {name}')
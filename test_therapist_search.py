@@ -0,0 +1,98 @@
+"""
+技师搜索测试：验证单字关键词能检索到结果，MySQL下短于ngram长度的关键词退回LIKE匹配
+用法：python test_therapist_search.py 或 pytest test_therapist_search.py
+"""
+from flask import Flask
+from sqlalchemy import event
+
+from app import db, init_app
+from app.models.therapist import Therapist
+from app.services.therapist_search import TherapistSearch, build_boolean_query
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    init_app(app)
+    return app
+
+
+def seed():
+    db.session.add_all([
+        Therapist(name='张技师', phone='13900000001', status=1, rating=4.8, specialty='推拿 足疗'),
+        Therapist(name='李技师', phone='13900000002', status=1, rating=5.0, specialty='SPA 精油'),
+        Therapist(name='王技师', phone='13900000003', status=0, rating=5.0, specialty='推拿'),
+    ])
+    db.session.commit()
+
+
+def names(result):
+    return [t.name for t in result['items']]
+
+
+def test_boolean_query_skips_short_keywords():
+    assert build_boolean_query('推') is None
+    assert build_boolean_query('a') is None
+    assert build_boolean_query('推拿 a') is None
+    assert build_boolean_query('') is None
+    assert build_boolean_query('推拿') == '"推拿"'
+    assert build_boolean_query('spa') == '"spa"'
+    assert build_boolean_query('spa"精油') == '"spa 精油"'
+
+
+def test_single_character_keyword():
+    app = create_app()
+    with app.app_context():
+        seed()
+        assert names(TherapistSearch.search('推', 1, 10)) == ['张技师']
+        assert names(TherapistSearch.search('推拿', 1, 10)) == ['张技师']
+        assert names(TherapistSearch.search('技', 1, 10)) == ['李技师', '张技师']
+
+
+def test_mysql_short_keyword_falls_back_to_like():
+    app = create_app()
+    with app.app_context():
+        seed()
+        # 单字关键词在执行任何MySQL全文检索语句前就退回LIKE匹配
+        dialect = db.engine.dialect
+        name = dialect.name
+        dialect.name = 'mysql'
+        try:
+            result = TherapistSearch.search('推', 1, 10)
+        finally:
+            dialect.name = name
+        assert names(result) == ['张技师']
+        assert result['total'] == 1
+
+
+def test_sqlite_search_starts_from_fts_index():
+    app = create_app()
+    with app.app_context():
+        seed()
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if 'therapist_search MATCH' in statement:
+                statements.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            TherapistSearch.search('推拿', 1, 10)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+
+        # COUNT和分页查询都应先扫描全文索引，再按主键查技师，而不是遍历技师逐行MATCH
+        assert len(statements) == 2
+        for statement, parameters in statements:
+            plan = [row[-1] for row in db.session.connection().exec_driver_sql(
+                'EXPLAIN QUERY PLAN ' + statement, parameters
+            )]
+            assert plan[0].startswith('SCAN s VIRTUAL TABLE'), plan
+            assert any('SEARCH t USING INTEGER PRIMARY KEY' in step for step in plan), plan
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f'✓ {name}')